@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+
+        from app import metrics, signals  # noqa: F401
+
+        if settings.METRICS_ENABLED:
+            connection_created.connect(metrics.instrument, dispatch_uid='app.metrics.instrument')
\ No newline at end of file
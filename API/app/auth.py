@@ -0,0 +1,105 @@
+"""Connexion des Users et jetons d'API (en-tête Authorization: Bearer <jeton>).
+
+- login() vérifie le mot de passe sur le pool de app/passwords.py, re-hache
+  au passage un mot de passe stocké avec un hasheur dépassé, met à jour
+  last_login (une écriture par jour au plus) et émet un jeton ;
+- un email inconnu coûte aussi un hash : le temps de réponse ne révèle pas
+  l'existence du compte ;
+- seul le SHA-256 du jeton est stocké : une fuite de la table ne donne pas
+  de jeton utilisable. L'authentification d'une requête est une recherche
+  par index, sans hasheur lent.
+"""
+import hashlib
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import authentication, exceptions
+
+from app import passwords
+from app.models import AuthToken, Users
+
+
+KEYWORDS = ('Bearer', 'Token')
+
+
+def digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_token(user, name=''):
+    """Crée un jeton ; retourne (jeton en clair, AuthToken). Le clair n'est pas conservé."""
+    token = secrets.token_urlsafe(32)
+    ttl = settings.AUTH_TOKEN_TTL
+    record = AuthToken.objects.create(
+        users_id=user,
+        digest=digest(token),
+        name=name[:255],
+        expires_at=timezone.now() + timedelta(seconds=ttl) if ttl else None,
+    )
+    return token, record
+
+
+def authenticate_credentials(email, password):
+    """Users correspondant, ou None ; re-hache le mot de passe si nécessaire"""
+    user = Users.objects.filter(email__iexact=email).first()
+    if user is None:
+        passwords.hash_password(password)
+        return None
+    valid, outdated = passwords.verify_password(password, user.password)
+    if not valid:
+        return None
+    if outdated:
+        user.password = passwords.hash_password(password)
+        Users.objects.filter(pk=user.pk).update(password=user.password)
+    return user
+
+
+def login(email, password, name=''):
+    """(user, jeton, AuthToken) ou None si les identifiants sont invalides"""
+    user = authenticate_credentials(email, password)
+    if user is None:
+        return None
+    today = timezone.localdate()
+    if user.last_login != today:
+        Users.objects.filter(pk=user.pk).update(last_login=today)
+        user.last_login = today
+    token, record = issue_token(user, name)
+    return user, token, record
+
+
+def logout(record):
+    record.delete()
+
+
+def revoke_tokens(user):
+    """Révoque tous les jetons de l'utilisateur (changement de mot de passe)"""
+    AuthToken.objects.filter(users_id=user).delete()
+
+
+class TokenAuthentication(authentication.BaseAuthentication):
+    """Authorization: Bearer <jeton> (ou Token <jeton>) -> (Users, AuthToken)"""
+
+    def authenticate(self, request):
+        parts = authentication.get_authorization_header(request).split()
+        if not parts or parts[0].decode(errors='replace') not in KEYWORDS:
+            return None
+        if len(parts) != 2:
+            raise exceptions.AuthenticationFailed("En-tête Authorization invalide.")
+        try:
+            token = parts[1].decode()
+        except UnicodeDecodeError:
+            raise exceptions.AuthenticationFailed("Jeton invalide.")
+        record = AuthToken.objects.select_related('users_id').filter(digest=digest(token)).first()
+        now = timezone.now()
+        if record is None or (record.expires_at is not None and record.expires_at <= now):
+            raise exceptions.AuthenticationFailed("Jeton invalide ou expiré.")
+        if record.last_used_at is None or now - record.last_used_at > timedelta(seconds=settings.AUTH_TOKEN_TOUCH_INTERVAL):
+            # au plus une écriture par AUTH_TOKEN_TOUCH_INTERVAL, pas une par requête
+            AuthToken.objects.filter(pk=record.pk).update(last_used_at=now)
+            record.last_used_at = now
+        return record.users_id, record
+
+    def authenticate_header(self, request):
+        return KEYWORDS[0]
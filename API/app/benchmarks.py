@@ -0,0 +1,215 @@
+"""Benchmark des endpoints GET de app/urls.py (commande run_benchmarks).
+
+Les endpoints sont découverts dans l'URLconf : chaque route accessible en GET
+(viewsets du routeur, vues async), sans les variantes de format. Les routes
+de détail reçoivent l'id d'un objet de l'utilisateur mesuré.
+
+Deux cibles :
+- 'client' : client de test DRF dans le processus (authentification forcée),
+  requêtes séquentielles ; le nombre de requêtes SQL est aussi relevé ;
+- 'server' : serveur HTTP déjà lancé (app/loadtest.py), en concurrence ;
+  le lancer avec THROTTLE_ENABLED=False (sinon réponses 429).
+
+Le rapport est un dict JSON (commit, jeu de données, résultats par endpoint)
+comparable d'un commit à l'autre (compare()).
+"""
+import fnmatch
+import platform
+import subprocess
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.test.utils import override_settings
+from django.urls import URLPattern, reverse
+from rest_framework.test import APIClient
+
+from app import metrics, urls
+from app.loadtest import percentile, run_load
+from app.models import Clients, Estimates, Invoices
+
+
+SKIPPED_ROUTES = ('api-root',)
+
+
+def _queryset(callback):
+    view = getattr(callback, 'cls', None) or getattr(callback, 'view_class', None)
+    return getattr(view, 'queryset', None)
+
+
+def _accepts_get(callback):
+    actions = getattr(callback, 'actions', None)
+    if actions is not None:
+        return 'get' in actions
+    view = getattr(callback, 'view_class', None)
+    return view is not None and hasattr(view, 'get')
+
+
+def _sample_pk(queryset, tenant):
+    if queryset is None:
+        return None
+    if hasattr(queryset, 'for_tenant'):
+        queryset = queryset.for_tenant(tenant)
+    elif queryset.model is type(tenant):
+        return tenant.pk
+    return queryset.order_by('id').values_list('pk', flat=True).first()
+
+
+def _search_term(tenant):
+    name = Clients.objects.for_tenant(tenant).order_by('id').values_list('last_name', flat=True).first()
+    return (name or 'a')[:4]
+
+
+def discover(tenant, only=None, exclude=None):
+    """[{'name', 'path'}] pour chaque route GET de app/urls.py"""
+    extra_params = {'clients-search': {'q': _search_term(tenant)}}
+    endpoints = []
+    for pattern in urls.urlpatterns:
+        if not isinstance(pattern, URLPattern) or not pattern.name or pattern.name in SKIPPED_ROUTES:
+            continue
+        groups = set(pattern.pattern.regex.groupindex)
+        if 'format' in groups or not _accepts_get(pattern.callback):
+            continue
+        if only and not any(fnmatch.fnmatch(pattern.name, glob) for glob in only):
+            continue
+        if exclude and any(fnmatch.fnmatch(pattern.name, glob) for glob in exclude):
+            continue
+        kwargs = {}
+        if 'pk' in groups:
+            pk = _sample_pk(_queryset(pattern.callback), tenant)
+            if pk is None:
+                continue
+            kwargs['pk'] = pk
+        path = reverse(pattern.name, kwargs=kwargs)
+        if pattern.name in extra_params:
+            path += '?' + urlencode(extra_params[pattern.name])
+        endpoints.append({'name': pattern.name, 'path': path})
+    return endpoints
+
+
+def _summary(latencies, elapsed, errors):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'throughput': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': _ms(percentile(latencies, 0.50)),
+        'p95_ms': _ms(percentile(latencies, 0.95)),
+        'p99_ms': _ms(percentile(latencies, 0.99)),
+        'errors': errors,
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def _get(client, path):
+    response = client.get(path)
+    if response.streaming:
+        # export en flux : le corps est produit (et interrogé) à la lecture
+        b''.join(response.streaming_content)
+    return response
+
+
+def run_client(tenant, endpoints, requests=50, warmup=5):
+    """Mesure dans le processus, avec le client de test DRF"""
+    client = APIClient()
+    client.force_authenticate(user=tenant)
+    results = []
+    # sans limitation de débit : des 429 fausseraient les mesures
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], THROTTLE_ENABLED=False):
+        for endpoint in endpoints:
+            for _ in range(warmup):
+                _get(client, endpoint['path'])
+            # compteur par execute_wrapper : le client de test vide queries_log
+            # à chaque requête (signal request_started)
+            profile = metrics.Profile(slow_query=None)
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.execute))
+                status = _get(client, endpoint['path']).status_code
+            latencies = []
+            errors = 0
+            started = time.perf_counter()
+            for _ in range(requests):
+                request_started = time.perf_counter()
+                response = _get(client, endpoint['path'])
+                latencies.append(time.perf_counter() - request_started)
+                errors += response.status_code >= 400
+            elapsed = time.perf_counter() - started
+            results.append({
+                **endpoint, 'status': status, 'queries': profile.queries, **_summary(latencies, elapsed, errors),
+            })
+    return results
+
+
+def run_server(url, endpoints, requests=200, concurrency=8, headers=None):
+    """Mesure contre un serveur lancé à part (gunicorn, runserver...)"""
+    parts = urlsplit(url)
+    prefix = parts.path.rstrip('/')
+    results = []
+    for endpoint in endpoints:
+        path = prefix + endpoint['path']
+        run_load(parts.hostname, parts.port or 80, [path], concurrency, concurrency * 2, headers)
+        result = run_load(parts.hostname, parts.port or 80, [path], concurrency, requests, headers)
+        results.append({
+            **endpoint,
+            'requests': result['requests'],
+            'throughput': round(result['throughput'], 1),
+            'p50_ms': _ms(result['p50']),
+            'p95_ms': _ms(result['p95']),
+            'p99_ms': _ms(result['p99']),
+            'errors': result['errors'],
+            'statuses': {str(status): count for status, count in result['statuses'].items()},
+        })
+    return results
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset(tenant):
+    return {
+        'users_id': tenant.pk,
+        'clients': Clients.objects.for_tenant(tenant).count(),
+        'estimates': Estimates.objects.for_tenant(tenant).count(),
+        'invoices': Invoices.objects.for_tenant(tenant).count(),
+    }
+
+
+def report(target, tenant, results, parameters):
+    return {
+        'commit': _commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'target': target,
+        'python': platform.python_version(),
+        'parameters': parameters,
+        'dataset': dataset(tenant),
+        'results': results,
+    }
+
+
+def compare(baseline, current, metrics=('p50_ms', 'p99_ms')):
+    """Écarts (%) par endpoint commun : [{'name', metric: (avant, après, écart)}]"""
+    before = {result['name']: result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        previous = before.get(result['name'])
+        if previous is None:
+            continue
+        row = {'name': result['name']}
+        for metric in metrics:
+            old, new = previous.get(metric), result.get(metric)
+            change = round((new - old) / old * 100, 1) if old and new is not None else None
+            row[metric] = (old, new, change)
+        rows.append(row)
+    return rows
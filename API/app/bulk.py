@@ -0,0 +1,191 @@
+"""Import en masse des lignes de devis / factures.
+
+Un lot = créations + mises à jour + suppressions, validées ligne par ligne.
+Les lignes valides sont écrites en une transaction (bulk_create / bulk_update),
+puis les totaux de chaque document touché sont recalculés une seule fois.
+"""
+from django.db import transaction
+
+from app import money, partitioning, totals
+
+
+MAX_ROWS = 1000
+BATCH_SIZE = 500
+
+
+class BulkPayloadError(ValueError):
+    """Lot mal formé (pas une erreur de validation d'une ligne)"""
+
+
+def compute_amounts(lines):
+    """Calcule amount_et = quantity * price_unit pour tout le lot"""
+    priced = [line for line in lines if line.quantity and line.price_unit]
+    amounts = money.line_amounts(
+        [line.quantity for line in priced], [money.to_cents(line.price_unit) for line in priced],
+    )
+    for line, amount in zip(priced, amounts):
+        line.amount_et = money.from_cents(amount)
+
+
+def _row_serializer_class(serializer_class, document_field):
+    """Variante du serializer sans le champ document.
+
+    Les documents sont vérifiés en une seule requête pour tout le lot au lieu
+    d'un lookup PrimaryKeyRelatedField par ligne.
+    """
+    class Meta(serializer_class.Meta):
+        fields = [f for f in serializer_class.Meta.fields if f != document_field]
+
+    return type(f'Bulk{serializer_class.__name__}', (serializer_class,), {'Meta': Meta})
+
+
+def _as_list(payload, key):
+    rows = payload.get(key) or []
+    if not isinstance(rows, list):
+        raise BulkPayloadError(f"'{key}' doit être une liste")
+    return rows
+
+
+def _document_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def bulk_apply_lines(serializer_class, payload, queryset, document_queryset):
+    """Applique un lot {'create': [...], 'update': [...], 'delete': [ids]}.
+
+    queryset / document_queryset bornent les lignes et documents accessibles.
+    Retourne un dict {created, updated, deleted, errors}.
+    """
+    if not isinstance(payload, dict):
+        raise BulkPayloadError("Le corps de la requête doit être un objet")
+    to_create = _as_list(payload, 'create')
+    to_update = _as_list(payload, 'update')
+    to_delete = _as_list(payload, 'delete')
+    if len(to_create) + len(to_update) + len(to_delete) > MAX_ROWS:
+        raise BulkPayloadError(f"Un lot est limité à {MAX_ROWS} lignes")
+
+    line_model = serializer_class.Meta.model
+    document_field = line_model._meta.get_field(line_model.DOCUMENT_FIELD)
+    row_serializer = _row_serializer_class(serializer_class, document_field.name)
+    errors = []
+
+    requested_documents = {
+        _document_id(row.get(document_field.name))
+        for row in to_create + to_update
+        if isinstance(row, dict) and document_field.name in row
+    }
+    documents = document_queryset.in_bulk(requested_documents - {None})
+    existing = queryset.in_bulk(
+        {_document_id(row.get('id')) for row in to_update if isinstance(row, dict)} - {None}
+    )
+    # une ligne ne peut pas être à la fois mise à jour et supprimée dans un lot
+    conflicting = (
+        {_document_id(row.get('id')) for row in to_update if isinstance(row, dict)}
+        & {_document_id(pk) for pk in to_delete}
+    ) - {None}
+    conflict_error = {'id': ["Ligne à la fois mise à jour et supprimée dans le lot."]}
+
+    def resolve_document(row, required):
+        """Retourne (document, erreur) ; document vaut None si non fourni"""
+        if document_field.name not in row:
+            if required:
+                return None, {document_field.name: ["Ce champ est obligatoire."]}
+            return None, None
+        document = documents.get(_document_id(row[document_field.name]))
+        if document is None:
+            return None, {document_field.name: ["Document introuvable."]}
+        return document, None
+
+    def validate(op, index, serializer, document_error):
+        row_errors = {} if serializer.is_valid() else dict(serializer.errors)
+        row_errors.update(document_error or {})
+        if row_errors:
+            errors.append({'op': op, 'index': index, 'errors': row_errors})
+        return not row_errors
+
+    created = []
+    for index, row in enumerate(to_create):
+        if not isinstance(row, dict):
+            errors.append({'op': 'create', 'index': index, 'errors': {'non_field_errors': ["Ligne invalide."]}})
+            continue
+        document, document_error = resolve_document(row, required=True)
+        serializer = row_serializer(data=row)
+        if validate('create', index, serializer, document_error):
+            created.append(line_model(**serializer.validated_data, **{document_field.name: document}))
+
+    updated = []
+    update_fields = {'amount_et'}
+    # documents à recalculer -> date de partition (None hors table partitionnée)
+    touched = {}
+    line_key = partitioning.partition_key(line_model)
+
+    def partition_date(line):
+        return getattr(line, line_key) if line_key else None
+
+    # partitions des lignes telles qu'enregistrées, avant modification
+    stored_dates = [partition_date(line) for line in existing.values()]
+    for index, row in enumerate(to_update):
+        line = existing.get(_document_id(row.get('id'))) if isinstance(row, dict) else None
+        if line is None:
+            errors.append({'op': 'update', 'index': index, 'errors': {'id': ["Ligne introuvable."]}})
+            continue
+        if line.pk in conflicting:
+            errors.append({'op': 'update', 'index': index, 'errors': conflict_error})
+            continue
+        document, document_error = resolve_document(row, required=False)
+        serializer = row_serializer(line, data=row, partial=True)
+        if not validate('update', index, serializer, document_error):
+            continue
+        touched[getattr(line, document_field.attname)] = partition_date(line)
+        for name, value in serializer.validated_data.items():
+            setattr(line, name, value)
+            update_fields.add(name)
+        if document is not None:
+            setattr(line, document_field.name, document)
+            update_fields.add(document_field.name)
+            partition_field = getattr(line_model, 'PARTITION_FIELD', None)
+            if partition_field:
+                # bulk_update n'appelle pas pre_save : la clé de partition suit le document
+                line_model._meta.get_field(partition_field).pre_save(line, add=False)
+                update_fields.add(partition_field)
+        updated.append(line)
+
+    delete_ids = {_document_id(pk) for pk in to_delete} - {None} - conflicting
+
+    compute_amounts(created + updated)
+    with transaction.atomic():
+        deleted = list(
+            queryset.filter(pk__in=delete_ids).only(document_field.attname, *filter(None, [line_key]))
+        )
+        deleted_ids = [line.pk for line in deleted]
+        for index, pk in enumerate(to_delete):
+            pk = _document_id(pk)
+            if pk in conflicting:
+                errors.append({'op': 'delete', 'index': index, 'errors': conflict_error})
+            elif pk not in deleted_ids:
+                errors.append({'op': 'delete', 'index': index, 'errors': {'id': ["Ligne introuvable."]}})
+        # les requêtes suivantes portent aussi sur la clé de partition connue
+        line_model.objects.filter(
+            pk__in=deleted_ids, **partitioning.pruning_filter(line_model, map(partition_date, deleted)),
+        ).delete()
+        line_model.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        line_model.objects.filter(**partitioning.pruning_filter(line_model, stored_dates)).bulk_update(
+            updated, fields=sorted(update_fields), batch_size=BATCH_SIZE,
+        )
+        for line in deleted + created + updated:
+            touched[getattr(line, document_field.attname)] = partition_date(line)
+        documents = document_field.related_model._default_manager.filter(
+            pk__in=touched, **partitioning.pruning_filter(document_field.related_model, touched.values()),
+        )
+        for document in documents:
+            totals.recompute_totals(document)
+
+    return {
+        'created': serializer_class(created, many=True).data,
+        'updated': serializer_class(updated, many=True).data,
+        'deleted': deleted_ids,
+        'errors': errors,
+    }
@@ -0,0 +1,92 @@
+"""Cache en lecture des fiches client et des devis / factures détaillés.
+
+Chaque objet a une clé de version (jeton aléatoire) ; les entrées en cache sont
+rangées sous cette version. Les signaux (app/signals.py) remplacent le jeton
+à chaque écriture : les anciennes entrées ne sont plus jamais
+lues et disparaissent avec le TTL ou l'éviction LRU. Une version évincée est
+régénérée, elle ne peut donc jamais resservir une ancienne entrée.
+
+Backend : alias settings.API_CACHE_ALIAS (LocMemCache par défaut, Redis si
+CACHE_URL est défini).
+"""
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    """Compteurs du processus courant"""
+    with _stats_lock:
+        hits, misses = _stats['hit'], _stats['miss']
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 4) if total else None}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _version_key(model, pk):
+    return f"version:{model._meta.model_name}:{pk}"
+
+
+def version(model, pk):
+    cache = get_cache()
+    key = _version_key(model, pk)
+    token = cache.get(key)
+    if token is None:
+        token = uuid.uuid4().hex
+        if not cache.add(key, token, timeout=None):
+            token = cache.get(key) or token
+    return token
+
+
+def bump(model, pks):
+    """Invalide les entrées des objets.
+
+    Appliqué tout de suite (la transaction en cours relit ses propres écritures)
+    puis de nouveau au commit : une lecture concurrente qui aurait remis en cache
+    l'état d'avant commit est ainsi écartée.
+    """
+    pks = {pk for pk in pks if pk is not None}
+    if not pks:
+        return
+
+    def apply():
+        token = uuid.uuid4().hex
+        get_cache().set_many({_version_key(model, pk): token for pk in pks}, timeout=None)
+
+    apply()
+    transaction.on_commit(apply)
+
+
+def get_or_build(namespace, model, pk, build):
+    """(données, True si lues en cache) ; build() n'est appelé qu'en cas d'absence"""
+    cache = get_cache()
+    key = f"{namespace}:{model._meta.model_name}:{pk}:{version(model, pk)}"
+    data = cache.get(key)
+    if data is not None:
+        _count('hit')
+        return data, True
+    _count('miss')
+    data = build()
+    cache.set(key, data, settings.API_CACHE_TIMEOUT)
+    return data, False
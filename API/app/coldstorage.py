@@ -0,0 +1,243 @@
+"""Archivage froid des documents clos : factures réglées (paid_at) et devis sans facture.
+
+Passé la date limite (COLD_STORAGE_AFTER_DAYS), ces documents ne sont plus
+modifiés mais occupent tables et index. archive() les sort de la base vers
+des instantanés immuables, un par utilisateur, année de création et type à
+chaque passage : COLD_STORAGE_DIR/<users_id>/<année>/<type>-<horodatage>.jsonl.gz
+
+Un instantané est une suite de trames compressées séparément (membres gzip,
+ou trames zstd), une par document : le fichier entier se lit comme du JSONL
+compressé (zcat), et un document se décompresse seul à partir de sa position
+et de sa taille, rangées dans archived_documents. Les fichiers ne changent
+plus : ils restent ouverts en mmap, une lecture ne coûte qu'une requête
+d'index et la décompression d'une trame.
+
+Chaque ligne est la représentation détaillée du document (client et lignes
+compris) au moment de l'archivage : les endpoints de détail la servent telle
+quelle, en lecture seule. Listes et exports ne voient plus ces documents ;
+les agrégats de reporting sont conservés (la suppression ne passe pas par
+les signaux) et leurs montants reportés dans ArchivedRollup, que
+rebuild_reports reprend.
+"""
+import gzip
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models import Count, Prefetch
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from app import cache, reports
+from app.models import ArchivedDocument, Estimates, Invoices
+from app.serializers import EstimateDetailSerializer, InvoiceDetailSerializer
+
+
+# type -> (modèle, représentation archivée) ; factures d'abord : un devis
+# n'est archivable qu'une fois sa facture sortie des tables
+KINDS = {
+    'invoices': (Invoices, InvoiceDetailSerializer),
+    'estimates': (Estimates, EstimateDetailSerializer),
+}
+
+CHUNK_SIZE = 500
+MAX_OPEN_SNAPSHOTS = 64
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImproperlyConfigured("Les instantanés zstd nécessitent le paquet zstandard")
+    return zstandard
+
+
+def _gzip_compress(data):
+    return gzip.compress(data, mtime=0)
+
+
+def _zstd_compress(data):
+    return _zstandard().ZstdCompressor().compress(data)
+
+
+def _zstd_decompress(data):
+    return _zstandard().ZstdDecompressor().decompress(data)
+
+
+# codec -> (extension, compression d'une trame, décompression d'une trame)
+CODECS = {
+    'gzip': ('.jsonl.gz', _gzip_compress, gzip.decompress),
+    'zstd': ('.jsonl.zst', _zstd_compress, _zstd_decompress),
+}
+
+
+def codec_of(path):
+    for name, (extension, _, _) in CODECS.items():
+        if str(path).endswith(extension):
+            return name
+    raise ValueError(f"Instantané au format inconnu : {path}")
+
+
+def closed(kind, before):
+    """Documents archivables créés avant la date : factures réglées avant elle, devis sans facture"""
+    model = KINDS[kind][0]
+    queryset = model.objects.filter(created_at__lt=before)
+    if kind == 'invoices':
+        # payment_date est l'échéance : une facture échue n'est pas forcément réglée
+        return queryset.filter(paid_at__lt=before)
+    return queryset.filter(invoice__isnull=True)
+
+
+def pending(before, users_id=None, kinds=KINDS):
+    """[(type, users_id, année, documents)] à archiver, sans rien modifier"""
+    result = []
+    for kind in kinds:
+        queryset = closed(kind, before)
+        if users_id is not None:
+            queryset = queryset.filter(users_id=users_id)
+        groups = (
+            queryset.values_list('users_id', 'created_at__year')
+            .annotate(count=Count('id'))
+            .order_by('users_id', 'created_at__year')
+        )
+        result.extend((kind, user, year, count) for user, year, count in groups)
+    return result
+
+
+def _delete(model, ids):
+    """Lignes puis documents, en SQL : sans signaux, les agrégats de reporting restent tels quels"""
+    lines = model._meta.get_field(model.LINES_RELATED_NAME)
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for table, column in ((lines.related_model._meta.db_table, lines.field.column), (model._meta.db_table, 'id')):
+            cursor.execute(f"DELETE FROM {quote(table)} WHERE {quote(column)} = ANY(%s)", [ids])
+
+
+def archive_group(kind, users_id, year, before):
+    """Archive les documents d'un utilisateur et d'une année dans un nouvel instantané.
+
+    Documents verrouillés, fichier écrit et synchronisé, puis index et
+    suppression dans la même transaction ; en cas d'échec le fichier est
+    retiré. Retourne (chemin relatif, nombre de documents) ou None.
+    """
+    model, serializer_class = KINDS[kind]
+    extension, compress, _ = CODECS[settings.COLD_STORAGE_CODEC]
+    relative = Path(str(users_id), str(year), f"{kind}-{timezone.now():%Y%m%dT%H%M%S%f}{extension}")
+    path = Path(settings.COLD_STORAGE_DIR) / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = model.LINES_RELATED_NAME
+    line_model = model._meta.get_field(lines).related_model
+    documents = (
+        closed(kind, before)
+        .filter(users_id=users_id, created_at__year=year)
+        .select_for_update(of=('self',))
+        .select_related('clients_id')
+        .prefetch_related(Prefetch(lines, queryset=line_model.objects.order_by('id')))
+        .order_by('id')
+    )
+    records = []
+    try:
+        with transaction.atomic():
+            with open(path, 'xb') as output:
+                for document in documents.iterator(chunk_size=CHUNK_SIZE):
+                    data = json.dumps(serializer_class(document).data, cls=JSONEncoder, ensure_ascii=False)
+                    frame = compress(data.encode() + b'\n')
+                    records.append(ArchivedDocument(
+                        users_id_id=users_id,
+                        kind=kind,
+                        document_id=document.pk,
+                        number=getattr(document, 'invoice_number', ''),
+                        year=year,
+                        path=relative.as_posix(),
+                        offset=output.tell(),
+                        length=len(frame),
+                    ))
+                    output.write(frame)
+                output.flush()
+                os.fsync(output.fileno())
+            if not records:
+                path.unlink()
+                return None
+            os.chmod(path, 0o444)
+            ArchivedDocument.objects.bulk_create(records)
+            ids = [record.document_id for record in records]
+            reports.documents_archived(model, model.objects.filter(pk__in=ids))
+            _delete(model, ids)
+            cache.bump(model, ids)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return relative.as_posix(), len(records)
+
+
+def archive(before, users_id=None, kinds=KINDS):
+    """Archive les documents clos créés avant before ; [(type, users_id, année, chemin, documents)]"""
+    result = []
+    for kind in kinds:
+        for _, user, year, _ in pending(before, users_id, [kind]):
+            archived = archive_group(kind, user, year, before)
+            if archived is not None:
+                result.append((kind, user, year, *archived))
+    return result
+
+
+class SnapshotMaps:
+    """mmaps des instantanés ouverts ; au-delà de max_open, les plus anciens sont fermés"""
+
+    def __init__(self, max_open=MAX_OPEN_SNAPSHOTS):
+        self.max_open = max_open
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def frame(self, path, offset, length):
+        with self._lock:
+            mapped = self._maps.pop(path, None)
+            if mapped is None:
+                with open(path, 'rb') as snapshot:
+                    mapped = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[path] = mapped
+            while len(self._maps) > self.max_open:
+                self._maps.popitem(last=False)[1].close()
+            # copie sous le verrou : une éviction ne ferme pas un mmap en cours de lecture
+            return mapped[offset:offset + length]
+
+    def clear(self):
+        with self._lock:
+            while self._maps:
+                self._maps.popitem()[1].close()
+
+
+snapshots = SnapshotMaps()
+
+
+def read(record):
+    """Représentation archivée du document (dict)"""
+    frame = snapshots.frame(str(Path(settings.COLD_STORAGE_DIR) / record.path), record.offset, record.length)
+    decompress = CODECS[codec_of(record.path)][2]
+    return json.loads(decompress(frame))
+
+
+def lookup(model, user, pk):
+    """Entrée d'index du document archivé de l'utilisateur, ou None"""
+    kind = model._meta.db_table
+    if kind not in KINDS:
+        return None
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    return ArchivedDocument.objects.filter(users_id=user, kind=kind, document_id=pk).first()
+
+
+def retrieve(model, user, pk):
+    """(entrée d'index, représentation) du document archivé, ou None"""
+    record = lookup(model, user, pk)
+    if record is None:
+        return None
+    return record, read(record)
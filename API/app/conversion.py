@@ -0,0 +1,105 @@
+"""Transformation de devis en factures, en une transaction.
+
+Pour un lot de devis : verrou des devis, réservation d'un bloc de numéros par
+émetteur, un bulk_create des factures, un bulk_create de toutes les lignes, puis
+un delta par agrégat de reporting (factures créées, encours des devis). Les
+totaux du devis sont repris tels quels (les lignes sont copiées à l'identique,
+pas de recalcul).
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from app import cache, numbering, partitioning, reports
+from app.models import EstimateLines, Estimates, InvoiceLines, Invoices, InvoiceSequence, IssuedInvoiceNumber
+from app.totals import ZERO
+
+
+MAX_ESTIMATES = 500
+BATCH_SIZE = 500
+
+LINE_FIELDS = ('description', 'line_type', 'quantity', 'price_unit', 'amount_et')
+
+
+class ConversionError(ValueError):
+    pass
+
+
+def _invoice_from(estimate, number, options):
+    return Invoices(
+        invoice_number=number,
+        estimates_id=estimate,
+        clients_id_id=estimate.clients_id_id,
+        users_id_id=estimate.users_id_id,
+        price_et=estimate.price_et or ZERO,
+        price_vat=estimate.price_vat or ZERO,
+        price_ati=estimate.price_ati or ZERO,
+        sent_date=options.get('sent_date') or timezone.localdate(),
+        payements_method=options['payements_method'],
+        payment_date=options['payment_date'],
+    )
+
+
+def _line_from(line, invoice):
+    return InvoiceLines(
+        invoice=invoice,
+        taux_vat=line.rate_vat,
+        note=line.note or '',
+        **{name: getattr(line, name) for name in LINE_FIELDS},
+    )
+
+
+def convert_estimates(estimate_queryset, ids, options):
+    """Crée une facture par devis ; ids bornés par estimate_queryset (tenant).
+
+    options : payements_method, payment_date et sent_date (aujourd'hui par défaut).
+    Retourne (factures créées, erreurs [{'id', 'errors'}]).
+    """
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_ESTIMATES:
+        raise ConversionError(f"Une conversion est limitée à {MAX_ESTIMATES} devis")
+    errors = []
+    day = timezone.localdate()
+    with transaction.atomic():
+        # le verrou empêche deux conversions simultanées du même devis
+        estimates = estimate_queryset.select_for_update().filter(pk__in=ids).order_by('id')
+        found = {estimate.pk: estimate for estimate in estimates}
+        to_convert = []
+        for pk in ids:
+            if pk not in found:
+                errors.append({'id': pk, 'errors': ["Devis introuvable."]})
+            elif found[pk].invoiced_at is not None:
+                # drapeau du devis : vaut aussi pour une facture archivée ou détachée
+                errors.append({'id': pk, 'errors': ["Devis déjà facturé."]})
+            else:
+                to_convert.append(found[pk])
+
+        by_issuer = defaultdict(list)
+        for estimate in to_convert:
+            by_issuer[estimate.users_id_id].append(estimate)
+        invoices = []
+        year = numbering.sequence_year(day)
+        for users_id, issuer_estimates in sorted(by_issuer.items()):
+            first = numbering.next_value(InvoiceSequence, users_id, year, count=len(issuer_estimates))
+            for offset, estimate in enumerate(issuer_estimates):
+                number = numbering.format_number(first + offset, day)
+                invoices.append(_invoice_from(estimate, number, options))
+        partitioning.ensure_year(day.year)
+        Invoices.objects.bulk_create(invoices, batch_size=BATCH_SIZE)
+        IssuedInvoiceNumber.reserve(invoices, batch_size=BATCH_SIZE)
+        converted = [estimate.pk for estimate in to_convert]
+        Estimates.objects.filter(pk__in=converted).update(invoiced_at=day, version=F('version') + 1)
+        cache.bump(Estimates, converted)
+
+        invoice_of = {invoice.estimates_id_id: invoice for invoice in invoices}
+        lines = EstimateLines.objects.filter(estimates_id__in=invoice_of).order_by('id')
+        InvoiceLines.objects.bulk_create(
+            (_line_from(line, invoice_of[line.estimates_id_id]) for line in lines.iterator()),
+            batch_size=BATCH_SIZE,
+        )
+        reports.invoices_created(invoices)
+        # les devis convertis sortent de l'encours
+        reports.estimates_invoiced(converted)
+    return invoices, errors
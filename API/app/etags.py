@@ -0,0 +1,85 @@
+"""ETags forts calculés à partir des lignes chargées, sans passer par les serializers.
+
+L'empreinte d'un objet reprend les colonnes chargées de sa ligne, celles des
+relations jointes (select_related) et des lignes préchargées
+(prefetch_related) : tout ce dont la représentation JSON est dérivée.
+
+Un modèle versionné déclare ETAG_FIELDS = ('id', 'version') : sa version
+couvre aussi ses lignes (incrémentée par chaque écriture de ligne), les
+relations préchargées ne sont alors pas parcourues. L'ETag d'un document est
+ainsi le même qu'il soit lu avec ou sans ses lignes.
+
+L'ETag d'un objet seul (object_etag) a deux parties : "<état>-<représentation>".
+L'état ne dépend que de la ligne (ETAG_FIELDS, sinon toutes ses colonnes) ;
+la représentation couvre relations, URL (?fields=, ?expand=) et format.
+If-Match ne compare que l'état : un ETag lu avec ?fields= ou ?format= reste
+valable pour écrire, If-None-Match compare l'ETag entier.
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.http import parse_etags
+
+
+def _row(instance):
+    fields = getattr(instance, 'ETAG_FIELDS', None)
+    deferred = instance.get_deferred_fields()
+    if fields is None:
+        fields = [field.attname for field in instance._meta.concrete_fields]
+    return [instance._meta.label] + [
+        getattr(instance, name) for name in fields if name not in deferred
+    ]
+
+
+def fingerprint(instance):
+    """Valeurs de l'objet et de ses relations déjà chargées (aucune requête)"""
+    values = _row(instance)
+    for name, related in sorted(instance._state.fields_cache.items()):
+        if related is not None:
+            values.append([name, _row(related)])
+    if getattr(instance, 'ETAG_FIELDS', None) is None:
+        for name, related in sorted(getattr(instance, '_prefetched_objects_cache', {}).items()):
+            values.append([name, [_row(item) for item in related]])
+    return values
+
+
+def _digest(payload):
+    raw = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def state(instance):
+    """Empreinte de la ligne seule, indépendante de la représentation"""
+    return _digest(_row(instance))
+
+
+def compute_etag(objects, *variant):
+    """ETag fort pour une page d'objets et une variante de représentation"""
+    return f'"{_digest([variant, [fingerprint(instance) for instance in objects]])}"'
+
+
+def object_etag(instance, *variant):
+    """ETag fort d'un objet : "<état>-<représentation>" """
+    return f'"{state(instance)}-{_digest([variant, fingerprint(instance)])}"'
+
+
+def matches(request, etag):
+    """If-None-Match contient l'ETag (comparaison faible, RFC 9110)"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = [tag.removeprefix('W/') for tag in parse_etags(header)]
+    return '*' in etags or etag in etags
+
+
+def precondition_holds(request, instance):
+    """If-Match absent ou portant l'état courant de l'objet (comparaison forte)"""
+    header = request.META.get('HTTP_IF_MATCH')
+    if not header:
+        return True
+    current = state(instance)
+    for etag in parse_etags(header):
+        if etag == '*' or etag.strip('"').split('-')[0] == current:
+            return True
+    return False
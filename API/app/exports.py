@@ -0,0 +1,93 @@
+"""Export comptable des factures et lignes de facture en flux (CSV ou JSONL).
+
+Les lignes sont lues par curseur côté serveur (.iterator(chunk_size=...)) et
+écrites au fil de l'eau : la mémoire reste constante quel que soit le volume et
+le premier octet part dès le premier paquet lu.
+"""
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from app.models import Invoices, InvoiceLines
+
+
+CHUNK_SIZE = 2000
+
+DATASETS = {
+    'invoices': (
+        Invoices,
+        'created_at',
+        ['id', 'invoice_number', 'users_id', 'clients_id', 'created_at', 'sent', 'sent_date',
+         'payment_date', 'payements_method', 'price_et', 'price_vat', 'price_ati'],
+    ),
+    'lines': (
+        InvoiceLines,
+        'invoice_created_at',
+        ['id', 'invoice_id', 'description', 'line_type', 'quantity', 'price_unit',
+         'taux_vat', 'amount_et', 'note'],
+    ),
+}
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def export_rows(dataset, user=None, year=None, chunk_size=CHUNK_SIZE):
+    """(colonnes, itérateur de tuples) pour le jeu de données demandé"""
+    if dataset not in DATASETS:
+        raise ExportError(f"Jeu de données inconnu : {dataset} ({', '.join(DATASETS)})")
+    model, date_field, columns = DATASETS[dataset]
+    queryset = model.objects.all()
+    if user is not None:
+        queryset = queryset.for_tenant(user)
+    if year is not None:
+        queryset = queryset.filter(**{f'{date_field}__year': year})
+    rows = queryset.order_by('id').values_list(*columns).iterator(chunk_size=chunk_size)
+    return columns, rows
+
+
+class _Echo:
+    """Pseudo-fichier : csv.writer renvoie directement la ligne formatée"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_chunks(columns, rows, chunk_size):
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield writer.writerow(columns)
+    chunk = []
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _jsonl_chunks(columns, rows, chunk_size):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    chunk = []
+    for row in rows:
+        chunk.append(encoder.encode(dict(zip(columns, row))) + '\n')
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def stream(output, columns, rows, chunk_size=CHUNK_SIZE):
+    """Générateur de morceaux de texte au format demandé ('csv' ou 'jsonl')"""
+    if output == 'csv':
+        return _csv_chunks(columns, rows, chunk_size)
+    if output == 'jsonl':
+        return _jsonl_chunks(columns, rows, chunk_size)
+    raise ExportError(f"Format inconnu : {output} ({', '.join(FORMATS)})")
@@ -0,0 +1,52 @@
+"""Temps d'import mesuré par python -X importtime, dans un interpréteur neuf.
+
+Sert aux tests de démarrage (app/tests.py) : config.settings est importé par
+chaque worker et chaque commande manage.py, son coût et ses effets de bord
+(sorties, arrêt) se paient partout.
+"""
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+
+API_DIR = Path(__file__).resolve().parent.parent
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class ImportTimes:
+    """Résultat d'une mesure : sortie standard et temps par module (µs)"""
+
+    def __init__(self, stdout, stderr):
+        self.stdout = stdout
+        self.modules = {}
+        for line in stderr.splitlines():
+            match = _LINE.match(line)
+            if match:
+                self_us, cumulative_us, _, module = match.groups()
+                self.modules[module] = (int(self_us), int(cumulative_us))
+
+    def cumulative(self, module):
+        """Temps cumulé de l'import de module (secondes)"""
+        return self.modules[module][1] / 1_000_000
+
+    def slowest(self, count=10):
+        """Modules au temps propre le plus élevé : [(module, secondes)]"""
+        ranked = sorted(self.modules.items(), key=lambda item: item[1][0], reverse=True)
+        return [(module, self_us / 1_000_000) for module, (self_us, _) in ranked[:count]]
+
+
+def measure(statement, env=None):
+    """Exécute statement (ex. 'import config.settings') depuis la racine de l'API"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=API_DIR,
+        env=dict(os.environ, **(env or {})),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{statement!r} a échoué ({result.returncode}) :\n{result.stderr[-2000:]}")
+    return ImportTimes(result.stdout, result.stderr)
@@ -0,0 +1,306 @@
+"""File de tâches d'arrière-plan sur PostgreSQL (table jobs), manage.py runworker.
+
+- enqueue() insère une tâche ; une clé d'idempotence déjà connue renvoie la
+  tâche existante au lieu d'en créer une seconde (contrainte unique) ;
+- claim() prend les tâches dues par SELECT ... FOR UPDATE SKIP LOCKED : des
+  workers concurrents ne se bloquent pas et ne prennent jamais la même
+  tâche. La tâche passe en 'running' et le verrou de ligne est relâché à la
+  fin de la transaction : l'exécution (envoi d'e-mail, rendu) ne garde ni
+  transaction ni verrou ouverts ;
+- échec : nouvelle tentative après un délai exponentiel (JOBS_RETRY_DELAY ×
+  2^(tentative-1), plafonné, ± 10 %), puis 'failed' après max_attempts ;
+- une tâche 'running' dont le worker a disparu (JOBS_LOCK_TIMEOUT dépassé)
+  est remise en attente (requeue_stale). Pendant le handler, un thread
+  rafraîchit locked_at (tiers du délai) : une tâche longue n'est pas reprise ;
+- l'issue n'est écrite que si la tâche est toujours celle prise par ce worker
+  (locked_by, tentative, 'running') : un worker reparti après une reprise
+  n'écrase pas l'état de la nouvelle exécution.
+
+Les handlers sont déclarés avec @handler('type') et reçoivent la tâche ; leur
+valeur de retour (JSON) est enregistrée dans Job.result. PermanentError
+marque l'échec comme définitif (document supprimé...).
+"""
+import logging
+import os
+import random
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from app import cache, partitioning
+from app.models import Job
+from app.rendering import KINDS, document_title, open_one, render_batch
+
+
+logger = logging.getLogger('app.jobs')
+
+HANDLERS = {}
+
+
+class PermanentError(Exception):
+    """Échec définitif : la tâche passe en 'failed' sans nouvelle tentative"""
+
+
+class UnknownJob(PermanentError):
+    """Type de tâche sans handler"""
+
+
+def handler(kind):
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+    return register
+
+
+def enqueue(kind, payload=None, user=None, idempotency_key=None, run_at=None, max_attempts=None):
+    """Crée une tâche ; retourne (job, created).
+
+    Avec idempotency_key, une tâche déjà créée sous cette clé (quel que soit
+    son statut) est renvoyée telle quelle.
+    """
+    if kind not in HANDLERS:
+        raise UnknownJob(kind)
+    values = {
+        'kind': kind,
+        'payload': payload or {},
+        'users_id': user,
+        'run_at': run_at or timezone.now(),
+        'max_attempts': max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    }
+    if idempotency_key is None:
+        return Job.objects.create(**values), True
+    try:
+        with transaction.atomic():
+            return Job.objects.create(idempotency_key=idempotency_key, **values), True
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=idempotency_key), False
+
+
+def retry(job):
+    """Remet une tâche en échec dans la file, compteur de tentatives à zéro"""
+    Job.objects.filter(pk=job.pk, status=Job.FAILED).update(
+        status=Job.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None, last_error='',
+    )
+    job.refresh_from_db()
+    return job
+
+
+def claim(worker, limit=1, kinds=None):
+    """Prend jusqu'à limit tâches dues et les marque 'running' pour worker"""
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        if kinds:
+            queryset = queryset.filter(kind__in=kinds)
+        jobs = list(queryset.select_for_update(skip_locked=True).order_by('run_at', 'id')[:limit])
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=Job.RUNNING, locked_at=now, locked_by=worker, attempts=F('attempts') + 1,
+            )
+    for job in jobs:
+        job.status, job.locked_at, job.locked_by = Job.RUNNING, now, worker
+        job.attempts += 1
+    return jobs
+
+
+def retry_delay(attempt):
+    """Délai avant la tentative suivante (secondes), exponentiel, plafonné, ± 10 %"""
+    delay = min(settings.JOBS_RETRY_DELAY * 2 ** (attempt - 1), settings.JOBS_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.9, 1.1)
+
+
+def _owned(job, worker):
+    """La tâche telle que prise par worker (ni reprise ni reprise par un autre)"""
+    return Job.objects.filter(pk=job.pk, locked_by=worker, attempts=job.attempts, status=Job.RUNNING)
+
+
+@contextmanager
+def heartbeat(job, worker, interval=None):
+    """Rafraîchit locked_at de la tâche pendant le bloc (thread et connexion dédiés)"""
+    interval = settings.JOBS_LOCK_TIMEOUT / 3 if interval is None else interval
+    done = threading.Event()
+
+    def beat():
+        try:
+            while not done.wait(interval):
+                if not _owned(job, worker).update(locked_at=timezone.now()):
+                    return
+        except Exception:
+            logger.exception("Tâche %s : échec du rafraîchissement du verrou", job)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=beat, name=f"heartbeat-{job.pk}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def run(job):
+    """Exécute une tâche prise par claim() et enregistre son issue"""
+    worker = job.locked_by
+    try:
+        function = HANDLERS.get(job.kind)
+        if function is None:
+            raise UnknownJob(job.kind)
+        with heartbeat(job, worker):
+            result = function(job)
+    except Exception as exc:
+        # message seul dans la tâche (exposée par l'API), trace dans les logs
+        job.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+        if job.attempts < job.max_attempts and not isinstance(exc, PermanentError):
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+            logger.warning("Tâche %s en échec (tentative %d/%d), reprise à %s",
+                           job, job.attempts, job.max_attempts, job.run_at, exc_info=True)
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+            logger.error("Tâche %s abandonnée après %d tentative(s)", job, job.attempts, exc_info=True)
+    else:
+        job.status = Job.DONE
+        job.result = result
+        job.finished_at = timezone.now()
+    job.locked_at = None
+    job.locked_by = ''
+    fields = ['status', 'run_at', 'result', 'last_error', 'finished_at', 'locked_at', 'locked_by']
+    if not _owned(job, worker).update(**{field: getattr(job, field) for field in fields}):
+        logger.warning("Tâche %s reprise pendant son exécution par %s : issue ignorée", job, worker)
+        job.refresh_from_db()
+    return job
+
+
+def requeue_stale(timeout=None):
+    """Remet en attente les tâches 'running' prises depuis plus de timeout secondes"""
+    timeout = settings.JOBS_LOCK_TIMEOUT if timeout is None else timeout
+    limit = timezone.now() - timedelta(seconds=timeout)
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=limit).update(
+        status=Job.QUEUED, locked_at=None, locked_by='', run_at=timezone.now(),
+    )
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Worker:
+    """Pool de threads qui prennent et exécutent les tâches jusqu'à stop().
+
+    burst=True : s'arrête dès que la file ne contient plus de tâche due.
+    """
+
+    def __init__(self, concurrency=None, poll_interval=None, kinds=None, burst=False, name=None):
+        self.concurrency = concurrency or settings.JOBS_CONCURRENCY
+        self.poll_interval = settings.JOBS_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.kinds = kinds
+        self.burst = burst
+        self.name = name or worker_name()
+        self.stopping = threading.Event()
+        self.processed = 0
+        self._lock = threading.Lock()
+
+    def stop(self):
+        self.stopping.set()
+
+    def loop(self, index):
+        name = f"{self.name}/{index}"
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    jobs = claim(name, kinds=self.kinds)
+                    if jobs:
+                        run(jobs[0])
+                except Exception:
+                    # base indisponible... : le thread continue après une pause
+                    logger.exception("Worker %s : erreur de la boucle", name)
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                if jobs:
+                    with self._lock:
+                        self.processed += 1
+                elif self.burst:
+                    return
+                else:
+                    self.stopping.wait(self.poll_interval)
+        finally:
+            # connexions propres à ce thread
+            connections.close_all()
+
+    def run(self):
+        requeue_stale()
+        # partitions des factures de l'année suivante prêtes avant le 1er janvier
+        partitioning.create_future_partitions()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job') as pool:
+            for future in [pool.submit(self.loop, index) for index in range(self.concurrency)]:
+                future.result()
+        return self.processed
+
+
+# -- Handlers ----------------------------------------------------------------
+
+@handler('send_document')
+def send_document(job):
+    """E-mail du document (PDF en pièce jointe) au client, puis sent / sent_date.
+
+    payload : {'kind': 'invoices' | 'estimates', 'id': n, 'to': adresse facultative}
+    """
+    kind = job.payload['kind']
+    document_model = KINDS[kind][0]
+    try:
+        document = document_model.objects.select_related('users_id', 'clients_id').get(
+            pk=job.payload['id'], users_id=job.users_id_id,
+        )
+    except document_model.DoesNotExist:
+        raise PermanentError(f"{document_model._meta.verbose_name} #{job.payload['id']} introuvable")
+    recipient = job.payload.get('to') or document.clients_id.email
+    if not recipient:
+        raise PermanentError(f"{document} : aucune adresse e-mail")
+    with open_one(kind, document) as rendered:
+        content = rendered.read()
+    title = document_title(kind, document)
+    message = EmailMessage(
+        subject=f"{title} - {document.users_id.name_business}",
+        body=f"Bonjour,\n\nVeuillez trouver ci-joint : {title}.\n\n{document.users_id.name_business}",
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[recipient],
+        reply_to=[document.users_id.email],
+    )
+    message.attach(f"{kind}-{document.pk}.pdf", content, 'application/pdf')
+    message.send()
+
+    # e-mail parti : marqué envoyé même si le document a été modifié entre-temps
+    # (un save() lèverait VersionConflict et la reprise renverrait l'e-mail)
+    sent_date = timezone.localdate()
+    document_model.objects.filter(pk=document.pk).update(
+        sent=True, sent_date=sent_date, version=F('version') + 1,
+    )
+    cache.bump(document_model, [document.pk])
+    return {'to': recipient, 'sent_date': sent_date.isoformat()}
+
+
+@handler('render_batch')
+def render_documents(job):
+    """Rendu PDF en lot des documents de l'utilisateur (app/rendering.py).
+
+    payload : {'kind': 'invoices' | 'estimates', 'year': AAAA facultatif, 'month': MM facultatif}
+    """
+    kind = job.payload['kind']
+    queryset = KINDS[kind][0].objects.filter(users_id=job.users_id_id)
+    if job.payload.get('year'):
+        queryset = queryset.filter(created_at__year=job.payload['year'])
+    if job.payload.get('month'):
+        queryset = queryset.filter(created_at__month=job.payload['month'])
+    result = render_batch(kind, queryset)
+    return {'rendered': result['rendered'], 'cached': result['cached']}
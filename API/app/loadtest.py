@@ -0,0 +1,74 @@
+"""Générateur de charge HTTP minimal (bibliothèque standard uniquement).
+
+Chaque client virtuel est un thread avec sa propre connexion keep-alive ; les
+requêtes sont réparties entre eux jusqu'au total demandé. Le résultat donne
+le débit et les percentiles de latence ; les réponses non 2xx / 304 sont
+comptées en erreurs.
+"""
+import http.client
+import itertools
+import threading
+import time
+from collections import Counter
+
+
+def percentile(values, fraction):
+    """Percentile (plus proche rang) d'une liste triée"""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+def run_load(host, port, paths, concurrency, total, headers=None, timeout=30):
+    """Envoie total requêtes GET (paths en rotation) avec concurrency clients"""
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies = []
+    statuses = Counter()
+    paths = list(paths)
+
+    def client():
+        connection = http.client.HTTPConnection(host, port, timeout=timeout)
+        local_latencies = []
+        local_statuses = Counter()
+        while (index := next(counter)) < total:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', paths[index % len(paths)], headers=headers or {})
+                response = connection.getresponse()
+                response.read()
+                local_statuses[response.status] += 1
+            except (OSError, http.client.HTTPException):
+                local_statuses['error'] += 1
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=timeout)
+            local_latencies.append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    succeeded = sum(
+        count for status, count in statuses.items()
+        if status != 'error' and (200 <= status < 300 or status == 304)
+    )
+    return {
+        'requests': len(latencies),
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'errors': len(latencies) - succeeded,
+        'statuses': dict(statuses),
+    }
@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app import coldstorage
+from app.models import Users
+
+
+class Command(BaseCommand):
+    help = (
+        "Sort des tables les factures payées et les devis sans facture créés avant la date limite, vers des "
+        "instantanés JSONL compressés (un par utilisateur, année et type) toujours servis par les endpoints "
+        "de détail ; rebuild_reports ne les verra plus"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', type=date.fromisoformat,
+                            help="Date limite AAAA-MM-JJ (défaut : aujourd'hui - COLD_STORAGE_AFTER_DAYS)")
+        parser.add_argument('--user', type=int, help="Limiter à un utilisateur (id)")
+        parser.add_argument('--kind', action='append', choices=list(coldstorage.KINDS),
+                            help="Type(s) de document (défaut : factures puis devis)")
+        parser.add_argument('--dry-run', action='store_true', help="Compter les documents sans rien modifier")
+
+    def handle(self, *args, **options):
+        before = options['before'] or timezone.localdate() - timedelta(days=settings.COLD_STORAGE_AFTER_DAYS)
+        if before > timezone.localdate():
+            raise CommandError("La date limite ne peut pas être dans le futur")
+        if options['user'] is not None and not Users.objects.filter(pk=options['user']).exists():
+            raise CommandError(f"Utilisateur {options['user']} introuvable")
+        # ordre de KINDS : les factures d'abord, leurs devis deviennent archivables
+        kinds = [kind for kind in coldstorage.KINDS if kind in (options['kind'] or coldstorage.KINDS)]
+
+        if options['dry_run']:
+            groups = coldstorage.pending(before, options['user'], kinds)
+            for kind, user, year, count in groups:
+                self.stdout.write(f"{kind:<10} utilisateur {user:<6} {year}  {count} document(s)")
+            self.stdout.write(f"{sum(group[3] for group in groups)} document(s) créés avant le {before} à archiver")
+            return
+
+        archived = coldstorage.archive(before, options['user'], kinds)
+        for kind, user, year, path, count in archived:
+            self.stdout.write(f"{kind:<10} utilisateur {user:<6} {year}  {count} document(s) -> {path}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(entry[4] for entry in archived)} document(s) archivés dans {settings.COLD_STORAGE_DIR}"
+        ))
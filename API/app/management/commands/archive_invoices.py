@@ -0,0 +1,41 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Détache les partitions de factures et lignes des années antérieures à --before et les exporte "
+        "en CSV gzip avec un manifeste (lignes, SHA-256) ; les agrégats de reporting sont conservés, "
+        "rebuild_reports reprend les montants de ces années (archived_rollups)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', type=int, required=True, help="Archiver les années strictement antérieures")
+        parser.add_argument('--output', help="Répertoire des archives (ARCHIVE_DIR par défaut)")
+        parser.add_argument('--drop', action='store_true',
+                            help="Supprimer les tables détachées une fois exportées (sinon elles restent en base)")
+        parser.add_argument('--dry-run', action='store_true', help="Lister les années concernées sans rien modifier")
+
+    def handle(self, *args, **options):
+        before = options['before']
+        if before > timezone.localdate().year:
+            raise CommandError("L'année en cours et les suivantes ne peuvent pas être archivées")
+        output = Path(options['output'] or settings.ARCHIVE_DIR)
+        # années encore rattachées, ou détachées par une exécution interrompue
+        years = [year for year in partitioning.partition_years('invoices') if year < before]
+        if not years:
+            self.stdout.write("Aucune année à archiver")
+            return
+        if options['dry_run']:
+            self.stdout.write(f"Années à archiver : {', '.join(map(str, years))}")
+            return
+
+        for year in years:
+            manifest = partitioning.archive_year(year, output, drop=options['drop'])
+            counts = ', '.join(f"{table} {entry['rows']}" for table, entry in manifest['tables'].items())
+            self.stdout.write(self.style.SUCCESS(f"{year} archivée dans {output / str(year)} ({counts})"))
@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+
+from app import auth, passwords
+from app.loadtest import percentile
+from app.models import Users
+
+
+PASSWORD = 'benchmark-password'
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le débit de connexion (app/auth.login : vérification du mot de passe sur le pool de "
+        "hachage, last_login, émission d'un jeton) par hasheur : connexions/s et connexions/s par cœur"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hasher', action='append', choices=list(settings.PASSWORD_HASHER_CHOICES),
+                            help="Hasheur(s) mesuré(s) (défaut : tous ceux disponibles)")
+        parser.add_argument('--logins', type=int, default=200, help="Connexions par hasheur")
+        parser.add_argument('--concurrency', type=int, help="Connexions simultanées (défaut : 4 × workers de hachage)")
+        parser.add_argument('--hash-workers', type=int, help="Threads du pool de hachage (AUTH_HASH_WORKERS par défaut)")
+        parser.add_argument('--json', action='store_true', help="Résultats en JSON")
+
+    def handle(self, *args, **options):
+        hashers = options['hasher'] or [
+            name for name in settings.PASSWORD_HASHER_CHOICES if name != 'argon2' or self.argon2_available()
+        ]
+        hash_workers = options['hash_workers'] or settings.AUTH_HASH_WORKERS
+        concurrency = options['concurrency'] or hash_workers * 4
+        if min(options['logins'], concurrency, hash_workers) < 1:
+            raise CommandError("--logins, --concurrency et --hash-workers doivent être positifs")
+
+        cores = available_cores()
+        results = []
+        for name in hashers:
+            if name == 'argon2' and not self.argon2_available():
+                raise CommandError("argon2 nécessite le paquet argon2-cffi")
+            preferred = settings.PASSWORD_HASHER_CHOICES[name]
+            with override_settings(
+                PASSWORD_HASHERS=[preferred] + [h for h in settings.PASSWORD_HASHERS if h != preferred],
+                AUTH_HASH_WORKERS=hash_workers,
+                AUTH_HASH_QUEUE=concurrency,
+            ):
+                passwords.reset()
+                try:
+                    results.append(self.measure(name, options['logins'], concurrency, hash_workers, cores))
+                finally:
+                    passwords.reset()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{cores} cœur(s), {hash_workers} thread(s) de hachage, {concurrency} connexion(s) simultanée(s)")
+        for result in results:
+            self.stdout.write(
+                f"{result['hasher']:<8} hash {result['hash_ms']:>7.1f} ms  "
+                f"{result['logins_per_s']:>7.1f} connexions/s  {result['logins_per_s_per_core']:>6.1f} /s/cœur  "
+                f"p50 {result['p50_ms']:>7.1f} ms  p99 {result['p99_ms']:>7.1f} ms"
+            )
+
+    def argon2_available(self):
+        try:
+            import argon2  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def measure(self, name, logins, concurrency, hash_workers, cores):
+        user = Users(email=f"bench-login-{uuid.uuid4().hex[:8]}@autodf.test", name_business="Benchmark")
+        started = time.perf_counter()
+        user.set_password(PASSWORD)
+        hash_ms = (time.perf_counter() - started) * 1000
+        user.save()
+        counter = iter(range(logins))
+        lock = threading.Lock()
+        latencies = []
+        failures = 0
+
+        def client():
+            nonlocal failures
+            try:
+                while True:
+                    with lock:
+                        if next(counter, None) is None:
+                            return
+                    request_started = time.perf_counter()
+                    result = auth.login(user.email, PASSWORD)
+                    elapsed = time.perf_counter() - request_started
+                    with lock:
+                        latencies.append(elapsed)
+                        failures += result is None
+            finally:
+                connections.close_all()
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                for future in [pool.submit(client) for _ in range(concurrency)]:
+                    future.result()
+            elapsed = time.perf_counter() - started
+        finally:
+            user.delete()
+
+        latencies.sort()
+        throughput = len(latencies) / elapsed
+        return {
+            'hasher': name,
+            'hash_ms': round(hash_ms, 1),
+            'logins': len(latencies),
+            'failures': failures,
+            'elapsed_s': round(elapsed, 2),
+            'logins_per_s': round(throughput, 1),
+            'logins_per_s_per_core': round(throughput / min(hash_workers, cores), 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        }
@@ -0,0 +1,117 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.loadtest import run_load
+
+
+def parse_variant(raw):
+    """'nom:CLE=valeur,CLE=valeur' -> (nom, {CLE: valeur})"""
+    name, _, assignments = raw.partition(':')
+    env = {}
+    for assignment in filter(None, assignments.split(',')):
+        key, sep, value = assignment.partition('=')
+        if not sep:
+            raise CommandError(f"Variante invalide : {raw} (attendu nom:CLE=valeur,...)")
+        env[key.strip()] = value.strip()
+    return name.strip() or raw, env
+
+
+def async_path(path):
+    """/api/clients/ -> /api/async/clients/ (vue async équivalente)"""
+    if not path.startswith('/api/'):
+        raise CommandError(f"Chemin hors /api/ : {path}")
+    return '/api/async/' + path.removeprefix('/api/')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le service sync (WSGI, workers sync) et async (ASGI, workers uvicorn + vues async) "
+        "à nombre de workers fixe, sous plusieurs niveaux de concurrence. "
+        "--variant compare des réglages d'environnement (ex. avec / sans pool de connexions)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', help="Endpoint sync à charger (répétable, /api/clients/ par défaut)")
+        parser.add_argument('--mode', action='append', choices=['sync', 'async'], help="Mode(s) à mesurer (les deux par défaut)")
+        parser.add_argument('--workers', type=int, default=2, help="Workers gunicorn (fixe pour tous les modes)")
+        parser.add_argument('--concurrency', default='1,8,32,64', help="Niveaux de concurrence, séparés par des virgules")
+        parser.add_argument('--requests', type=int, default=500, help="Requêtes par niveau de concurrence")
+        parser.add_argument('--header', action='append', default=[], help="En-tête 'Nom: valeur' (authentification...)")
+        parser.add_argument(
+            '--variant', action='append', type=parse_variant,
+            help="Réglages du serveur 'nom:CLE=valeur,...' (répétable), ex. 'sans-pool:DB_POOL=False,DB_CONN_MAX_AGE=0'",
+        )
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--startup-timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        paths = options['path'] or ['/api/clients/']
+        try:
+            levels = [int(value) for value in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError("--concurrency attend des entiers séparés par des virgules")
+        headers = {}
+        for header in options['header']:
+            name, sep, value = header.partition(':')
+            if not sep:
+                raise CommandError(f"En-tête invalide : {header}")
+            headers[name.strip()] = value.strip()
+
+        self.stdout.write(f"{'variante':<12} {'mode':<6} {'conc.':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erreurs':>8}")
+        for variant, env in options['variant'] or [('défaut', {})]:
+            for mode in options['mode'] or ['sync', 'async']:
+                self.measure(variant, env, mode, paths, levels, headers, options)
+
+    def measure(self, variant, env, mode, paths, levels, headers, options):
+        mode_paths = paths if mode == 'sync' else [async_path(path) for path in paths]
+        with self.server(mode, options['workers'], options['port'], options['startup_timeout'], env):
+            # chauffe : imports paresseux, connexions à la base
+            run_load('127.0.0.1', options['port'], mode_paths, options['workers'], options['workers'] * 4, headers)
+            for concurrency in levels:
+                result = run_load('127.0.0.1', options['port'], mode_paths, concurrency, options['requests'], headers)
+                self.stdout.write(
+                    f"{variant:<12} {mode:<6} {concurrency:>5} {result['throughput']:>8.1f} "
+                    f"{result['p50'] * 1000:>8.1f} {result['p95'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f} "
+                    f"{result['errors']:>8}"
+                )
+                if result['errors']:
+                    self.stderr.write(f"  statuts : {result['statuses']}")
+
+    @contextmanager
+    def server(self, mode, workers, port, startup_timeout, extra_env=None):
+        """gunicorn lancé dans le mode demandé le temps de la mesure"""
+        env = dict(
+            os.environ, **(extra_env or {}),
+            SERVER_MODE=mode, WEB_CONCURRENCY=str(workers), GUNICORN_BIND=f"127.0.0.1:{port}",
+        )
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=env,
+        )
+        try:
+            deadline = time.monotonic() + startup_timeout
+            while True:
+                if process.poll() is not None:
+                    raise CommandError(f"gunicorn ({mode}) s'est arrêté au démarrage")
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise CommandError(f"gunicorn ({mode}) n'écoute pas sur le port {port}")
+                    time.sleep(0.2)
+            yield process
+        finally:
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.exports import CHUNK_SIZE, DATASETS, FORMATS, ExportError, export_rows, stream
+from app.models import Users
+
+
+class Command(BaseCommand):
+    help = "Exporte les factures ou lignes de facture en CSV / JSONL, en flux (mémoire constante)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', choices=list(DATASETS), default='invoices')
+        parser.add_argument('--output-format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--user', type=int, help="Limiter à un utilisateur (id)")
+        parser.add_argument('--year', type=int, help="Limiter à une année (date de création de la facture)")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--file', help="Fichier de sortie (sortie standard par défaut)")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user'] is not None:
+            user = Users.objects.filter(pk=options['user']).first()
+            if user is None:
+                raise CommandError(f"Utilisateur {options['user']} introuvable")
+        try:
+            columns, rows = export_rows(
+                options['dataset'], user=user, year=options['year'], chunk_size=options['chunk_size'],
+            )
+            chunks = stream(options['output_format'], columns, rows, chunk_size=options['chunk_size'])
+        except ExportError as exc:
+            raise CommandError(str(exc))
+
+        if options['file']:
+            with open(options['file'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.synthetic import BATCH_SIZE, PASSWORD, generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un jeu de données synthétique : N utilisateurs × M clients × K devis et K factures "
+        "par client × L lignes par document (bulk_create)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1, help="Utilisateurs (émetteurs) à créer")
+        parser.add_argument('--clients', type=int, default=100, help="Clients par utilisateur")
+        parser.add_argument('--documents', type=int, default=10, help="Devis et factures par client")
+        parser.add_argument('--lines', type=int, default=5, help="Lignes par devis / facture")
+        parser.add_argument('--seed', type=int, help="Graine aléatoire (jeu reproductible)")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        for name in ('users', 'clients', 'documents', 'lines', 'batch_size'):
+            if options[name] < (1 if name in ('users', 'batch_size') else 0):
+                raise CommandError(f"--{name.replace('_', '-')} invalide : {options[name]}")
+        started = time.perf_counter()
+        created = generate(
+            users=options['users'],
+            clients=options['clients'],
+            documents=options['documents'],
+            lines=options['lines'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f"{count} {name}" for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f"{summary} ({elapsed:.1f} s) ; mot de passe : {PASSWORD}"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from app import reports
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les tables de reporting (CA, TVA, encours) à partir des factures et devis"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="Limiter la reconstruction à un utilisateur (id)")
+
+    def handle(self, *args, **options):
+        revenue, clients = reports.rebuild_all(users_id=options['user'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{revenue} agrégats de CA et {clients} agrégats client reconstruits"
+        ))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.rendering import KINDS, render_batch
+
+
+class Command(BaseCommand):
+    help = "Rend en PDF les devis / factures absents du cache, sur un pool de processus"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=list(KINDS), default='invoices')
+        parser.add_argument('--user', type=int, help="Limiter à un utilisateur (id)")
+        parser.add_argument('--year', type=int, help="Limiter à une année (date de création)")
+        parser.add_argument('--month', type=int, help="Limiter à un mois (avec --year)")
+        parser.add_argument('--workers', type=int, help="Nombre de processus (RENDER_WORKERS par défaut)")
+
+    def handle(self, *args, **options):
+        document_model = KINDS[options['kind']][0]
+        queryset = document_model.objects.all()
+        if options['user'] is not None:
+            queryset = queryset.filter(users_id=options['user'])
+        if options['month'] is not None:
+            if options['year'] is None:
+                raise CommandError("--month nécessite --year")
+            queryset = queryset.filter(created_at__month=options['month'])
+        if options['year'] is not None:
+            queryset = queryset.filter(created_at__year=options['year'])
+
+        started = time.perf_counter()
+        result = render_batch(options['kind'], queryset, workers=options['workers'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['rendered']} document(s) rendu(s), {result['cached']} déjà en cache ({elapsed:.2f} s)"
+        ))
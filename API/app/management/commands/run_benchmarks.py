@@ -0,0 +1,99 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from app import benchmarks
+from app.models import Users
+
+
+def parse_headers(raw_headers):
+    headers = {}
+    for header in raw_headers:
+        name, sep, value = header.partition(':')
+        if not sep:
+            raise CommandError(f"En-tête invalide : {header}")
+        headers[name.strip()] = value.strip()
+    return headers
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure chaque endpoint GET de app/urls.py (client de test ou serveur lancé) et écrit un rapport "
+        "JSON (débit, latences p50/p95/p99, requêtes SQL) comparable d'un commit à l'autre"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=['client', 'server'], default='client')
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Serveur mesuré (--target server)")
+        parser.add_argument('--header', action='append', default=[], help="En-tête 'Nom: valeur' (--target server)")
+        parser.add_argument('--user', type=int, help="Id de l'utilisateur mesuré (défaut : celui qui a le plus de clients)")
+        parser.add_argument('--only', action='append', help="Routes à mesurer (motif, ex. 'clients-*')")
+        parser.add_argument('--exclude', action='append', help="Routes à ignorer (motif)")
+        parser.add_argument('--requests', type=int, default=50, help="Requêtes mesurées par endpoint")
+        parser.add_argument('--warmup', type=int, default=5, help="Requêtes de chauffe par endpoint (--target client)")
+        parser.add_argument('--concurrency', type=int, default=8, help="Clients simultanés (--target server)")
+        parser.add_argument('--output', help="Fichier JSON du rapport (défaut : sortie standard)")
+        parser.add_argument('--baseline', help="Rapport JSON précédent à comparer")
+
+    def handle(self, *args, **options):
+        tenant = self.get_tenant(options['user'])
+        endpoints = benchmarks.discover(tenant, options['only'], options['exclude'])
+        if not endpoints:
+            raise CommandError("Aucun endpoint à mesurer")
+
+        parameters = {'requests': options['requests']}
+        if options['target'] == 'client':
+            parameters['warmup'] = options['warmup']
+            results = benchmarks.run_client(tenant, endpoints, options['requests'], options['warmup'])
+        else:
+            parameters.update(url=options['url'], concurrency=options['concurrency'])
+            results = benchmarks.run_server(
+                options['url'], endpoints, options['requests'], options['concurrency'],
+                parse_headers(options['header']),
+            )
+        report = benchmarks.report(options['target'], tenant, results, parameters)
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            Path(options['output']).write_text(output + '\n', encoding='utf-8')
+            self.stderr.write(f"Rapport écrit dans {options['output']}")
+        else:
+            self.stdout.write(output)
+        self.print_summary(report, options['baseline'])
+
+    def get_tenant(self, users_id):
+        if users_id is not None:
+            try:
+                return Users.objects.get(pk=users_id)
+            except Users.DoesNotExist:
+                raise CommandError(f"Utilisateur {users_id} introuvable")
+        tenant = Users.objects.annotate(clients_count=Count('clients')).order_by('-clients_count', 'id').first()
+        if tenant is None:
+            raise CommandError("Aucun utilisateur : lancer d'abord generate_data")
+        return tenant
+
+    def print_summary(self, report, baseline_path):
+        """Résumé lisible sur stderr (la sortie standard reste du JSON)"""
+        baseline = None
+        if baseline_path:
+            try:
+                baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Rapport de référence illisible : {exc}")
+            deltas = {row['name']: row for row in benchmarks.compare(baseline, report)}
+            self.stderr.write(f"Référence : {baseline.get('commit')} ({baseline.get('created_at')})")
+        for result in report['results']:
+            line = (
+                f"{result['name']:<28} {result['throughput'] or 0:>8.1f} req/s  "
+                f"p50 {result['p50_ms'] or 0:>7.2f} ms  p99 {result['p99_ms'] or 0:>7.2f} ms"
+            )
+            if 'queries' in result:
+                line += f"  {result['queries']:>3} SQL"
+            if result['errors']:
+                line += f"  {result['errors']} erreur(s)"
+            if baseline is not None and result['name'] in deltas:
+                change = deltas[result['name']]['p50_ms'][2]
+                line += f"  p50 {change:+.1f} %" if change is not None else ''
+            self.stderr.write(line)
@@ -0,0 +1,38 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.jobs import HANDLERS, Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute les tâches d'arrière-plan (envoi de documents, rendus en lot) sur un pool de threads. "
+        "SIGTERM / Ctrl-C : les tâches en cours se terminent avant l'arrêt"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help="Tâches simultanées (JOBS_CONCURRENCY par défaut)")
+        parser.add_argument('--poll-interval', type=float, help="Secondes entre deux scrutations de la file vide")
+        parser.add_argument('--kind', action='append', choices=sorted(HANDLERS), help="Types de tâches traités (tous par défaut)")
+        parser.add_argument('--burst', action='store_true', help="S'arrêter quand la file est vide")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] is not None and options['concurrency'] < 1:
+            raise CommandError(f"--concurrency invalide : {options['concurrency']}")
+        worker = Worker(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+            kinds=options['kind'],
+            burst=options['burst'],
+        )
+
+        def stop(signum, frame):
+            self.stderr.write(f"Arrêt demandé ({signal.Signals(signum).name}), fin des tâches en cours...")
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.stdout.write(f"Worker {worker.name} : {worker.concurrency} thread(s)")
+        processed = worker.run()
+        self.stdout.write(self.style.SUCCESS(f"{processed} tâche(s) traitée(s)"))
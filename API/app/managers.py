@@ -0,0 +1,15 @@
+from django.db import models
+
+
+class TenantQuerySet(models.QuerySet):
+    """Queryset restreint à un utilisateur (tenant).
+
+    Le modèle déclare TENANT_FIELD : le chemin vers users_id
+    (ex. 'users_id' pour un devis, 'estimates_id__users_id' pour une ligne).
+    """
+
+    def for_tenant(self, user):
+        return self.filter(**{self.model.TENANT_FIELD: user})
+
+
+TenantManager = models.Manager.from_queryset(TenantQuerySet)
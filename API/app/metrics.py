@@ -0,0 +1,195 @@
+"""Mesures de performance par endpoint, exposées au format Prometheus (/metrics).
+
+- durée de chaque requête par route (nom de vue : clients-list...), méthode
+  et statut, en histogramme ;
+- pour les requêtes échantillonnées (METRICS_SAMPLE_RATE) : nombre de
+  requêtes SQL, temps passé en base (connection.execute_wrapper posé sur
+  chaque connexion à sa création, le profil suit le contexte jusque dans les
+  threads de sync_to_async), en sérialisation (serializers) et en rendu ;
+- requêtes SQL et requêtes HTTP lentes journalisées (logger app.performance)
+  au-delà de METRICS_SLOW_QUERY_MS / METRICS_SLOW_REQUEST_MS.
+
+Les compteurs sont ceux du processus courant : chaque worker gunicorn expose
+les siens.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+
+logger = logging.getLogger('app.performance')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+
+class Profile:
+    """Temps et requêtes SQL de la requête HTTP en cours"""
+
+    def __init__(self, slow_query):
+        self.slow_query = slow_query
+        self.queries = 0
+        self.db = 0.0
+        self.phases = {}
+        self.render_started = None
+        self._open = set()
+
+    def execute(self, execute, sql, params, many, context):
+        """Wrapper connection.execute_wrapper : compte et chronomètre chaque requête"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db += elapsed
+            if self.slow_query is not None and elapsed >= self.slow_query:
+                logger.warning("Requête SQL lente (%.1f ms) : %s", elapsed * 1000, sql[:500])
+
+    def add(self, name, elapsed):
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+
+def execute(execute, sql, params, many, context):
+    """execute_wrapper de chaque connexion : mesure la requête si la requête HTTP en cours est profilée"""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.execute(execute, sql, params, many, context)
+
+
+def instrument(connection, **kwargs):
+    """Récepteur de connection_created : une connexion (re)ouverte reçoit le wrapper une fois"""
+    if execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute)
+
+
+@contextmanager
+def profiling(profile):
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def phase(name):
+    """Chronomètre une phase (ex. 'serialize') de la requête profilée en cours.
+
+    Les appels imbriqués de la même phase (serializers imbriqués) ne sont
+    comptés qu'une fois.
+    """
+    profile = _current.get()
+    if profile is None or name in profile._open:
+        yield
+        return
+    profile._open.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile._open.discard(name)
+        profile.add(name, time.perf_counter() - started)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+
+class Registry:
+    """Histogrammes et compteurs indexés par (nom, étiquettes)"""
+
+    HELP = {
+        'autodf_http_request_duration_seconds': ('histogram', "Durée des requêtes HTTP"),
+        'autodf_db_queries': ('histogram', "Requêtes SQL par requête HTTP (échantillonnées)"),
+        'autodf_db_duration_seconds': ('histogram', "Temps passé en base par requête HTTP (échantillonnées)"),
+        'autodf_serialize_duration_seconds': ('histogram', "Temps de sérialisation par requête HTTP (échantillonnées)"),
+        'autodf_render_duration_seconds': ('histogram', "Temps de rendu de la réponse (échantillonnées)"),
+        'autodf_slow_requests_total': ('counter', "Requêtes HTTP au-delà de METRICS_SLOW_REQUEST_MS"),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, labels, value, buckets=DURATION_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def exposition(self):
+        """Texte au format d'exposition Prometheus 0.0.4"""
+        with self._lock:
+            histograms = {key: (h.buckets, list(h.counts), h.total, h.sum) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+        lines = []
+        for name, (kind, description) in self.HELP.items():
+            samples = []
+            if kind == 'histogram':
+                for (metric, labels), (buckets, counts, total, value_sum) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(buckets, counts):
+                        cumulative += count
+                        samples.append(f"{name}_bucket{_labels(labels, le=_number(bound))} {cumulative}")
+                    samples.append(f"{name}_bucket{_labels(labels, le='+Inf')} {total}")
+                    samples.append(f"{name}_sum{_labels(labels)} {_number(value_sum)}")
+                    samples.append(f"{name}_count{_labels(labels)} {total}")
+            else:
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        samples.append(f"{name}{_labels(labels)} {value}")
+            if samples:
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"] + samples
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+registry = Registry()
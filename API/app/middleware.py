@@ -0,0 +1,114 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from app import metrics
+
+
+class InstrumentationMiddleware:
+    """Mesure chaque requête et alimente app.metrics ; en-tête Server-Timing.
+
+    Placé en tête de MIDDLEWARE pour couvrir toute la chaîne. Synchrone et
+    asynchrone : sous ASGI la chaîne reste asynchrone, sans thread par
+    requête. Les requêtes échantillonnées (METRICS_SAMPLE_RATE) sont
+    profilées : requêtes SQL sur toutes les connexions, quel que soit le
+    thread qui les exécute (app.metrics.instrument), sérialisation et rendu.
+    /metrics n'est pas mesuré.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.METRICS_SAMPLE_RATE
+        self.slow_query = _seconds(settings.METRICS_SLOW_QUERY_MS)
+        self.slow_request = _seconds(settings.METRICS_SLOW_REQUEST_MS)
+        self.server_timing = settings.METRICS_SERVER_TIMING
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if request.path == settings.METRICS_PATH:
+            return self.get_response(request)
+        profile = self.start(request)
+        started = time.perf_counter()
+        with metrics.profiling(profile):
+            response = self.get_response(request)
+        return self.finish(request, response, started, profile)
+
+    async def __acall__(self, request):
+        if request.path == settings.METRICS_PATH:
+            return await self.get_response(request)
+        profile = self.start(request)
+        started = time.perf_counter()
+        # le contexte (et donc le profil) est copié dans les threads de sync_to_async
+        with metrics.profiling(profile):
+            response = await self.get_response(request)
+        return self.finish(request, response, started, profile)
+
+    def start(self, request):
+        """Profil de la requête si elle est échantillonnée, sinon None"""
+        if random.random() >= self.sample_rate:
+            return None
+        profile = metrics.Profile(self.slow_query)
+        request._metrics_profile = profile
+        return profile
+
+    def finish(self, request, response, started, profile):
+        if profile is not None and profile.render_started is not None:
+            profile.add('render', time.perf_counter() - profile.render_started)
+        elapsed = time.perf_counter() - started
+        self.record(request, response, elapsed, profile)
+        if self.server_timing:
+            response['Server-Timing'] = self.server_timing_header(elapsed, profile)
+        return response
+
+    def process_template_response(self, request, response):
+        # vue terminée, rendu (JSON de DRF) sur le point de commencer
+        profile = getattr(request, '_metrics_profile', None)
+        if profile is not None:
+            profile.render_started = time.perf_counter()
+        return response
+
+    def record(self, request, response, elapsed, profile):
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match and match.view_name else 'unmatched'
+        labels = {'route': route, 'method': request.method, 'status': response.status_code}
+        metrics.registry.observe('autodf_http_request_duration_seconds', labels, elapsed)
+        if profile is not None:
+            labels = {'route': route, 'method': request.method}
+            metrics.registry.observe('autodf_db_queries', labels, profile.queries, metrics.QUERY_BUCKETS)
+            metrics.registry.observe('autodf_db_duration_seconds', labels, profile.db)
+            for name in ('serialize', 'render'):
+                if name in profile.phases:
+                    metrics.registry.observe(f'autodf_{name}_duration_seconds', labels, profile.phases[name])
+        if self.slow_request is not None and elapsed >= self.slow_request:
+            metrics.registry.increment('autodf_slow_requests_total', {'route': route, 'method': request.method})
+            queries = f", {profile.queries} requête(s) SQL en {profile.db * 1000:.1f} ms" if profile else ''
+            metrics.logger.warning(
+                "Requête lente : %s %s (%s) %.1f ms%s",
+                request.method, request.path, route, elapsed * 1000, queries,
+            )
+
+    def server_timing_header(self, elapsed, profile):
+        entries = []
+        if profile is not None:
+            entries.append(f'db;dur={profile.db * 1000:.1f};desc="{profile.queries} queries"')
+            for name in ('serialize', 'render'):
+                if name in profile.phases:
+                    entries.append(f'{name};dur={profile.phases[name] * 1000:.1f}')
+        entries.append(f'total;dur={elapsed * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def _seconds(milliseconds):
+    return None if milliseconds is None or milliseconds < 0 else milliseconds / 1000
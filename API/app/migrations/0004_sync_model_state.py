@@ -0,0 +1,52 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_alter_estimates_users'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='clients',
+            old_name='users',
+            new_name='users_id',
+        ),
+        migrations.RenameField(
+            model_name='clients',
+            old_name='name',
+            new_name='name_organisation',
+        ),
+        migrations.RenameField(
+            model_name='estimates',
+            old_name='users',
+            new_name='users_id',
+        ),
+        migrations.RenameField(
+            model_name='estimates',
+            old_name='clients',
+            new_name='clients_id',
+        ),
+        migrations.RenameField(
+            model_name='estimatelines',
+            old_name='estimates',
+            new_name='estimates_id',
+        ),
+        migrations.RenameField(
+            model_name='invoices',
+            old_name='users',
+            new_name='users_id',
+        ),
+        migrations.RenameField(
+            model_name='invoices',
+            old_name='clients',
+            new_name='clients_id',
+        ),
+        migrations.AlterField(
+            model_name='estimates',
+            name='users_id',
+            field=models.ForeignKey(db_column='users_id', on_delete=django.db.models.deletion.CASCADE, related_name='estimates', to='app.users', verbose_name='Créé par'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_sync_model_state'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clients',
+            index=models.Index(fields=['users_id', 'created_at', 'id'], name='clients_users_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='estimates',
+            index=models.Index(fields=['users_id', 'created_at', 'id'], name='estimates_users_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='estimates',
+            index=models.Index(fields=['users_id', 'sent'], name='estimates_users_sent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='estimates',
+            index=models.Index(fields=['clients_id', 'created_at'], name='estimates_clients_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoices',
+            index=models.Index(fields=['users_id', 'created_at', 'id'], name='invoices_users_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoices',
+            index=models.Index(fields=['users_id', 'sent'], name='invoices_users_sent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoices',
+            index=models.Index(fields=['clients_id', 'created_at'], name='invoices_clients_created_idx'),
+        ),
+    ]
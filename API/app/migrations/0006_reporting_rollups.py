@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:36
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_tenant_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mois (1er jour)')),
+                ('invoice_count', models.IntegerField(default=0, verbose_name='Nombre de factures')),
+                ('price_et', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Facturé HT')),
+                ('price_vat', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='TVA collectée')),
+                ('price_ati', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Facturé TTC')),
+                ('estimate_count', models.IntegerField(default=0, verbose_name='Nombre de devis')),
+                ('outstanding_ati', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Encours TTC (devis)')),
+                ('clients_id', models.ForeignKey(db_column='clients_id', on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='app.clients', verbose_name='Client')),
+                ('users_id', models.ForeignKey(db_column='users_id', on_delete=django.db.models.deletion.CASCADE, related_name='client_rollups', to='app.users', verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Agrégat client',
+                'verbose_name_plural': 'Agrégats client',
+                'db_table': 'client_rollups',
+                'indexes': [models.Index(fields=['users_id', 'month'], name='client_rollups_users_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('clients_id', 'month'), name='client_rollups_unique_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mois (1er jour)')),
+                ('payements_method', models.CharField(choices=[('CB', 'Carte Bancaire'), ('Virement', 'Virement'), ('espèce', 'Espèces')], max_length=255, verbose_name='Mode de paiement')),
+                ('invoice_count', models.IntegerField(default=0, verbose_name='Nombre de factures')),
+                ('price_et', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Total HT')),
+                ('price_vat', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='TVA collectée')),
+                ('price_ati', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Total TTC')),
+                ('users_id', models.ForeignKey(db_column='users_id', on_delete=django.db.models.deletion.CASCADE, related_name='revenue_rollups', to='app.users', verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': "Agrégat de chiffre d'affaires",
+                'verbose_name_plural': "Agrégats de chiffre d'affaires",
+                'db_table': 'revenue_rollups',
+                'constraints': [models.UniqueConstraint(fields=('users_id', 'month', 'payements_method'), name='revenue_rollups_unique_bucket')],
+            },
+        ),
+    ]
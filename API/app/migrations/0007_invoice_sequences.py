@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_reporting_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField(verbose_name='Année (0 = sans remise à zéro)')),
+                ('last_value', models.IntegerField(default=0, verbose_name='Dernier numéro attribué')),
+            ],
+            options={
+                'verbose_name': 'Séquence de facturation',
+                'verbose_name_plural': 'Séquences de facturation',
+                'db_table': 'invoice_sequences',
+            },
+        ),
+        migrations.AlterField(
+            model_name='invoices',
+            name='invoice_number',
+            field=models.CharField(blank=True, help_text='Attribué automatiquement à la création (voir app/numbering.py)', max_length=255, verbose_name='Numéro de facture'),
+        ),
+        migrations.AddConstraint(
+            model_name='invoices',
+            constraint=models.UniqueConstraint(fields=('users_id', 'invoice_number'), name='invoices_users_number_unique'),
+        ),
+        migrations.AddField(
+            model_name='invoicesequence',
+            name='users_id',
+            field=models.ForeignKey(db_column='users_id', on_delete=django.db.models.deletion.CASCADE, related_name='invoice_sequences', to='app.users', verbose_name='Émetteur'),
+        ),
+        migrations.AddConstraint(
+            model_name='invoicesequence',
+            constraint=models.UniqueConstraint(fields=('users_id', 'year'), name='invoice_sequences_unique_year'),
+        ),
+    ]
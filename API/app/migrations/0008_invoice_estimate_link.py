@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_invoice_sequences'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoices',
+            name='estimates_id',
+            field=models.OneToOneField(blank=True, db_column='estimates_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invoice', to='app.estimates', verbose_name="Devis d'origine"),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_invoice_estimate_link'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clients',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Version'),
+        ),
+        migrations.AddField(
+            model_name='estimates',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Version'),
+        ),
+        migrations.AddField(
+            model_name='invoices',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Version'),
+        ),
+    ]
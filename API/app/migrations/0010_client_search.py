@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:51
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_row_versions'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='clients',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('name_organisation', 'last_name', 'first_name', config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector('email', 'siret', config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), '||', django.contrib.postgres.search.SearchVector('postal_code', config='simple', weight='C'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField(), verbose_name='Index de recherche'),
+        ),
+        migrations.AddIndex(
+            model_name='clients',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='clients_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clients',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(models.F('name_organisation'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(models.F('last_name'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(models.F('email'), name='gin_trgm_ops'), name='clients_trgm_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_client_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=64, verbose_name='Type de tâche')),
+                ('payload', models.JSONField(default=dict, verbose_name='Paramètres')),
+                ('status', models.CharField(choices=[('queued', 'En attente'), ('running', 'En cours'), ('done', 'Terminée'), ('failed', 'En échec')], default='queued', max_length=16, verbose_name='Statut')),
+                ('idempotency_key', models.CharField(blank=True, max_length=255, null=True, unique=True, verbose_name="Clé d'idempotence")),
+                ('attempts', models.IntegerField(default=0, verbose_name='Tentatives')),
+                ('max_attempts', models.IntegerField(default=5, verbose_name='Tentatives maximum')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Exécution à partir de')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Prise par un worker le')),
+                ('locked_by', models.CharField(blank=True, default='', max_length=255, verbose_name='Worker')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Dernière erreur')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Résultat')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Date de fin')),
+                ('users_id', models.ForeignKey(blank=True, db_column='users_id', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='app.users', verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Tâche',
+                'verbose_name_plural': 'Tâches',
+                'db_table': 'jobs',
+                'indexes': [models.Index(condition=models.Q(('status', 'queued')), fields=['run_at', 'id'], name='jobs_queued_idx'), models.Index(condition=models.Q(('status', 'running')), fields=['locked_at'], name='jobs_running_idx'), models.Index(fields=['users_id', '-created_at'], name='jobs_users_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_background_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True, verbose_name='Empreinte SHA-256 du jeton')),
+                ('name', models.CharField(blank=True, default='', max_length=255, verbose_name='Client (User-Agent)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('last_used_at', models.DateTimeField(blank=True, null=True, verbose_name='Dernière utilisation')),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Expiration')),
+                ('users_id', models.ForeignKey(db_column='users_id', on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='app.users', verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': "Jeton d'API",
+                'verbose_name_plural': "Jetons d'API",
+                'db_table': 'auth_tokens',
+            },
+        ),
+    ]
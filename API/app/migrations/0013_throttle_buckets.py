@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_auth_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleBucket',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Clé')),
+                ('tokens', models.FloatField(verbose_name='Jetons restants')),
+                ('updated_at', models.DateTimeField(verbose_name='Mise à jour')),
+            ],
+            options={
+                'verbose_name': 'Seau de limitation',
+                'verbose_name_plural': 'Seaux de limitation',
+                'db_table': 'throttle_buckets',
+            },
+        ),
+        # état jetable, écrit à chaque requête : pas de WAL ; fillfactor réduit
+        # pour des mises à jour HOT (aucun index à part la clé primaire)
+        migrations.RunSQL(
+            'ALTER TABLE throttle_buckets SET UNLOGGED, SET (fillfactor = 70)',
+            'ALTER TABLE throttle_buckets SET LOGGED, RESET (fillfactor)',
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:02
+
+import app.partitioning
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_throttle_buckets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoicelines',
+            name='invoice_created_at',
+            field=app.partitioning.DocumentDateField(document_field='invoice', null=True, source='created_at', verbose_name='Date de la facture'),
+        ),
+        migrations.RunSQL(
+            'UPDATE invoice_lines SET invoice_created_at = invoices.created_at '
+            'FROM invoices WHERE invoices.id = invoice_lines.invoice_id',
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='invoicelines',
+            name='invoice_created_at',
+            field=app.partitioning.DocumentDateField(document_field='invoice', source='created_at', verbose_name='Date de la facture'),
+        ),
+        migrations.AlterField(
+            model_name='invoicelines',
+            name='invoice',
+            field=models.ForeignKey(db_column='invoice_id', db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='invoice_lines', to='app.invoices', verbose_name='Facture'),
+        ),
+        # remplacée par un index unique par partition (app/partitioning.py)
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveConstraint(
+                    model_name='invoices',
+                    name='invoices_users_number_unique',
+                ),
+            ],
+        ),
+        migrations.RunPython(app.partitioning.partition_tables, app.partitioning.unpartition_tables),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_partition_invoices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('invoices', 'Facture'), ('estimates', 'Devis')], max_length=16, verbose_name='Type de document')),
+                ('document_id', models.BigIntegerField(verbose_name='Id du document')),
+                ('number', models.CharField(blank=True, max_length=255, verbose_name='Numéro de facture')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Année de création')),
+                ('path', models.CharField(help_text='Relatif à COLD_STORAGE_DIR', max_length=255, verbose_name='Instantané')),
+                ('offset', models.BigIntegerField(verbose_name="Position dans l'instantané")),
+                ('length', models.PositiveIntegerField(verbose_name='Taille compressée')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Archivé le')),
+                ('users_id', models.ForeignKey(db_column='users_id', on_delete=django.db.models.deletion.CASCADE, related_name='archived_documents', to='app.users', verbose_name='Créé par')),
+            ],
+            options={
+                'verbose_name': 'Document archivé',
+                'verbose_name_plural': 'Documents archivés',
+                'db_table': 'archived_documents',
+                'indexes': [models.Index(fields=['users_id', 'kind', 'year'], name='archived_documents_users_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'document_id'), name='archived_documents_kind_document_unique')],
+            },
+        ),
+    ]
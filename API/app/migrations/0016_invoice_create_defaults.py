@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:42
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_archived_documents'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invoices',
+            name='price_ati',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10, verbose_name='Prix TTC'),
+        ),
+        migrations.AlterField(
+            model_name='invoices',
+            name='price_et',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10, verbose_name='Prix HT'),
+        ),
+        migrations.AlterField(
+            model_name='invoices',
+            name='price_vat',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10, verbose_name='TVA'),
+        ),
+        migrations.AlterField(
+            model_name='invoices',
+            name='sent_date',
+            field=models.DateField(blank=True, null=True, verbose_name="Date d'envoi"),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_invoice_create_defaults'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estimates',
+            name='invoiced_at',
+            field=models.DateField(blank=True, editable=False, help_text='Renseignée à la création de sa facture, conservée si la facture est archivée', null=True, verbose_name='Facturé le'),
+        ),
+        # devis déjà convertis : date de création de leur facture
+        migrations.RunSQL(
+            "UPDATE estimates SET invoiced_at = invoices.created_at "
+            "FROM invoices WHERE invoices.estimates_id = estimates.id",
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:08
+
+import app.partitioning
+import django.db.models.deletion
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_estimates_invoiced_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invoicelines',
+            name='invoice',
+            field=app.partitioning.DocumentForeignKey(db_column='invoice_id', db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='invoice_lines', to='app.invoices', verbose_name='Facture'),
+        ),
+    ]
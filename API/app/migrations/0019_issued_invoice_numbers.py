@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_invoice_lines_partition_reads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssuedInvoiceNumber',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('invoice_number', models.CharField(max_length=255, verbose_name='Numéro de facture')),
+                ('users_id', models.ForeignKey(db_column='users_id', on_delete=django.db.models.deletion.CASCADE, related_name='issued_invoice_numbers', to='app.users', verbose_name='Émetteur')),
+            ],
+            options={
+                'verbose_name': 'Numéro de facture émis',
+                'verbose_name_plural': 'Numéros de facture émis',
+                'db_table': 'invoice_numbers',
+                'constraints': [models.UniqueConstraint(fields=('users_id', 'invoice_number'), name='invoice_numbers_unique')],
+            },
+        ),
+        # numéros des factures existantes ; archivées hors base : non repris
+        migrations.RunSQL(
+            "INSERT INTO invoice_numbers (users_id, invoice_number) "
+            "SELECT users_id, invoice_number FROM invoices ON CONFLICT DO NOTHING",
+            migrations.RunSQL.noop,
+        ),
+    ]
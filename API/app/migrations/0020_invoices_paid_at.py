@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_issued_invoice_numbers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoices',
+            name='paid_at',
+            field=models.DateField(blank=True, help_text="Date du règlement, vide tant que la facture n'est pas réglée (payment_date est l'échéance)", null=True, verbose_name='Payée le'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:15
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0020_invoices_paid_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mois (1er jour)')),
+                ('payements_method', models.CharField(blank=True, default='', max_length=255, verbose_name='Mode de paiement (factures)')),
+                ('invoice_count', models.IntegerField(default=0, verbose_name='Nombre de factures')),
+                ('price_et', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Facturé HT')),
+                ('price_vat', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='TVA collectée')),
+                ('price_ati', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Facturé TTC')),
+                ('estimate_count', models.IntegerField(default=0, verbose_name='Nombre de devis')),
+                ('outstanding_ati', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Encours TTC (devis)')),
+                ('clients_id', models.ForeignKey(db_column='clients_id', help_text='Vide une fois le client supprimé : la part reste dans le CA, plus dans les agrégats client', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_rollups', to='app.clients', verbose_name='Client')),
+                ('users_id', models.ForeignKey(db_column='users_id', on_delete=django.db.models.deletion.CASCADE, related_name='archived_rollups', to='app.users', verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Montants archivés',
+                'verbose_name_plural': 'Montants archivés',
+                'db_table': 'archived_rollups',
+                'constraints': [models.UniqueConstraint(fields=('users_id', 'clients_id', 'month', 'payements_method'), name='archived_rollups_unique_bucket')],
+            },
+        ),
+    ]
@@ -1,9 +1,22 @@
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MinValueValidator
-from django.contrib.auth.hashers import make_password, check_password
 from decimal import Decimal
 from datetime import date
+from django.utils import timezone
+from app import money, numbering, partitioning, passwords, totals
+from app.managers import TenantManager
+from app.versioning import VersionedMixin
+
+
+def client_label(document):
+    """Client du document pour __str__, sans requête si le client n'est pas déjà chargé"""
+    if type(document).clients_id.is_cached(document):
+        return document.clients_id
+    return f"Client #{document.clients_id_id}"
 
 
 class Users(models.Model):
@@ -53,6 +66,10 @@ class Users(models.Model):
         verbose_name="Dernière connexion"
     )
     
+    # request.user (DRF) : un Users n'est obtenu qu'authentifié (app/auth.py)
+    is_authenticated = True
+    is_anonymous = False
+    
     class Meta:
         db_table = 'users'
         verbose_name = "Utilisateur"
@@ -62,15 +79,65 @@ class Users(models.Model):
         return f"{self.first_name} {self.last_name} ({self.email})"
     
     def set_password(self, raw_password):
-        """Hash le mot de passe avant de le sauvegarder"""
-        self.password = make_password(raw_password)
+        """Hash le mot de passe avant de le sauvegarder (pool de app/passwords.py)"""
+        self.password = passwords.hash_password(raw_password)
     
     def check_password(self, raw_password):
-        """Vérifie si le mot de passe est correct"""
-        return check_password(raw_password, self.password)
+        """Vérifie si le mot de passe est correct (pool de app/passwords.py)"""
+        return passwords.verify_password(raw_password, self.password)[0]
+
+
+class AuthToken(models.Model):
+    """Jeton d'API d'un utilisateur ; seul son SHA-256 est stocké (app/auth.py)"""
+    
+    users_id = models.ForeignKey(
+        Users,
+        on_delete=models.CASCADE,
+        db_column='users_id',
+        related_name='tokens',
+        verbose_name="Utilisateur"
+    )
+    
+    digest = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name="Empreinte SHA-256 du jeton"
+    )
+    
+    name = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        verbose_name="Client (User-Agent)"
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Date de création"
+    )
+    
+    last_used_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Dernière utilisation"
+    )
+    
+    expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Expiration"
+    )
+    
+    class Meta:
+        db_table = 'auth_tokens'
+        verbose_name = "Jeton d'API"
+        verbose_name_plural = "Jetons d'API"
+    
+    def __str__(self):
+        return f"{self.users_id_id} - {self.name or 'jeton'} ({self.created_at:%Y-%m-%d})"
 
 
-class Clients(models.Model):
+class Clients(VersionedMixin, models.Model):
     
     CLIENTS_TYPE_CHOICES = [
         ('individuals', 'Particulier'),
@@ -159,25 +226,60 @@ class Clients(models.Model):
         verbose_name="Date de modification"
     )
     
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name="Version"
+    )
+    
+    # calculé par PostgreSQL à chaque écriture (voir app/search.py)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('name_organisation', 'last_name', 'first_name', config='simple', weight='A')
+            + SearchVector('email', 'siret', config='simple', weight='B')
+            + SearchVector('postal_code', config='simple', weight='C')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+        verbose_name="Index de recherche"
+    )
+    
+    objects = TenantManager()
+    
+    TENANT_FIELD = 'users_id'
+    ETAG_FIELDS = ('id', 'version')
+    
     class Meta:
         db_table = 'clients'
         verbose_name = "Client"
         verbose_name_plural = "Clients"
+        indexes = [
+            models.Index(fields=['users_id', 'created_at', 'id'], name='clients_users_created_idx'),
+            # recherche (app/search.py) : les conditions texte sont sélectives,
+            # users_id est filtré ensuite sur les lignes trouvées
+            GinIndex(fields=['search_vector'], name='clients_search_idx'),
+            GinIndex(
+                OpClass(F('name_organisation'), name='gin_trgm_ops'),
+                OpClass(F('last_name'), name='gin_trgm_ops'),
+                OpClass(F('email'), name='gin_trgm_ops'),
+                name='clients_trgm_idx',
+            ),
+        ]
     
     def __str__(self):
-        if self.client_type == 'individuals':
+        if self.clients_type == 'individuals':
             return f"{self.first_name} {self.last_name}"
-        return f"{self.name} (SIRET: {self.siret})"
+        return f"{self.name_organisation} (SIRET: {self.siret})"
 
 
-class Estimates(models.Model):
+class Estimates(VersionedMixin, models.Model):
     
     users_id = models.ForeignKey(
         Users,
         on_delete=models.CASCADE,
         db_column='users_id',
         related_name='estimates',
-        verbose_name=f"Créé par {Users.id}"
+        verbose_name="Créé par"
     )
     
     clients_id = models.ForeignKey(
@@ -225,6 +327,14 @@ class Estimates(models.Model):
         verbose_name="Date d'envoi"
     )
     
+    invoiced_at = models.DateField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Facturé le",
+        help_text="Renseignée à la création de sa facture, conservée si la facture est archivée"
+    )
+    
     created_at = models.DateField(
         auto_now_add=True,
         blank=False,
@@ -239,27 +349,47 @@ class Estimates(models.Model):
         verbose_name="Date de modification"
     )
     
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name="Version"
+    )
+    
     created_by = models.DateField(
         null=True,
         blank=True,
     )
     
+    objects = TenantManager()
+    
+    TENANT_FIELD = 'users_id'
+    ETAG_FIELDS = ('id', 'version')
+    
     class Meta:
         db_table = 'estimates'
         verbose_name = "Devis"
         verbose_name_plural = "Devis"
+        indexes = [
+            models.Index(fields=['users_id', 'created_at', 'id'], name='estimates_users_created_idx'),
+            models.Index(fields=['users_id', 'sent'], name='estimates_users_sent_idx'),
+            models.Index(fields=['clients_id', 'created_at'], name='estimates_clients_created_idx'),
+        ]
+    
+    LINES_RELATED_NAME = 'estimate_lines'
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # valeurs en base au chargement, pour les deltas des tables de reporting
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
     
     def __str__(self):
-        return f"Devis #{self.id} - {self.clients} - {self.price_ati}€"
+        return f"Devis #{self.id} - {client_label(self)} - {self.price_ati}€"
     
     def calculate_totals(self):
-        lines = self.estimate_lines.all()
-        
-        self.price_et = sum(line.amount_et or 0 for line in lines)
-        self.price_vat = sum(line.calculate_vat() for line in lines)
-        self.price_ati = self.price_et + self.price_vat
-        
-        self.save()
+        """Recalcul complet des totaux (une requête d'agrégat + un UPDATE)"""
+        return totals.recompute_totals(self)
 
 
 class EstimateLines(models.Model):
@@ -330,29 +460,44 @@ class EstimateLines(models.Model):
         verbose_name="Note"
     )
     
+    objects = TenantManager()
+    
+    TENANT_FIELD = 'estimates_id__users_id'
+    
     class Meta:
         db_table = 'estimate_lines'
         verbose_name = "Ligne de devis"
         verbose_name_plural = "Lignes de devis"
     
+    DOCUMENT_FIELD = 'estimates_id'
+    VAT_FIELD = 'rate_vat'
+    
     def __str__(self):
         return f"{self.description} - {self.amount_et}€"
     
     def save(self, *args, **kwargs):
 
-        if self.quantity and self.unit_prix:
-            self.amount_et = Decimal(str(self.quantity)) * self.unit_prix
-        super().save(*args, **kwargs)
-        
-        self.estimates.calculate_totals()
+        if self.quantity and self.price_unit:
+            self.amount_et = money.from_cents(money.line_amount(self.quantity, money.to_cents(self.price_unit)))
+        with transaction.atomic():
+            # état enregistré avant l'écriture, ligne verrouillée (app/totals.py)
+            self._totals_snapshot = None if self._state.adding else totals.stored_snapshot(self)
+            super().save(*args, **kwargs)
+            totals.apply_line_change(self, self._totals_snapshot, kwargs.get('update_fields'))
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            snapshot = totals.stored_snapshot(self)
+            result = super().delete(*args, **kwargs)
+            totals.apply_line_removal(self, snapshot)
+        return result
     
     def calculate_vat(self):
-        if self.amount_et and self.rate_vat:
-            return self.amount_et * (self.rate_vat / Decimal('100'))
-        return Decimal('0.00')
+        """TVA de la ligne, arrondie au centime (app/money.py)"""
+        return money.from_cents(money.line_vat(money.to_cents(self.amount_et), money.to_rate(self.rate_vat)))
 
 
-class Invoices(models.Model):
+class Invoices(VersionedMixin, models.Model):
     
     PAYMENTS_METHOD_CHOICES = [
         ('CB', 'Carte Bancaire'),
@@ -362,8 +507,9 @@ class Invoices(models.Model):
     
     invoice_number = models.CharField(
         max_length=255,
-        unique=True,
-        verbose_name="Numéro de facture"
+        blank=True,
+        verbose_name="Numéro de facture",
+        help_text="Attribué automatiquement à la création (voir app/numbering.py)"
     )
     
     clients_id = models.ForeignKey(
@@ -374,6 +520,16 @@ class Invoices(models.Model):
         verbose_name="Client"
     )
     
+    estimates_id = models.OneToOneField(
+        Estimates,
+        on_delete=models.SET_NULL,
+        db_column='estimates_id',
+        related_name='invoice',
+        null=True,
+        blank=True,
+        verbose_name="Devis d'origine"
+    )
+    
     users_id = models.ForeignKey(
         Users,
         on_delete=models.CASCADE,
@@ -385,6 +541,7 @@ class Invoices(models.Model):
     price_et = models.DecimalField(
         max_digits=10,
         decimal_places=2,
+        default=Decimal('0.00'),
         blank=False,
         null=False,
         verbose_name="Prix HT"
@@ -393,6 +550,7 @@ class Invoices(models.Model):
     price_vat = models.DecimalField(
         max_digits=10,
         decimal_places=2,
+        default=Decimal('0.00'),
         blank=False,
         null=False,
         verbose_name="TVA"
@@ -401,6 +559,7 @@ class Invoices(models.Model):
     price_ati = models.DecimalField(
         max_digits=10,
         decimal_places=2,
+        default=Decimal('0.00'),
         blank=False,
         null=False,
         verbose_name="Prix TTC"
@@ -412,8 +571,8 @@ class Invoices(models.Model):
     )
     
     sent_date = models.DateField(
-        null=False,
-        blank=False,
+        null=True,
+        blank=True,
         verbose_name="Date d'envoi"
     )
     
@@ -431,6 +590,13 @@ class Invoices(models.Model):
         verbose_name="Date de paiement"
     )
     
+    paid_at = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name="Payée le",
+        help_text="Date du règlement, vide tant que la facture n'est pas réglée (payment_date est l'échéance)"
+    )
+    
     created_at = models.DateField(
         auto_now_add=True,
         blank=False,
@@ -445,22 +611,168 @@ class Invoices(models.Model):
         verbose_name="Date de modification"
     )
     
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name="Version"
+    )
+    
+    objects = TenantManager()
+    
+    TENANT_FIELD = 'users_id'
+    ETAG_FIELDS = ('id', 'version')
+    
     class Meta:
         db_table = 'invoices'
         verbose_name = "Facture"
         verbose_name_plural = "Factures"
+        indexes = [
+            models.Index(fields=['users_id', 'created_at', 'id'], name='invoices_users_created_idx'),
+            models.Index(fields=['users_id', 'sent'], name='invoices_users_sent_idx'),
+            models.Index(fields=['clients_id', 'created_at'], name='invoices_clients_created_idx'),
+        ]
+        # table partitionnée par année (app/partitioning.py) : unicité de
+        # (users_id, invoice_number) et de estimates_id par un index par partition,
+        # garde globale par IssuedInvoiceNumber et Estimates.invoiced_at
+    
+    LINES_RELATED_NAME = 'invoice_lines'
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # valeurs en base au chargement, pour les deltas des tables de reporting
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
     
     def __str__(self):
-        return f"{self.invoice_number} - {self.clients} - {self.price_ati}€"
+        return f"{self.invoice_number} - {client_label(self)} - {self.price_ati}€"
     
-    def calculate_totals(self):
-        lines = self.invoice_lines.all()
-        
-        self.price_et = sum(line.price_et or 0 for line in lines)
-        self.price_vat = sum(line.price_vat or 0 for line in lines)
-        self.price_ati = self.price_et + self.price_vat
+    def assign_number(self):
+        """Prend le numéro suivant de la séquence de l'émetteur (transaction requise)"""
+        day = self.created_at or timezone.localdate()
+        value = numbering.next_value(InvoiceSequence, self.users_id_id, numbering.sequence_year(day))
+        self.invoice_number = numbering.format_number(value, day)
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        # numéro et insertion dans la même transaction : un échec libère le numéro
+        with transaction.atomic():
+            partitioning.ensure_year((self.created_at or timezone.localdate()).year)
+            if not self.invoice_number:
+                self.assign_number()
+            result = super().save(*args, **kwargs)
+            IssuedInvoiceNumber.reserve([self])
+            if self.estimates_id_id is not None:
+                self.mark_estimate_invoiced()
+            return result
+    
+    def mark_estimate_invoiced(self):
+        """Marque le devis d'origine comme facturé ; IntegrityError s'il l'est déjà.
         
-        self.save()
+        Garde globale : l'unicité de estimates_id n'est vérifiée que par partition
+        annuelle et une facture archivée n'est plus visible (app/partitioning.py).
+        """
+        marked = Estimates.objects.filter(pk=self.estimates_id_id, invoiced_at__isnull=True).update(
+            invoiced_at=self.created_at, version=F('version') + 1,
+        )
+        if not marked:
+            raise IntegrityError(f"Devis #{self.estimates_id_id} déjà facturé")
+    
+    def calculate_totals(self):
+        """Recalcul complet des totaux (une requête d'agrégat + un UPDATE)"""
+        return totals.recompute_totals(self)
+
+
+class InvoiceSequence(models.Model):
+    """Dernier numéro de facture attribué, par émetteur et par année"""
+    
+    users_id = models.ForeignKey(
+        Users,
+        on_delete=models.CASCADE,
+        db_column='users_id',
+        related_name='invoice_sequences',
+        verbose_name="Émetteur"
+    )
+    
+    year = models.IntegerField(
+        verbose_name="Année (0 = sans remise à zéro)"
+    )
+    
+    last_value = models.IntegerField(
+        default=0,
+        verbose_name="Dernier numéro attribué"
+    )
+    
+    TENANT_FIELD = 'users_id'
+    
+    objects = TenantManager()
+    
+    class Meta:
+        db_table = 'invoice_sequences'
+        verbose_name = "Séquence de facturation"
+        verbose_name_plural = "Séquences de facturation"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['users_id', 'year'],
+                name='invoice_sequences_unique_year',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.users_id_id} - {self.year} : {self.last_value}"
+
+
+class IssuedInvoiceNumber(models.Model):
+    """Numéro de facture émis, par émetteur : unicité sur toutes les années.
+    
+    invoices est partitionnée par année (app/partitioning.py) : son index
+    unique ne vaut que dans une partition et disparaît avec une année archivée.
+    Retiré quand la facture est supprimée, conservé si elle est archivée.
+    """
+    
+    users_id = models.ForeignKey(
+        Users,
+        on_delete=models.CASCADE,
+        db_column='users_id',
+        related_name='issued_invoice_numbers',
+        verbose_name="Émetteur"
+    )
+    
+    invoice_number = models.CharField(
+        max_length=255,
+        verbose_name="Numéro de facture"
+    )
+    
+    TENANT_FIELD = 'users_id'
+    
+    objects = TenantManager()
+    
+    class Meta:
+        db_table = 'invoice_numbers'
+        verbose_name = "Numéro de facture émis"
+        verbose_name_plural = "Numéros de facture émis"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['users_id', 'invoice_number'],
+                name='invoice_numbers_unique',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.users_id_id} - {self.invoice_number}"
+    
+    @classmethod
+    def reserve(cls, invoices, batch_size=None):
+        """Enregistre les numéros des factures ; IntegrityError si l'un est déjà émis"""
+        cls.objects.bulk_create([
+            cls(users_id_id=invoice.users_id_id, invoice_number=invoice.invoice_number)
+            for invoice in invoices
+        ], batch_size=batch_size)
+    
+    @classmethod
+    def release(cls, invoice):
+        cls.objects.filter(users_id=invoice.users_id_id, invoice_number=invoice.invoice_number).delete()
 
 
 class InvoiceLines(models.Model):
@@ -469,14 +781,22 @@ class InvoiceLines(models.Model):
         ('supply', 'Fourniture')
     ]
     
-    invoice = models.ForeignKey(
+    # clé étrangère composite (invoice_id, invoice_created_at) en base, voir app/partitioning.py
+    invoice = partitioning.DocumentForeignKey(
         Invoices,
         on_delete=models.CASCADE,
         db_column='invoice_id',
+        db_constraint=False,
         related_name='invoice_lines',
         verbose_name="Facture"
     )
     
+    invoice_created_at = partitioning.DocumentDateField(
+        document_field='invoice',
+        source='created_at',
+        verbose_name="Date de la facture"
+    )
+    
     description = models.TextField(
         blank=True, default='',
         null=True,
@@ -528,22 +848,505 @@ class InvoiceLines(models.Model):
         verbose_name="Note"
     )
     
+    objects = TenantManager()
+    
+    TENANT_FIELD = 'invoice__users_id'
+    
     class Meta:
         db_table = 'invoice_lines'
         verbose_name = "Ligne de facture"
         verbose_name_plural = "Lignes de facture"
     
+    DOCUMENT_FIELD = 'invoice'
+    VAT_FIELD = 'taux_vat'
+    PARTITION_FIELD = 'invoice_created_at'
+    
     def __str__(self):
         return f"{self.description} - {self.amount_et}€"
     
     def save(self, *args, **kwargs):
         if self.quantity and self.price_unit:
-            self.amount_et = Decimal(str(self.quantity)) * self.price_unit
-        super().save(*args, **kwargs)
-
-        self.invoice.calculate_totals()
+            self.amount_et = money.from_cents(money.line_amount(self.quantity, money.to_cents(self.price_unit)))
+        with transaction.atomic():
+            # état enregistré avant l'écriture, ligne verrouillée (app/totals.py)
+            self._totals_snapshot = None if self._state.adding else totals.stored_snapshot(self)
+            super().save(*args, **kwargs)
+            totals.apply_line_change(self, self._totals_snapshot, kwargs.get('update_fields'))
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            snapshot = totals.stored_snapshot(self)
+            result = super().delete(*args, **kwargs)
+            totals.apply_line_removal(self, snapshot)
+        return result
     
     def calculate_vat(self):
-        if self.amount_et and self.taux_vat:
-            return self.amount_et * (self.taux_vat / Decimal('100'))
-        return Decimal('0.00')
\ No newline at end of file
+        """TVA de la ligne, arrondie au centime (app/money.py)"""
+        return money.from_cents(money.line_vat(money.to_cents(self.amount_et), money.to_rate(self.taux_vat)))
+
+
+class RevenueRollup(models.Model):
+    """Chiffre d'affaires facturé agrégé par (utilisateur, mois, mode de paiement)"""
+    
+    users_id = models.ForeignKey(
+        Users,
+        on_delete=models.CASCADE,
+        db_column='users_id',
+        related_name='revenue_rollups',
+        verbose_name="Utilisateur"
+    )
+    
+    month = models.DateField(
+        verbose_name="Mois (1er jour)"
+    )
+    
+    payements_method = models.CharField(
+        max_length=255,
+        choices=Invoices.PAYMENTS_METHOD_CHOICES,
+        verbose_name="Mode de paiement"
+    )
+    
+    invoice_count = models.IntegerField(
+        default=0,
+        verbose_name="Nombre de factures"
+    )
+    
+    price_et = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Total HT"
+    )
+    
+    price_vat = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="TVA collectée"
+    )
+    
+    price_ati = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Total TTC"
+    )
+    
+    TENANT_FIELD = 'users_id'
+    
+    objects = TenantManager()
+    
+    class Meta:
+        db_table = 'revenue_rollups'
+        verbose_name = "Agrégat de chiffre d'affaires"
+        verbose_name_plural = "Agrégats de chiffre d'affaires"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['users_id', 'month', 'payements_method'],
+                name='revenue_rollups_unique_bucket',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.users_id_id} - {self.month:%Y-%m} - {self.payements_method} : {self.price_ati}€"
+
+
+class ClientRollup(models.Model):
+    """Factures et devis agrégés par (client, mois).
+
+    Les devis émis sur le mois et pas encore facturés (invoiced_at vide)
+    constituent l'encours : montant proposé au client, en attente de facture.
+    """
+    
+    users_id = models.ForeignKey(
+        Users,
+        on_delete=models.CASCADE,
+        db_column='users_id',
+        related_name='client_rollups',
+        verbose_name="Utilisateur"
+    )
+    
+    clients_id = models.ForeignKey(
+        Clients,
+        on_delete=models.CASCADE,
+        db_column='clients_id',
+        related_name='rollups',
+        verbose_name="Client"
+    )
+    
+    month = models.DateField(
+        verbose_name="Mois (1er jour)"
+    )
+    
+    invoice_count = models.IntegerField(
+        default=0,
+        verbose_name="Nombre de factures"
+    )
+    
+    price_et = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Facturé HT"
+    )
+    
+    price_vat = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="TVA collectée"
+    )
+    
+    price_ati = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Facturé TTC"
+    )
+    
+    estimate_count = models.IntegerField(
+        default=0,
+        verbose_name="Nombre de devis"
+    )
+    
+    outstanding_ati = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Encours TTC (devis)"
+    )
+    
+    TENANT_FIELD = 'users_id'
+    
+    objects = TenantManager()
+    
+    class Meta:
+        db_table = 'client_rollups'
+        verbose_name = "Agrégat client"
+        verbose_name_plural = "Agrégats client"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['clients_id', 'month'],
+                name='client_rollups_unique_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['users_id', 'month'], name='client_rollups_users_month_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.clients_id_id} - {self.month:%Y-%m} : {self.price_ati}€"
+
+
+class ArchivedRollup(models.Model):
+    """Montants des documents sortis des tables sans passer par les signaux.
+
+    Archivage froid (app/coldstorage.py) et partitions détachées
+    (archive_invoices) : les agrégats de reporting gardent ces montants, et
+    rebuild_reports les ajoute à ceux des tables. Par (utilisateur, client,
+    mois, mode de paiement), mode vide pour les devis.
+    """
+    
+    users_id = models.ForeignKey(
+        Users,
+        on_delete=models.CASCADE,
+        db_column='users_id',
+        related_name='archived_rollups',
+        verbose_name="Utilisateur"
+    )
+    
+    clients_id = models.ForeignKey(
+        Clients,
+        on_delete=models.SET_NULL,
+        null=True,
+        db_column='clients_id',
+        related_name='archived_rollups',
+        verbose_name="Client",
+        help_text="Vide une fois le client supprimé : la part reste dans le CA, plus dans les agrégats client"
+    )
+    
+    month = models.DateField(
+        verbose_name="Mois (1er jour)"
+    )
+    
+    payements_method = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        verbose_name="Mode de paiement (factures)"
+    )
+    
+    invoice_count = models.IntegerField(
+        default=0,
+        verbose_name="Nombre de factures"
+    )
+    
+    price_et = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Facturé HT"
+    )
+    
+    price_vat = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="TVA collectée"
+    )
+    
+    price_ati = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Facturé TTC"
+    )
+    
+    estimate_count = models.IntegerField(
+        default=0,
+        verbose_name="Nombre de devis"
+    )
+    
+    outstanding_ati = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Encours TTC (devis)"
+    )
+    
+    TENANT_FIELD = 'users_id'
+    
+    objects = TenantManager()
+    
+    class Meta:
+        db_table = 'archived_rollups'
+        verbose_name = "Montants archivés"
+        verbose_name_plural = "Montants archivés"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['users_id', 'clients_id', 'month', 'payements_method'],
+                name='archived_rollups_unique_bucket',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.clients_id_id} - {self.month:%Y-%m} - {self.payements_method or 'devis'} : {self.price_ati}€"
+
+
+class Job(models.Model):
+    """Tâche d'arrière-plan (app/jobs.py), exécutée par manage.py runworker"""
+    
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'En attente'),
+        (RUNNING, 'En cours'),
+        (DONE, 'Terminée'),
+        (FAILED, 'En échec'),
+    ]
+    
+    users_id = models.ForeignKey(
+        Users,
+        on_delete=models.CASCADE,
+        db_column='users_id',
+        related_name='jobs',
+        null=True,
+        blank=True,
+        verbose_name="Utilisateur"
+    )
+    
+    kind = models.CharField(
+        max_length=64,
+        verbose_name="Type de tâche"
+    )
+    
+    payload = models.JSONField(
+        default=dict,
+        verbose_name="Paramètres"
+    )
+    
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+        verbose_name="Statut"
+    )
+    
+    idempotency_key = models.CharField(
+        max_length=255,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name="Clé d'idempotence"
+    )
+    
+    attempts = models.IntegerField(
+        default=0,
+        verbose_name="Tentatives"
+    )
+    
+    max_attempts = models.IntegerField(
+        default=5,
+        verbose_name="Tentatives maximum"
+    )
+    
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Exécution à partir de"
+    )
+    
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Prise par un worker le"
+    )
+    
+    locked_by = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        verbose_name="Worker"
+    )
+    
+    last_error = models.TextField(
+        blank=True,
+        default='',
+        verbose_name="Dernière erreur"
+    )
+    
+    result = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name="Résultat"
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Date de création"
+    )
+    
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Date de fin"
+    )
+    
+    TENANT_FIELD = 'users_id'
+    
+    objects = TenantManager()
+    
+    class Meta:
+        db_table = 'jobs'
+        verbose_name = "Tâche"
+        verbose_name_plural = "Tâches"
+        indexes = [
+            # file d'attente : seules les tâches en attente sont indexées
+            models.Index(fields=['run_at', 'id'], name='jobs_queued_idx', condition=Q(status='queued')),
+            models.Index(fields=['locked_at'], name='jobs_running_idx', condition=Q(status='running')),
+            models.Index(fields=['users_id', '-created_at'], name='jobs_users_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class ThrottleBucket(models.Model):
+    """Seau à jetons de limitation de débit partagé entre workers (app/throttling.py).
+    
+    Table UNLOGGED (migration 0013) : pas de WAL, perdue après un arrêt brutal,
+    ce qui revient à remplir tous les seaux.
+    """
+    
+    key = models.CharField(
+        max_length=255,
+        primary_key=True,
+        verbose_name="Clé"
+    )
+    
+    tokens = models.FloatField(
+        verbose_name="Jetons restants"
+    )
+    
+    updated_at = models.DateTimeField(
+        verbose_name="Mise à jour"
+    )
+    
+    class Meta:
+        db_table = 'throttle_buckets'
+        verbose_name = "Seau de limitation"
+        verbose_name_plural = "Seaux de limitation"
+    
+    def __str__(self):
+        return f"{self.key} ({self.tokens:.1f})"
+
+
+class ArchivedDocument(models.Model):
+    """Index des documents archivés (app/coldstorage.py) : emplacement dans leur instantané"""
+    
+    KIND_CHOICES = [
+        ('invoices', 'Facture'),
+        ('estimates', 'Devis'),
+    ]
+    
+    users_id = models.ForeignKey(
+        Users,
+        on_delete=models.CASCADE,
+        db_column='users_id',
+        related_name='archived_documents',
+        verbose_name="Créé par"
+    )
+    
+    kind = models.CharField(
+        max_length=16,
+        choices=KIND_CHOICES,
+        verbose_name="Type de document"
+    )
+    
+    document_id = models.BigIntegerField(
+        verbose_name="Id du document"
+    )
+    
+    number = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Numéro de facture"
+    )
+    
+    year = models.PositiveSmallIntegerField(
+        verbose_name="Année de création"
+    )
+    
+    path = models.CharField(
+        max_length=255,
+        verbose_name="Instantané",
+        help_text="Relatif à COLD_STORAGE_DIR"
+    )
+    
+    offset = models.BigIntegerField(
+        verbose_name="Position dans l'instantané"
+    )
+    
+    length = models.PositiveIntegerField(
+        verbose_name="Taille compressée"
+    )
+    
+    archived_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Archivé le"
+    )
+    
+    class Meta:
+        db_table = 'archived_documents'
+        verbose_name = "Document archivé"
+        verbose_name_plural = "Documents archivés"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'document_id'], name='archived_documents_kind_document_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['users_id', 'kind', 'year'], name='archived_documents_users_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.document_id} -> {self.path}"
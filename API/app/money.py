@@ -0,0 +1,99 @@
+"""Calcul monétaire en centimes entiers (montants) et centièmes de % (taux).
+
+Les colonnes de prix sont en DecimalField(decimal_places=2) : les calculs se
+font en int, sans contexte Decimal, et les Decimal ne servent qu'aux bords
+(to_cents / from_cents). Arrondi commercial (demi-centime au-dessus, en
+valeur absolue), comme ROUND_HALF_UP.
+
+Deux règles d'arrondi de la TVA (VAT_ROUNDING) :
+- 'line' : TVA arrondie au centime sur chaque ligne, puis sommée ; une ligne
+  a une contribution fixe au document (mode incrémental de app/totals.py) ;
+- 'document' : HT sommé par taux, TVA arrondie une fois par taux ; toute
+  modification de ligne impose un recalcul complet du document.
+"""
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+
+
+LINE = 'line'
+DOCUMENT = 'document'
+ROUNDING_RULES = (LINE, DOCUMENT)
+
+RATE_SCALE = 10_000  # taux en centièmes de % : 20 % -> 2000
+
+CENT = Decimal('0.01')
+
+CentTotals = namedtuple('CentTotals', ['et', 'vat', 'ati'])
+
+
+def rounding_rule():
+    rule = settings.VAT_ROUNDING
+    if rule not in ROUNDING_RULES:
+        raise ValueError(f"VAT_ROUNDING invalide : {rule!r} ({' / '.join(ROUNDING_RULES)})")
+    return rule
+
+
+def to_cents(value):
+    """Decimal / int / str -> centimes (int), arrondi au centime ; None -> 0"""
+    if value is None:
+        return 0
+    if isinstance(value, int):
+        return value * 100
+    if not isinstance(value, Decimal):
+        value = Decimal(value)
+    cents = value * 100
+    integral = int(cents)
+    if cents == integral:
+        # cas courant (colonnes à deux décimales) : pas d'arrondi
+        return integral
+    return int(value.quantize(CENT, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def to_rate(value):
+    """Taux en % (Decimal '5.50') -> centièmes de % (550) ; None -> 0"""
+    return to_cents(value)
+
+
+def from_cents(cents):
+    """Centimes -> Decimal à deux décimales"""
+    return Decimal(cents).scaleb(-2).quantize(CENT)
+
+
+def divide(numerator, denominator):
+    """numerator / denominator arrondi au plus proche, demi-unité vers l'extérieur"""
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if remainder * 2 >= denominator:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+def line_amount(quantity, price_unit_cents):
+    """Montant HT d'une ligne (exact : quantité entière)"""
+    return quantity * price_unit_cents
+
+
+def line_vat(amount_cents, rate):
+    """TVA d'une ligne, arrondie au centime"""
+    return divide(amount_cents * rate, RATE_SCALE)
+
+
+def line_amounts(quantities, price_units):
+    """line_amount sur deux listes parallèles"""
+    return [quantity * price for quantity, price in zip(quantities, price_units)]
+
+
+def document_totals(amounts, rates, rule=LINE):
+    """Totaux d'un document à partir de ses lignes (HT en centimes, taux) -> CentTotals"""
+    et = sum(amounts)
+    if rule == LINE:
+        vat = sum([divide(amount * rate, RATE_SCALE) for amount, rate in zip(amounts, rates)])
+    elif rule == DOCUMENT:
+        by_rate = {}
+        for amount, rate in zip(amounts, rates):
+            by_rate[rate] = by_rate.get(rate, 0) + amount
+        vat = sum([divide(amount * rate, RATE_SCALE) for rate, amount in by_rate.items()])
+    else:
+        raise ValueError(f"Règle d'arrondi inconnue : {rule!r}")
+    return CentTotals(et, vat, et + vat)
@@ -0,0 +1,51 @@
+"""Numérotation des factures : séquence continue par émetteur (users_id).
+
+Chaque émetteur a un compteur par année (ou un seul si la remise à zéro annuelle
+est désactivée) dans la table invoice_sequences. Le compteur est verrouillé
+(SELECT ... FOR UPDATE) et incrémenté dans la transaction qui insère la
+facture : deux factures du même émetteur se sérialisent sur cette seule ligne,
+celles d'émetteurs différents ne se bloquent jamais, et un rollback annule
+aussi l'incrément (pas de trou dans la numérotation).
+
+Réglages : INVOICE_NUMBER_PREFIX, INVOICE_NUMBER_FORMAT (champs {prefix},
+{year}, {number}) et INVOICE_NUMBER_YEARLY_RESET.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+
+
+def sequence_year(day):
+    """Année du compteur ; 0 = compteur unique sans remise à zéro"""
+    return day.year if settings.INVOICE_NUMBER_YEARLY_RESET else 0
+
+
+def format_number(value, day):
+    template = settings.INVOICE_NUMBER_FORMAT
+    if settings.INVOICE_NUMBER_YEARLY_RESET and '{year' not in template:
+        raise ImproperlyConfigured(
+            "INVOICE_NUMBER_FORMAT doit contenir {year} quand INVOICE_NUMBER_YEARLY_RESET est actif"
+        )
+    return template.format(prefix=settings.INVOICE_NUMBER_PREFIX, year=day.year, number=value)
+
+
+def next_value(sequence_model, users_id, year, count=1):
+    """Réserve `count` numéros consécutifs et renvoie le premier.
+
+    Doit tourner dans la transaction qui insère les factures.
+    """
+    counters = sequence_model.objects.select_for_update().filter(users_id=users_id, year=year)
+    try:
+        counter = counters.get()
+    except sequence_model.DoesNotExist:
+        try:
+            with transaction.atomic():
+                sequence_model.objects.create(users_id_id=users_id, year=year, last_value=0)
+        except IntegrityError:
+            # créé entre-temps par une transaction concurrente
+            pass
+        counter = counters.get()
+    first = counter.last_value + 1
+    counter.last_value += count
+    counter.save(update_fields=['last_value'])
+    return first
@@ -0,0 +1,184 @@
+"""Pagination par curseur (keyset) sur un tri composite, par défaut (created_at, id).
+
+Le curseur encode les valeurs de tri de la dernière ligne renvoyée ; la page
+suivante est lue par WHERE (created_at, id) > (c, i) ORDER BY created_at, id
+LIMIT n. Le coût ne dépend pas de la profondeur de la page et les insertions
+concurrentes ne décalent pas les pages déjà parcourues.
+"""
+import base64
+import binascii
+import json
+
+from django.core import exceptions
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('created_at', 'id')
+    invalid_cursor_message = "Curseur invalide."
+
+    def __init__(self):
+        self.page_size = api_settings.PAGE_SIZE or 50
+
+    def get_ordering(self, view):
+        """Tri keyset : view.keyset_ordering sinon (created_at, id)"""
+        return tuple(getattr(view, 'keyset_ordering', None) or self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _fields(self, model, ordering):
+        return [
+            (model._meta.get_field(name.lstrip('-')), name.startswith('-'))
+            for name in ordering
+        ]
+
+    def encode_cursor(self, instance, fields):
+        values = [getattr(instance, field.attname) for field, _ in fields]
+        raw = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def invalid_cursor(self):
+        return ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+
+    def decode_cursor(self, request, fields):
+        """Valeurs de tri du curseur, converties et validées par leurs champs ; 400 si invalide"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            values = json.loads(raw)
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            decoded = []
+            for (field, _), value in zip(fields, values):
+                # null, booléen, liste... : jamais produits par encode_cursor
+                if isinstance(value, bool) or not isinstance(value, (int, str)):
+                    raise ValueError
+                value = field.to_python(value)
+                if value is None:
+                    raise ValueError
+                # bornes des entiers en base : un id hors limites ferait échouer la requête
+                field.run_validators(value)
+                decoded.append(value)
+            return decoded
+        except (binascii.Error, UnicodeDecodeError, ValueError, exceptions.ValidationError):
+            raise self.invalid_cursor()
+
+    def keyset_filter(self, fields, values):
+        """(a, b) > (x, y)  =>  a > x OR (a = x AND b > y), en tenant compte du sens"""
+        condition = Q()
+        equal = Q()
+        for (field, descending), value in zip(fields, values):
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{field.attname}__{lookup}': value})
+            equal &= Q(**{field.attname: value})
+        return condition
+
+    def page_queryset(self, queryset, request, view=None):
+        """Queryset (non évalué) de la page demandée, avec une ligne de plus
+        pour savoir s'il existe une page suivante"""
+        ordering = self.get_ordering(view)
+        fields = self._fields(queryset.model, ordering)
+        values = self.decode_cursor(request, fields)
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(fields, values))
+        return queryset[:self.get_page_size(request) + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        rows = list(self.page_queryset(queryset, request, view))
+        return self.cut_page(rows, queryset.model, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset pour les vues async : la page est lue par aiterator"""
+        self.request = request
+        page = self.page_queryset(queryset, request, view)
+        rows = [row async for row in page.aiterator(chunk_size=self.get_page_size(request) + 1)]
+        return self.cut_page(rows, queryset.model, view)
+
+    def cut_page(self, rows, model, view=None):
+        """Retire la ligne de contrôle et prépare le curseur de la page suivante"""
+        page_size = self.get_page_size(self.request)
+        self.has_next = len(rows) > page_size
+        page = rows[:page_size]
+        fields = self._fields(model, self.get_ordering(view))
+        self.next_cursor = self.encode_cursor(page[-1], fields) if self.has_next else None
+        return page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class RankedPagination(KeysetPagination):
+    """Pagination des résultats classés par score (recherche).
+
+    Le score n'est pas une colonne : le curseur encode un décalage, borné par
+    max_offset (au-delà, la requête doit être affinée).
+    """
+    max_offset = 1000
+
+    def decode_offset(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return 0
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            offset = json.loads(raw)
+            if isinstance(offset, bool) or not isinstance(offset, int) or not 0 <= offset <= self.max_offset:
+                raise ValueError
+            return offset
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise self.invalid_cursor()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        offset = self.decode_offset(request)
+        rows = list(queryset[offset:offset + page_size + 1])
+        next_offset = offset + page_size
+        self.has_next = len(rows) > page_size and next_offset <= self.max_offset
+        self.next_cursor = (
+            base64.urlsafe_b64encode(json.dumps(next_offset).encode()).decode().rstrip('=')
+            if self.has_next else None
+        )
+        return rows[:page_size]
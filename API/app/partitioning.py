@@ -0,0 +1,398 @@
+"""Partitionnement annuel des factures et de leurs lignes (PostgreSQL, RANGE).
+
+invoices est partitionnée sur created_at, invoice_lines sur invoice_created_at
+(date de création de sa facture, recopiée) : une facture et ses lignes sont
+dans les partitions de la même année (invoices_y2026, invoice_lines_y2026).
+Une requête filtrée sur ces dates ne lit que les partitions concernées ;
+vacuum, index et sauvegardes travaillent par année et une année ancienne se
+détache sans réécrire le reste (manage.py archive_invoices).
+
+Contraintes d'une table partitionnée :
+- la clé primaire contient la clé de partition : (id, created_at), id reste
+  unique par sa séquence ;
+- une contrainte unique aussi : l'unicité du numéro par émetteur et du devis
+  d'origine est portée par un index unique dans chaque partition (UNIQUE),
+  toutes années confondues par invoice_numbers et Estimates.invoiced_at ;
+- les lignes référencent leur facture par (invoice_id, invoice_created_at),
+  ON UPDATE CASCADE : elles suivent une facture qui change d'année.
+
+Les lignes lues depuis leur facture (facture.invoice_lines, prefetch_related)
+sont aussi filtrées sur invoice_created_at (DocumentForeignKey) : sans la clé
+de partition, PostgreSQL parcourt l'index de chaque année.
+
+Les partitions de l'année courante et des PARTITION_YEARS_AHEAD suivantes sont
+créées par la migration 0014 puis par le worker (runworker) à son démarrage ;
+ensure_year() crée celles d'une année encore absente avant une insertion.
+"""
+import gzip
+import hashlib
+import json
+import threading
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.dispatch import Signal
+from django.db.models.fields.related_descriptors import ReverseManyToOneDescriptor
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+
+# tables partitionnées -> clé de partition, dans l'ordre des références
+TABLES = {
+    'invoices': 'created_at',
+    'invoice_lines': 'invoice_created_at',
+}
+
+# contraintes uniques remplacées par un index unique par partition
+UNIQUE = {
+    'invoices': {
+        'invoices_users_number_unique': ('users_id', 'invoice_number'),
+        'invoices_estimates_id_key': ('estimates_id',),
+    },
+}
+
+LINES_FOREIGN_KEY = (
+    'ALTER TABLE invoice_lines ADD CONSTRAINT invoice_lines_invoice_fk '
+    'FOREIGN KEY (invoice_id, invoice_created_at) REFERENCES invoices (id, created_at) '
+    'ON UPDATE CASCADE ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED'
+)
+
+_known_years = set()
+_lock = threading.Lock()
+
+# Envoyé avant le détachement d'une année encore rattachée, dans la même
+# transaction (sender = 'invoices', year) : ses factures vont quitter la table.
+year_detaching = Signal()
+
+
+class DocumentDateField(models.DateField):
+    """Date recopiée du document parent (clé de partition des lignes).
+
+    Renseignée à l'enregistrement, bulk_create compris, depuis le document
+    chargé sur l'instance (ou lu s'il n'y a pas encore de valeur).
+    """
+
+    def __init__(self, *args, document_field='invoice', source='created_at', **kwargs):
+        self.document_field = document_field
+        self.source = source
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['document_field'] = self.document_field
+        kwargs['source'] = self.source
+        kwargs.pop('editable', None)
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        relation = model_instance._meta.get_field(self.document_field)
+        if relation.is_cached(model_instance) or model_instance.__dict__.get(self.attname) is None:
+            document = getattr(model_instance, relation.name)
+            setattr(model_instance, self.attname, getattr(document, self.source))
+        return getattr(model_instance, self.attname)
+
+
+def _document_date(document, source):
+    """Date de partition du document ; None si le champ est différé (pas de requête en plus)"""
+    if source in document.get_deferred_fields():
+        return None
+    return getattr(document, source)
+
+
+class DocumentLinesDescriptor(ReverseManyToOneDescriptor):
+    """document.<lignes> : manager filtré sur la clé de partition en plus de l'id du document"""
+
+    @cached_property
+    def related_manager_cls(self):
+        manager_class = super().related_manager_cls
+        key = self.field.partition_field
+
+        class DocumentLinesManager(manager_class):
+            def _apply_rel_filters(self, queryset):
+                queryset = super()._apply_rel_filters(queryset)
+                day = _document_date(self.instance, key.source)
+                return queryset if day is None else queryset.filter(**{key.name: day})
+
+            def get_prefetch_querysets(self, instances, querysets=None):
+                days = [_document_date(instance, key.source) for instance in instances]
+                if None not in days:
+                    querysets = [
+                        queryset.filter(**{f'{key.name}__in': sorted(set(days))})
+                        for queryset in querysets or [super(manager_class, self).get_queryset()]
+                    ]
+                return super().get_prefetch_querysets(instances, querysets)
+
+        return DocumentLinesManager
+
+
+class DocumentForeignKey(models.ForeignKey):
+    """Clé étrangère des lignes vers leur document partitionné.
+
+    Les lectures depuis le document (relation inverse, prefetch_related)
+    portent aussi sur la clé de partition (DocumentDateField de la ligne) :
+    seules les partitions des documents concernés sont lues.
+    """
+
+    related_accessor_class = DocumentLinesDescriptor
+
+    @cached_property
+    def partition_field(self):
+        return next(
+            field for field in self.model._meta.concrete_fields
+            if isinstance(field, DocumentDateField) and field.document_field == self.name
+        )
+
+
+def partition_key(model):
+    """Champ de partition de model, None si sa table n'est pas partitionnée"""
+    return TABLES.get(model._meta.db_table)
+
+
+def pruning_filter(model, days):
+    """{clé__in: days} pour une table partitionnée, {} sinon"""
+    key = partition_key(model)
+    return {f'{key}__in': sorted(set(days))} if key else {}
+
+
+def instance_filter(instance):
+    """Filtre sur l'instance : pk et, si elle est chargée, sa clé de partition"""
+    key = partition_key(type(instance))
+    lookup = {'pk': instance.pk}
+    if key and key not in instance.get_deferred_fields():
+        lookup[key] = getattr(instance, key)
+    return lookup
+
+
+def partition_name(table, year):
+    return f"{table}_y{year}"
+
+
+def year_bounds(year):
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def attached_years(table):
+    """Années des partitions rattachées à table, triées"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass",
+            [table],
+        )
+        prefix = f"{table}_y"
+        return sorted(int(name[len(prefix):]) for name, in cursor.fetchall() if name.startswith(prefix))
+
+
+def create_partition(cursor, table, year):
+    """Crée la partition de l'année (et ses index uniques) ; False si elle existe déjà"""
+    name = partition_name(table, year)
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    if cursor.fetchone()[0] is not None:
+        return False
+    quote = connection.ops.quote_name
+    cursor.execute(
+        f"CREATE TABLE {quote(name)} PARTITION OF {quote(table)} FOR VALUES FROM (%s) TO (%s)",
+        list(year_bounds(year)),
+    )
+    for columns in UNIQUE.get(table, {}).values():
+        index = f"{name}_{'_'.join(columns)}_key"
+        cursor.execute(
+            f"CREATE UNIQUE INDEX {quote(index)} ON {quote(name)} ({', '.join(map(quote, columns))})"
+        )
+    return True
+
+
+def ensure_year(year):
+    """Crée au besoin les partitions de l'année pour toutes les tables.
+
+    Vérifié une fois par processus et par année ; la création prend un verrou
+    exclusif sur la table parente jusqu'à la fin de la transaction en cours.
+    """
+    if year in _known_years:
+        return
+    with transaction.atomic(), connection.cursor() as cursor:
+        # deux processus qui créent la même année : le second attend puis voit la partition
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [f"partitions:{year}"])
+        for table in TABLES:
+            create_partition(cursor, table, year)
+
+    def remember():
+        with _lock:
+            _known_years.add(year)
+
+    # mémorisé au commit : une création annulée (rollback) sera refaite
+    transaction.on_commit(remember)
+
+
+def create_future_partitions(ahead=None):
+    """Partitions de l'année courante et des `ahead` suivantes ; retourne les années"""
+    ahead = settings.PARTITION_YEARS_AHEAD if ahead is None else ahead
+    current = timezone.localdate().year
+    years = list(range(current, current + ahead + 1))
+    for year in years:
+        ensure_year(year)
+    return years
+
+
+# -- Archivage (manage.py archive_invoices) ----------------------------------
+
+def partition_years(table):
+    """Années des tables table_yAAAA, rattachées ou détachées, triées"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname FROM pg_class WHERE relnamespace = current_schema()::regnamespace "
+            "AND relkind IN ('r', 'p') AND relname ~ %s",
+            [f"^{table}_y[0-9]{{4}}$"],
+        )
+        return sorted(int(name[-4:]) for name, in cursor.fetchall())
+
+
+def detach_year(year):
+    """Détache les partitions de l'année ; elles restent en base comme tables ordinaires.
+
+    Les lignes d'abord : leur clé étrangère vers invoices est supprimée de la
+    table détachée, sans quoi la facture ne pourrait plus être détachée.
+    """
+    quote = connection.ops.quote_name
+    lines, invoices = partition_name('invoice_lines', year), partition_name('invoices', year)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if year in attached_years('invoices'):
+            year_detaching.send('invoices', year=year)
+        if year in attached_years('invoice_lines'):
+            cursor.execute(f"ALTER TABLE invoice_lines DETACH PARTITION {quote(lines)}")
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND confrelid = 'invoices'::regclass",
+            [lines],
+        )
+        for name, in cursor.fetchall():
+            cursor.execute(f"ALTER TABLE {quote(lines)} DROP CONSTRAINT {quote(name)}")
+        if year in attached_years('invoices'):
+            cursor.execute(f"ALTER TABLE invoices DETACH PARTITION {quote(invoices)}")
+    with _lock:
+        _known_years.discard(year)
+
+
+def export_table(name, path):
+    """COPY de la table en CSV gzip (en-tête, tri par id) ; retourne (lignes, SHA-256 du fichier)"""
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {quote(name)}")
+        rows = cursor.fetchone()[0]
+        with gzip.open(path, 'wb') as output:
+            with cursor.copy(f"COPY (SELECT * FROM {quote(name)} ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER)") as copy:
+                for data in copy:
+                    output.write(data)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as archive:
+        for block in iter(lambda: archive.read(1 << 20), b''):
+            digest.update(block)
+    return rows, digest.hexdigest()
+
+
+def archive_year(year, directory, drop=False):
+    """Détache l'année, exporte ses tables dans directory/AAAA/ avec manifest.json.
+
+    drop=True supprime ensuite les tables détachées. Retourne le manifeste.
+    """
+    detach_year(year)
+    target = Path(directory) / str(year)
+    target.mkdir(parents=True, exist_ok=True)
+    manifest = {'year': year, 'archived_at': timezone.now().isoformat(timespec='seconds'), 'tables': {}}
+    for table in TABLES:
+        name = partition_name(table, year)
+        path = target / f"{name}.csv.gz"
+        rows, sha256 = export_table(name, path)
+        manifest['tables'][table] = {'file': path.name, 'rows': rows, 'sha256': sha256}
+    (target / 'manifest.json').write_text(json.dumps(manifest, indent=2))
+    if drop:
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for table in reversed(TABLES):
+                cursor.execute(f"DROP TABLE {quote(partition_name(table, year))}")
+    return manifest
+
+
+# -- Conversion (migration 0014) ---------------------------------------------
+
+def _definitions(cursor, table):
+    """(index hors contraintes, clés étrangères) de table, à recréer après reconstruction"""
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s "
+        "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype IN ('p', 'u'))",
+        [table, table],
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f' ORDER BY conname",
+        [table],
+    )
+    return indexes, cursor.fetchall()
+
+
+def rebuild(cursor, table, partitioned, ahead=1):
+    """Recrée table, partitionnée par année (ou non) : données, index, clés étrangères.
+
+    Les index sont construits après la copie des données. Aucune autre table
+    ne doit référencer table pendant l'opération.
+    """
+    quote = connection.ops.quote_name
+    key = TABLES[table]
+    old = f"{table}_before_partitioning" if partitioned else f"{table}_partitioned"
+    indexes, foreign_keys = _definitions(cursor, table)
+
+    cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old)}")
+    clause = f" PARTITION BY RANGE ({quote(key)})" if partitioned else ""
+    cursor.execute(
+        f"CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS "
+        f"INCLUDING STORAGE){clause}"
+    )
+    # identité ou séquence de l'ancienne table, supprimée avec elle
+    cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN id DROP DEFAULT")
+    if partitioned:
+        cursor.execute(f"SELECT DISTINCT EXTRACT(YEAR FROM {quote(key)})::int FROM {quote(old)}")
+        current = timezone.localdate().year
+        years = {row[0] for row in cursor.fetchall()} | set(range(current, current + ahead + 1))
+        for year in sorted(years):
+            create_partition(cursor, table, year)
+    cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(old)}")
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {quote(old)}")
+    last_id = cursor.fetchone()[0]
+    cursor.execute(f"DROP TABLE {quote(old)}")
+
+    sequence = f"{table}_id_seq"
+    if partitioned:
+        # pas de colonne d'identité sur une table partitionnée avant PostgreSQL 17
+        cursor.execute(f"CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.id")
+        cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN id SET DEFAULT nextval(%s::regclass)", [sequence])
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + '_pkey')} PRIMARY KEY (id, {quote(key)})")
+    else:
+        cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY")
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + '_pkey')} PRIMARY KEY (id)")
+        for name, columns in UNIQUE.get(table, {}).items():
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} UNIQUE ({', '.join(map(quote, columns))})"
+            )
+    if last_id:
+        cursor.execute("SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)", [table, last_id])
+    for definition in indexes:
+        cursor.execute(definition)
+    for name, definition in foreign_keys:
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}")
+
+
+def partition_tables(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            rebuild(cursor, table, partitioned=True, ahead=settings.PARTITION_YEARS_AHEAD)
+        cursor.execute(LINES_FOREIGN_KEY)
+
+
+def unpartition_tables(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("ALTER TABLE invoice_lines DROP CONSTRAINT invoice_lines_invoice_fk")
+        for table in reversed(TABLES):
+            rebuild(cursor, table, partitioned=False)
@@ -0,0 +1,74 @@
+"""Hachage et vérification des mots de passe sur un pool de threads borné.
+
+Les hasheurs (scrypt, argon2, PBKDF2) coûtent des dizaines de millisecondes
+de CPU par appel. Ils passent par un pool de AUTH_HASH_WORKERS threads par
+processus (hashlib et argon2-cffi relâchent le GIL) : le nombre de calculs
+simultanés est borné quel que soit le nombre de requêtes de connexion. Au-delà
+de AUTH_HASH_QUEUE calculs en attente, ou après AUTH_HASH_TIMEOUT secondes
+d'attente d'une place, HashPoolBusy est levée (503 côté API) au lieu
+d'empiler les requêtes sur le worker.
+
+Le pool est créé au premier appel dans chaque processus (après le fork des
+workers gunicorn, preload_app).
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+
+class HashPoolBusy(Exception):
+    """Trop de calculs de hash en attente"""
+
+
+_lock = threading.Lock()
+_state = {'pid': None, 'pool': None, 'slots': None}
+
+
+def _pool():
+    with _lock:
+        if _state['pid'] != os.getpid():
+            workers = settings.AUTH_HASH_WORKERS
+            _state.update(
+                pid=os.getpid(),
+                pool=ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hash'),
+                slots=threading.BoundedSemaphore(workers + settings.AUTH_HASH_QUEUE),
+            )
+        return _state['pool'], _state['slots']
+
+
+def reset():
+    """Ferme le pool (tests, changement de réglages) ; recréé au prochain appel"""
+    with _lock:
+        pool = _state['pool']
+        _state.update(pid=None, pool=None, slots=None)
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def _submit(function, *args):
+    pool, slots = _pool()
+    if not slots.acquire(timeout=settings.AUTH_HASH_TIMEOUT):
+        raise HashPoolBusy()
+    try:
+        return pool.submit(function, *args).result()
+    finally:
+        slots.release()
+
+
+def hash_password(raw_password):
+    """Hash avec le hasheur préféré (PASSWORD_HASHERS[0])"""
+    return _submit(make_password, raw_password)
+
+
+def _verify(raw_password, encoded):
+    outdated = []
+    valid = check_password(raw_password, encoded, setter=lambda raw: outdated.append(True))
+    return valid, bool(outdated)
+
+
+def verify_password(raw_password, encoded):
+    """(valide, à re-hacher) : à re-hacher si le hasheur ou ses paramètres ont changé"""
+    return _submit(_verify, raw_password, encoded)
@@ -0,0 +1,175 @@
+"""Rendu PDF des devis et factures, en Python pur.
+
+Ce module n'importe pas Django : il tourne tel quel dans les processus du pool
+de rendu (app.rendering). Il reçoit un dict (voir rendering.document_payload)
+et renvoie les octets du PDF (texte en Helvetica, encodage WinAnsi).
+"""
+from decimal import Decimal
+
+
+PAGE_WIDTH = 595   # A4, en points
+PAGE_HEIGHT = 842
+MARGIN = 50
+LINE_HEIGHT = 14
+
+# Largeurs Helvetica (unités /1000) des caractères utilisés pour aligner les montants
+_WIDTHS = {' ': 278, '.': 278, ',': 278, '-': 333, '%': 889, '€': 556}
+_DEFAULT_WIDTH = 556
+
+
+def text_width(text, size):
+    return sum(_WIDTHS.get(char, _DEFAULT_WIDTH) for char in text) * size / 1000
+
+
+def wrap_text(text, width, size=10):
+    """Découpe text en lignes d'au plus width points (mots trop longs coupés)"""
+    rows = []
+    for paragraph in str(text).splitlines() or ['']:
+        row = ''
+        for word in paragraph.split():
+            candidate = f"{row} {word}" if row else word
+            if text_width(candidate, size) <= width:
+                row = candidate
+                continue
+            if row:
+                rows.append(row)
+            while text_width(word, size) > width:
+                cut = next((end for end in range(len(word) - 1, 0, -1) if text_width(word[:end], size) <= width), 1)
+                rows.append(word[:cut])
+                word = word[cut:]
+            row = word
+        rows.append(row)
+    return rows
+
+
+def _escape(text):
+    encoded = str(text).encode('cp1252', errors='replace').decode('latin-1')
+    return encoded.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+class PdfDocument:
+    """Écriture minimale d'un PDF 1.4 : pages, texte et traits"""
+
+    def __init__(self):
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.pages.append([])
+
+    def text(self, x, y, text, size=10, bold=False):
+        font = 'F2' if bold else 'F1'
+        self.pages[-1].append(f"BT /{font} {size} Tf {x:.2f} {y:.2f} Td ({_escape(text)}) Tj ET")
+
+    def text_right(self, x, y, text, size=10, bold=False):
+        self.text(x - text_width(str(text), size), y, text, size, bold)
+
+    def line(self, x1, y1, x2, y2):
+        self.pages[-1].append(f"{x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S")
+
+    def render(self):
+        objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            None,  # arbre des pages, écrit une fois les pages numérotées
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+        ]
+        page_ids = []
+        for operations in self.pages:
+            content = "\n".join(operations).encode('latin-1')
+            objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+            objects.append((
+                "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                "/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+                % (PAGE_WIDTH, PAGE_HEIGHT, len(objects))
+            ).encode())
+            page_ids.append(len(objects))
+        kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+        objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+        output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+        xref = len(output)
+        output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        for offset in offsets:
+            output += b"%010d 00000 n \n" % offset
+        output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+        return bytes(output)
+
+
+def money(value):
+    amount = Decimal(value or 0).quantize(Decimal('0.01'))
+    return f"{amount:,.2f} €".replace(',', ' ').replace('.', ',')
+
+
+DESCRIPTION_WIDTH = 240  # jusqu'à la colonne Qté
+
+COLUMNS = [
+    # (titre, x, alignement à droite)
+    ("Description", MARGIN, False),
+    ("Qté", 330, True),
+    ("PU HT", 400, True),
+    ("TVA %", 460, True),
+    ("Montant HT", PAGE_WIDTH - MARGIN, True),
+]
+
+
+def render_document(payload):
+    """Met en page un devis / une facture et renvoie le PDF (bytes)"""
+    pdf = PdfDocument()
+    y = PAGE_HEIGHT - MARGIN
+
+    pdf.text(MARGIN, y, payload['title'], size=18, bold=True)
+    pdf.text_right(PAGE_WIDTH - MARGIN, y, f"Date : {payload['date']}")
+    y -= 2 * LINE_HEIGHT
+    for label in payload['issuer']:
+        pdf.text(MARGIN, y, label)
+        y -= LINE_HEIGHT
+    client_y = PAGE_HEIGHT - MARGIN - 2 * LINE_HEIGHT
+    for label in payload['client']:
+        pdf.text(330, client_y, label)
+        client_y -= LINE_HEIGHT
+    y = min(y, client_y) - LINE_HEIGHT
+
+    def table_header(y):
+        for title, x, right in COLUMNS:
+            (pdf.text_right if right else pdf.text)(x, y, title, bold=True)
+        pdf.line(MARGIN, y - 4, PAGE_WIDTH - MARGIN, y - 4)
+        return y - LINE_HEIGHT - 4
+
+    y = table_header(y)
+    top = y
+    for line in payload['lines']:
+        rows = wrap_text(line['description'] or '', DESCRIPTION_WIDTH)
+        # la ligne reste sur une page si elle y tient
+        if y < top and y - (len(rows) - 1) * LINE_HEIGHT < MARGIN + 5 * LINE_HEIGHT:
+            pdf.new_page()
+            y = top = table_header(PAGE_HEIGHT - MARGIN)
+        pdf.text_right(330, y, line['quantity'] if line['quantity'] is not None else '')
+        pdf.text_right(400, y, money(line['price_unit']))
+        pdf.text_right(460, y, line['rate_vat'] if line['rate_vat'] is not None else '')
+        pdf.text_right(PAGE_WIDTH - MARGIN, y, money(line['amount_et']))
+        for row in rows:
+            if y < MARGIN:
+                pdf.new_page()
+                y = top = table_header(PAGE_HEIGHT - MARGIN)
+            pdf.text(MARGIN, y, row)
+            y -= LINE_HEIGHT
+
+    y -= LINE_HEIGHT
+    if y < MARGIN + 4 * LINE_HEIGHT:
+        # description longue en bas de page : totaux sur la suivante
+        pdf.new_page()
+        y = PAGE_HEIGHT - MARGIN
+    pdf.line(330, y + LINE_HEIGHT - 4, PAGE_WIDTH - MARGIN, y + LINE_HEIGHT - 4)
+    for label, key, bold in (("Total HT", 'price_et', False), ("TVA", 'price_vat', False), ("Total TTC", 'price_ati', True)):
+        pdf.text(330, y, label, bold=bold)
+        pdf.text_right(PAGE_WIDTH - MARGIN, y, money(payload['totals'][key]), bold=bold)
+        y -= LINE_HEIGHT
+    for label in payload.get('footer', []):
+        y -= LINE_HEIGHT
+        pdf.text(MARGIN, y, label, size=9)
+    return pdf.render()
@@ -0,0 +1,197 @@
+"""Production des PDF de devis et factures : cache disque et pool de processus.
+
+- les données sont lues en une passe (select_related + prefetch des lignes) et
+  converties en dicts simples ;
+- le cache est adressé par contenu : la clé est le SHA-256 du dict (id,
+  modified_at, totaux, lignes...). Un document inchangé n'est jamais re-rendu,
+  un document modifié (même sans changement de modified_at) l'est ;
+- les rendus manquants partent sur un ProcessPoolExecutor (app.pdf n'importe
+  pas Django, les processus n'ont pas besoin de la base) ;
+- les anciennes versions d'un document ne sont supprimées qu'après
+  RENDER_CACHE_GRACE secondes : une requête qui vient de les trouver peut
+  encore les ouvrir, et open_one re-rend un fichier disparu entre-temps.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from app import pdf
+from app.models import Estimates, EstimateLines, Invoices, InvoiceLines
+
+
+RENDERER_VERSION = 2
+
+KINDS = {
+    'estimates': (Estimates, EstimateLines),
+    'invoices': (Invoices, InvoiceLines),
+}
+
+
+def _client_labels(client):
+    if client.clients_type == 'individuals':
+        name = f"{client.first_name or ''} {client.last_name or ''}".strip()
+    else:
+        name = client.name_organisation
+    labels = [name, client.address, client.postal_code, client.email]
+    if client.siret:
+        labels.append(f"SIRET : {client.siret}")
+    return [label for label in labels if label]
+
+
+def document_title(kind, document):
+    if kind == 'invoices':
+        return f"Facture n° {document.invoice_number}"
+    return f"Devis n° {document.pk}"
+
+
+def document_payload(kind, document):
+    """Dict autonome (JSON / pickle) décrivant le document à mettre en page"""
+    user = document.users_id
+    lines = getattr(document, document.LINES_RELATED_NAME).all()
+    vat_field = KINDS[kind][1].VAT_FIELD
+    if kind == 'invoices':
+        footer = [
+            f"Mode de paiement : {document.get_payements_method_display()}",
+            f"Date de paiement : {document.payment_date}",
+        ]
+    else:
+        footer = ["Devis valable 30 jours."]
+    payload = {
+        'version': RENDERER_VERSION,
+        'kind': kind,
+        'id': document.pk,
+        'modified_at': document.modified_at,
+        'title': document_title(kind, document),
+        'date': document.created_at,
+        'issuer': [user.name_business, user.email],
+        'client': _client_labels(document.clients_id),
+        'lines': [
+            {
+                'description': line.description,
+                'quantity': line.quantity,
+                'price_unit': line.price_unit,
+                'rate_vat': getattr(line, vat_field),
+                'amount_et': line.amount_et,
+            }
+            for line in lines
+        ],
+        'totals': {
+            'price_et': document.price_et,
+            'price_vat': document.price_vat,
+            'price_ati': document.price_ati,
+        },
+        'footer': footer,
+    }
+    # normalisé en types JSON : sert de clé de cache et passe tel quel au pool
+    return json.loads(json.dumps(payload, cls=DjangoJSONEncoder))
+
+
+def cache_key(payload):
+    raw = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def load_payloads(kind, queryset):
+    """Charge les documents et leurs lignes en trois requêtes, quel que soit leur nombre"""
+    document_model, line_model = KINDS[kind]
+    documents = (
+        queryset.select_related('users_id', 'clients_id')
+        .prefetch_related(Prefetch(document_model.LINES_RELATED_NAME, queryset=line_model.objects.order_by('id')))
+        .order_by('id')
+    )
+    return [document_payload(kind, document) for document in documents]
+
+
+class RenderCache:
+    """Cache disque : <racine>/<type>/<id>/<sha256>.pdf, écrit de façon atomique"""
+
+    def __init__(self, directory=None, grace=None):
+        self.directory = Path(directory or settings.RENDER_CACHE_DIR)
+        self.grace = settings.RENDER_CACHE_GRACE if grace is None else grace
+
+    def path(self, payload):
+        return self.directory / payload['kind'] / str(payload['id']) / f"{cache_key(payload)}.pdf"
+
+    def get(self, payload):
+        path = self.path(payload)
+        return path if path.exists() else None
+
+    def put(self, payload, content):
+        path = self.path(payload)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=path.parent, suffix='.tmp', delete=False) as tmp:
+            tmp.write(content)
+        os.replace(tmp.name, path)
+        self.prune(path)
+        return path
+
+    def prune(self, current):
+        """Supprime les autres versions du document écrites avant le délai de grâce"""
+        limit = time.time() - self.grace
+        for stale in current.parent.glob('*.pdf'):
+            if stale == current:
+                continue
+            try:
+                if stale.stat().st_mtime < limit:
+                    stale.unlink()
+            except FileNotFoundError:
+                # supprimé par une requête concurrente
+                pass
+
+
+def render_one(kind, document, cache=None):
+    """Rendu d'un document dans le processus courant (ou lecture du cache)"""
+    cache = cache or RenderCache()
+    payload = load_payloads(kind, type(document)._default_manager.filter(pk=document.pk))[0]
+    return cache.get(payload) or cache.put(payload, pdf.render_document(payload))
+
+
+def open_one(kind, document, cache=None):
+    """PDF du document ouvert en lecture ; re-rendu si le fichier en cache a disparu"""
+    cache = cache or RenderCache()
+    payload = load_payloads(kind, type(document)._default_manager.filter(pk=document.pk))[0]
+    path = cache.get(payload)
+    if path is not None:
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            pass
+    return open(cache.put(payload, pdf.render_document(payload)), 'rb')
+
+
+def render_batch(kind, queryset, workers=None, cache=None):
+    """Rend en parallèle tous les documents du queryset absents du cache.
+
+    Retourne {'rendered': n, 'cached': n, 'paths': {id: chemin}}.
+    """
+    cache = cache or RenderCache()
+    payloads = load_payloads(kind, queryset)
+    paths = {}
+    missing = []
+    for payload in payloads:
+        path = cache.get(payload)
+        if path:
+            paths[payload['id']] = path
+        else:
+            missing.append(payload)
+
+    workers = workers or settings.RENDER_WORKERS or os.cpu_count() or 1
+    if len(missing) <= 1 or workers == 1:
+        results = map(pdf.render_document, missing)
+        for payload, content in zip(missing, results):
+            paths[payload['id']] = cache.put(payload, content)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(missing))) as pool:
+            chunksize = max(1, len(missing) // (workers * 4))
+            results = pool.map(pdf.render_document, missing, chunksize=chunksize)
+            for payload, content in zip(missing, results):
+                paths[payload['id']] = cache.put(payload, content)
+    return {'rendered': len(missing), 'cached': len(payloads) - len(missing), 'paths': paths}
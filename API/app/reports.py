@@ -0,0 +1,353 @@
+"""Tables de reporting pré-agrégées : CA, TVA collectée et encours.
+
+- RevenueRollup : factures par (utilisateur, mois, mode de paiement) ;
+- ClientRollup : factures et devis par (client, mois) ; l'encours ne compte
+  que les devis pas encore facturés (invoiced_at vide).
+
+Les écritures de factures / devis appliquent leur delta aux agrégats (voir
+app/signals.py) ; la facturation d'un devis (UPDATE direct de invoiced_at) passe
+par estimates_invoiced. Un recalcul complet des totaux d'un document ne fournit pas de
+delta : seuls les agrégats concernés sont alors recalculés. La commande
+rebuild_reports reconstruit tout.
+
+Les documents sortis des tables sans signaux (archivage froid, partition
+détachée) restent comptés : documents_archived reporte leurs montants dans
+ArchivedRollup, que les reconstructions ajoutent aux GROUP BY des tables.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+from app.models import ArchivedRollup, ClientRollup, Estimates, Invoices, RevenueRollup
+
+
+ZERO = Decimal('0.00')
+
+InvoiceBucket = namedtuple(
+    'InvoiceBucket',
+    ['users_id', 'clients_id', 'month', 'payements_method', 'price_et', 'price_vat', 'price_ati'],
+)
+EstimateBucket = namedtuple('EstimateBucket', ['users_id', 'clients_id', 'month', 'price_ati'])
+
+INVOICE_FIELDS = ('users_id_id', 'clients_id_id', 'created_at', 'payements_method', 'price_et', 'price_vat', 'price_ati')
+ESTIMATE_FIELDS = ('users_id_id', 'clients_id_id', 'created_at', 'price_ati', 'invoiced_at')
+
+INVOICE_AMOUNTS = ('invoice_count', 'price_et', 'price_vat', 'price_ati')
+ESTIMATE_AMOUNTS = ('estimate_count', 'outstanding_ati')
+
+
+def month_of(day):
+    return day.replace(day=1) if day else None
+
+
+def _values(document, fields, loaded):
+    """Valeurs du document : en base au chargement (loaded) ou en mémoire"""
+    if loaded:
+        values = getattr(document, '_loaded_values', None)
+        if values is None or not set(fields) <= set(values):
+            return None
+        return [values[name] for name in fields]
+    return [getattr(document, name) for name in fields]
+
+
+def invoice_bucket(document, loaded=False):
+    values = _values(document, INVOICE_FIELDS, loaded)
+    if values is None:
+        return None
+    users_id, clients_id, created_at, method, et, vat, ati = values
+    return InvoiceBucket(users_id, clients_id, month_of(created_at), method, et or ZERO, vat or ZERO, ati or ZERO)
+
+
+def estimate_bucket(document, loaded=False):
+    values = _values(document, ESTIMATE_FIELDS, loaded)
+    if values is None:
+        return None
+    users_id, clients_id, created_at, ati, invoiced_at = values
+    # price_ati du bucket : part du devis dans l'encours
+    outstanding = ZERO if invoiced_at else ati or ZERO
+    return EstimateBucket(users_id, clients_id, month_of(created_at), outstanding)
+
+
+def _bump(model, key, deltas, create=True):
+    """UPDATE ... SET col = col + delta sur l'agrégat, créé s'il n'existe pas (si create)"""
+    updates = {name: F(name) + value for name, value in deltas.items()}
+    if model.objects.filter(**key).update(**updates) or not create:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **deltas)
+    except IntegrityError:
+        # créé entre-temps par une transaction concurrente
+        model.objects.filter(**key).update(**updates)
+
+
+def apply_invoice(bucket, sign=1, count=1):
+    if bucket is None or bucket.month is None:
+        return
+    amounts = {
+        'invoice_count': sign * count,
+        'price_et': sign * bucket.price_et,
+        'price_vat': sign * bucket.price_vat,
+        'price_ati': sign * bucket.price_ati,
+    }
+    # un retrait ne crée pas d'agrégat : absent, il a été supprimé avec son client
+    create = sign * count > 0
+    _bump(
+        RevenueRollup,
+        {'users_id_id': bucket.users_id, 'month': bucket.month, 'payements_method': bucket.payements_method},
+        amounts,
+        create,
+    )
+    _bump(
+        ClientRollup,
+        {'users_id_id': bucket.users_id, 'clients_id_id': bucket.clients_id, 'month': bucket.month},
+        amounts,
+        create,
+    )
+
+
+def apply_estimate(bucket, sign=1, count=1):
+    if bucket is None or bucket.month is None:
+        return
+    _bump(
+        ClientRollup,
+        {'users_id_id': bucket.users_id, 'clients_id_id': bucket.clients_id, 'month': bucket.month},
+        {'estimate_count': sign * count, 'outstanding_ati': sign * bucket.price_ati},
+        sign * count > 0,
+    )
+
+
+def _handlers(document_model):
+    if document_model is Invoices:
+        return invoice_bucket, apply_invoice, INVOICE_FIELDS
+    return estimate_bucket, apply_estimate, ESTIMATE_FIELDS
+
+
+def document_saving(document):
+    """Avant un UPDATE : complète depuis la base l'état précédent des champs différés"""
+    if document._state.adding or document.pk is None:
+        return
+    fields = _handlers(type(document))[2]
+    values = getattr(document, '_loaded_values', None) or {}
+    missing = [name for name in fields if name not in values]
+    if missing:
+        row = type(document)._base_manager.filter(pk=document.pk).values(*missing).first()
+        if row is not None:
+            document._loaded_values = {**values, **row}
+
+
+def document_saved(document, created):
+    """Retire l'ancienne contribution du document et ajoute la nouvelle"""
+    bucket_of, apply, fields = _handlers(type(document))
+    after = bucket_of(document)
+    before = None if created else bucket_of(document, loaded=True)
+    if not created and before is None:
+        # état précédent introuvable (ligne absente avant l'UPDATE) : recalcul des agrégats visés
+        rebuild_buckets(type(document), [after])
+    elif before != after:
+        apply(before, sign=-1)
+        apply(after)
+    document._loaded_values = {name: getattr(document, name) for name in fields}
+
+
+def document_deleted(document):
+    bucket_of, apply, _ = _handlers(type(document))
+    apply(bucket_of(document, loaded=True) or bucket_of(document), sign=-1)
+
+
+def invoices_created(invoices):
+    """Factures insérées par bulk_create (pas de post_save) : un delta par agrégat"""
+    grouped = {}
+    for invoice in invoices:
+        bucket = invoice_bucket(invoice)
+        key = bucket[:4]
+        count, et, vat, ati = grouped.get(key, (0, ZERO, ZERO, ZERO))
+        grouped[key] = (count + 1, et + bucket.price_et, vat + bucket.price_vat, ati + bucket.price_ati)
+        invoice._loaded_values = {name: getattr(invoice, name) for name in INVOICE_FIELDS}
+    for key, (count, et, vat, ati) in grouped.items():
+        apply_invoice(InvoiceBucket(*key, et, vat, ati), count=count)
+
+
+def estimates_invoiced(ids, sign=1):
+    """Devis marqués facturés (sign=1) ou rendus à l'encours (sign=-1) par UPDATE direct"""
+    outstanding = {'ati': Coalesce(Sum('price_ati'), Value(ZERO))}
+    for row in _grouped(Estimates.objects.filter(pk__in=ids), ('users_id', 'clients_id'), outstanding):
+        apply_estimate(
+            EstimateBucket(row['users_id'], row['clients_id'], row['bucket_month'], row['ati']),
+            sign=-sign,
+            count=0,
+        )
+
+
+def totals_changed(document_model, document_id, delta_et, delta_vat):
+    """Variation des totaux d'un document écrite par app.totals (UPDATE direct)"""
+    if document_model is Invoices:
+        fields = ('users_id', 'clients_id', 'created_at', 'payements_method')
+    elif document_model is Estimates:
+        fields = ('users_id', 'clients_id', 'created_at', 'invoiced_at')
+    else:
+        return
+    row = document_model._default_manager.filter(pk=document_id).values(*fields).first()
+    if row is None:
+        return
+    month = month_of(row['created_at'])
+    if delta_et is None:
+        if document_model is Invoices:
+            bucket = InvoiceBucket(row['users_id'], row['clients_id'], month, row['payements_method'], ZERO, ZERO, ZERO)
+        else:
+            bucket = EstimateBucket(row['users_id'], row['clients_id'], month, ZERO)
+        rebuild_buckets(document_model, [bucket])
+    elif document_model is Invoices:
+        apply_invoice(
+            InvoiceBucket(row['users_id'], row['clients_id'], month, row['payements_method'],
+                          delta_et, delta_vat, delta_et + delta_vat),
+            count=0,
+        )
+    elif row['invoiced_at'] is None:
+        apply_estimate(EstimateBucket(row['users_id'], row['clients_id'], month, delta_et + delta_vat), count=0)
+
+
+def _next_month(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _grouped(documents, keys, amounts):
+    return (
+        documents.annotate(bucket_month=TruncMonth('created_at'))
+        .values(*keys, 'bucket_month')
+        .annotate(count=Count('id'), **amounts)
+        .order_by()
+    )
+
+
+def _invoice_amounts():
+    return {
+        'et': Coalesce(Sum('price_et'), Value(ZERO)),
+        'vat': Coalesce(Sum('price_vat'), Value(ZERO)),
+        'ati': Coalesce(Sum('price_ati'), Value(ZERO)),
+    }
+
+
+def _estimate_amounts():
+    return {'ati': Coalesce(Sum('price_ati', filter=Q(invoiced_at__isnull=True)), Value(ZERO))}
+
+
+def documents_archived(document_model, documents):
+    """Documents sur le point de sortir des tables sans signaux : montants reportés dans ArchivedRollup"""
+    if document_model is Invoices:
+        rows = _grouped(documents, ('users_id', 'clients_id', 'payements_method'), _invoice_amounts())
+    else:
+        rows = _grouped(documents, ('users_id', 'clients_id'), _estimate_amounts())
+    for row in rows:
+        key = {
+            'users_id_id': row['users_id'], 'clients_id_id': row['clients_id'], 'month': row['bucket_month'],
+            'payements_method': row.get('payements_method', ''),
+        }
+        if document_model is Invoices:
+            amounts = dict(zip(INVOICE_AMOUNTS, (row['count'], row['et'], row['vat'], row['ati'])))
+        else:
+            amounts = dict(zip(ESTIMATE_AMOUNTS, (row['count'], row['ati'])))
+        _bump(ArchivedRollup, key, amounts)
+
+
+def _add_archived(rows, archived, keys, amounts, rollup_of):
+    """Ajoute aux agrégats reconstruits (rows, par clé) les montants archivés correspondants"""
+    # users_id : champ de l'agrégat créé, même hors de la clé
+    grouping = dict.fromkeys((*keys, 'users_id'))
+    totals = archived.values(*grouping).annotate(**{f'archived_{name}': Sum(name) for name in amounts}).order_by()
+    for row in totals:
+        rollup = rows.setdefault(tuple(row[key] for key in keys), rollup_of(row))
+        for name in amounts:
+            setattr(rollup, name, getattr(rollup, name) + row[f'archived_{name}'])
+
+
+def _rebuild_revenue(invoices, archived, rollups):
+    """Remplace les agrégats RevenueRollup ciblés : GROUP BY des factures ciblées et part archivée"""
+    rows = {
+        (row['users_id'], row['bucket_month'], row['payements_method']): RevenueRollup(
+            users_id_id=row['users_id'], month=row['bucket_month'], payements_method=row['payements_method'],
+            invoice_count=row['count'], price_et=row['et'], price_vat=row['vat'], price_ati=row['ati'],
+        )
+        for row in _grouped(invoices, ('users_id', 'payements_method'), _invoice_amounts())
+    }
+    _add_archived(
+        rows, archived.exclude(payements_method=''), ('users_id', 'month', 'payements_method'), INVOICE_AMOUNTS,
+        lambda row: RevenueRollup(
+            users_id_id=row['users_id'], month=row['month'], payements_method=row['payements_method'],
+        ),
+    )
+    rollups.delete()
+    RevenueRollup.objects.bulk_create(rows.values(), batch_size=1000)
+    return len(rows)
+
+
+def _rebuild_clients(invoices, estimates, archived, rollups):
+    """Remplace les agrégats ClientRollup ciblés (parts factures et devis, tables et archives)"""
+    rows = {}
+    for row in _grouped(invoices, ('users_id', 'clients_id'), _invoice_amounts()):
+        rows[row['clients_id'], row['bucket_month']] = ClientRollup(
+            users_id_id=row['users_id'], clients_id_id=row['clients_id'], month=row['bucket_month'],
+            invoice_count=row['count'], price_et=row['et'], price_vat=row['vat'], price_ati=row['ati'],
+        )
+    for row in _grouped(estimates, ('users_id', 'clients_id'), _estimate_amounts()):
+        rollup = rows.setdefault((row['clients_id'], row['bucket_month']), ClientRollup(
+            users_id_id=row['users_id'], clients_id_id=row['clients_id'], month=row['bucket_month'],
+        ))
+        rollup.estimate_count = row['count']
+        rollup.outstanding_ati = row['ati']
+    _add_archived(
+        rows, archived.filter(clients_id__isnull=False), ('clients_id', 'month'), INVOICE_AMOUNTS + ESTIMATE_AMOUNTS,
+        lambda row: ClientRollup(users_id_id=row['users_id'], clients_id_id=row['clients_id'], month=row['month']),
+    )
+    rollups.delete()
+    ClientRollup.objects.bulk_create(rows.values(), batch_size=1000)
+    return len(rows)
+
+
+def rebuild_buckets(document_model, buckets):
+    """Recalcule uniquement les agrégats du mois concerné pour chaque bucket"""
+    with transaction.atomic():
+        for bucket in buckets:
+            if bucket is None or bucket.month is None:
+                continue
+            month = {'created_at__gte': bucket.month, 'created_at__lt': _next_month(bucket.month)}
+            if document_model is Invoices:
+                _rebuild_revenue(
+                    Invoices.objects.filter(
+                        users_id=bucket.users_id, payements_method=bucket.payements_method, **month,
+                    ),
+                    ArchivedRollup.objects.filter(
+                        users_id=bucket.users_id, month=bucket.month, payements_method=bucket.payements_method,
+                    ),
+                    RevenueRollup.objects.filter(
+                        users_id=bucket.users_id, month=bucket.month, payements_method=bucket.payements_method,
+                    ),
+                )
+            _rebuild_clients(
+                Invoices.objects.filter(clients_id=bucket.clients_id, **month),
+                Estimates.objects.filter(clients_id=bucket.clients_id, **month),
+                ArchivedRollup.objects.filter(clients_id=bucket.clients_id, month=bucket.month),
+                ClientRollup.objects.filter(clients_id=bucket.clients_id, month=bucket.month),
+            )
+
+
+def rebuild_all(users_id=None):
+    """Reconstruction complète (ou limitée à un utilisateur) ; retourne le nombre d'agrégats"""
+    scope = {} if users_id is None else {'users_id': users_id}
+    with transaction.atomic():
+        revenue = _rebuild_revenue(
+            Invoices.objects.filter(**scope),
+            ArchivedRollup.objects.filter(**scope),
+            RevenueRollup.objects.filter(**scope),
+        )
+        clients = _rebuild_clients(
+            Invoices.objects.filter(**scope),
+            Estimates.objects.filter(**scope),
+            ArchivedRollup.objects.filter(**scope),
+            ClientRollup.objects.filter(**scope),
+        )
+    return revenue, clients
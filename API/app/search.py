@@ -0,0 +1,80 @@
+"""Recherche de clients : plein texte (préfixes) + similarité trigramme.
+
+- search_vector est une colonne générée (nom / prénom en poids A, email / SIRET
+  en B, code postal en C), indexée en GIN ;
+- chaque mot saisi devient un préfixe ('dupo:*'), pour la saisie au fil de l'eau ;
+- à partir de 3 caractères, pg_trgm rattrape les fautes de frappe : similarité
+  du terme avec le mot le plus proche du nom, du nom de famille ou de l'email
+  (opérateur %>, index GIN trigramme).
+
+Les conditions texte passent par les index GIN (BitmapOr), users_id est
+filtré ensuite. Le score combine ts_rank et la meilleure similarité.
+"""
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Greatest
+
+
+MAX_TERM_LENGTH = 100
+TRIGRAM_MIN_LENGTH = 3
+TRIGRAM_FIELDS = ('name_organisation', 'last_name', 'email')
+
+
+class SearchError(ValueError):
+    pass
+
+
+def prefix_query(term):
+    """'dupont jea' -> 'dupont:* & jea:*' (mots uniquement : pas d'injection tsquery)"""
+    words = re.findall(r'\w+', term.lower())
+    if not words:
+        return None
+    return SearchQuery(' & '.join(f"{word}:*" for word in words), search_type='raw', config='simple')
+
+
+@contextmanager
+def similarity_threshold(value=None):
+    """Transaction avec le seuil de similarité trigramme de la recherche (SET LOCAL)"""
+    value = settings.CLIENT_SEARCH_SIMILARITY if value is None else value
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", [str(value)])
+        yield
+
+
+def search_clients(queryset, term):
+    """Clients du queryset correspondant à term, triés par pertinence décroissante.
+
+    À évaluer dans similarity_threshold() pour appliquer le seuil configuré.
+    """
+    term = (term or '').strip()
+    if not term:
+        raise SearchError("Paramètre q manquant.")
+    if len(term) > MAX_TERM_LENGTH:
+        raise SearchError(f"Recherche limitée à {MAX_TERM_LENGTH} caractères.")
+
+    query = prefix_query(term)
+    condition = Q(pk__in=[])
+    scores = []
+    if query is not None:
+        condition |= Q(search_vector=query)
+        scores.append(SearchRank(F('search_vector'), query))
+    if len(term) >= TRIGRAM_MIN_LENGTH:
+        for name in TRIGRAM_FIELDS:
+            condition |= Q(**{f'{name}__trigram_word_similar': term})
+        scores.append(Greatest(
+            *(TrigramWordSimilarity(term, name) for name in TRIGRAM_FIELDS),
+            output_field=FloatField(),
+        ))
+    if not scores:
+        raise SearchError("Recherche vide.")
+    rank = scores[0] if len(scores) == 1 else scores[0] + scores[1]
+    return (
+        queryset.filter(condition)
+        .annotate(rank=rank)
+        .order_by('-rank', 'id')
+    )
@@ -1,17 +1,47 @@
+from django.db import transaction
 from rest_framework import serializers
-from app.models import Users, Clients, Estimates, EstimateLines, Invoices, InvoiceLines
+from app import auth, metrics
+from app.models import Users, Clients, Estimates, EstimateLines, Invoices, InvoiceLines, RevenueRollup, ClientRollup, Job
 
 
 #  hashage de mdp sur le user en bdd et possibilité de modifier le mdp sous demande.
 
 
-class UsersSerializer(serializers.ModelSerializer):
+class ProfiledSerializerMixin:
+  """Temps de sérialisation compté dans le profil de la requête (app/metrics.py)"""
+
+  def to_representation(self, instance):
+    with metrics.phase('serialize'):
+      return super().to_representation(instance)
+
+
+class DynamicFieldsModelSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+  """Accepte fields=[...] pour ne sérialiser qu'une partie des champs (?fields=)"""
+
+  def __init__(self, *args, **kwargs):
+    fields = kwargs.pop('fields', None)
+    super().__init__(*args, **kwargs)
+    if fields is not None:
+      for name in set(self.fields) - set(fields):
+        self.fields.pop(name)
+
+
+class UsersSerializer(DynamicFieldsModelSerializer):
+  password = serializers.CharField(write_only=True)
+  current_password = serializers.CharField(write_only=True, required=False, trim_whitespace=False)
+
   class Meta:
     model = Users
-    fields = ['id','firstname','lastname','email','number_phone','name_organisation','password','siret',]
-    password = serializers.CharField(write_only=True)
-    read_only_fields = ['id','created_at','updated_at','last_login','users_id','modified_at',]
+    fields = ['id','email','name_business','first_name','last_name','password','current_password','created_at','updated_at','last_login',]
+    read_only_fields = ['id','created_at','updated_at','last_login',]
     
+  def validate(self, attrs):
+    current = attrs.pop('current_password', None)
+    # changement de mot de passe : l'actuel est exigé (jeton volé, session laissée ouverte)
+    if self.instance is not None and 'password' in attrs and not (current and self.instance.check_password(current)):
+      raise serializers.ValidationError({'current_password': ["Mot de passe actuel incorrect."]})
+    return attrs
+
   def create(self, validated_data):
     password = validated_data.pop("password")
     user = Users(**validated_data)
@@ -25,37 +55,126 @@ class UsersSerializer(serializers.ModelSerializer):
       setattr(instance, k, v)
     if password:
       instance.set_password(password)
-    instance.save()
+    with transaction.atomic():
+      instance.save()
+      if password:
+        # les jetons émis avec l'ancien mot de passe ne valent plus
+        auth.revoke_tokens(instance)
     return instance 
 
-class ClientsSerializer(serializers.ModelSerializer):
+class LoginSerializer(serializers.Serializer):
+  email = serializers.EmailField()
+  password = serializers.CharField(trim_whitespace=False)
+
+
+class ClientsSerializer(DynamicFieldsModelSerializer):
   class Meta:
     model = Clients
-    fields = ['id','client_type','name_organisation','first_name','last_name','address','postal_code','email','mobile','users_id','created_at','updated_at','siret']
-    read_only_fields = ['id','created_at','updated_at','users_id','modified_at','created_at','siret','updated_at']
+    fields = ['id','clients_type','name_organisation','first_name','last_name','address','postal_code','email','mobile','users_id','created_at','updated_at','siret','version',]
+    read_only_fields = ['id','created_at','updated_at','users_id','siret','version',]
 
 
-class EstimatesSerializer(serializers.ModelSerializer):
+class EstimatesSerializer(DynamicFieldsModelSerializer):
   class Meta:
     model = Estimates
-    fields = ['id','clients_id','price_et','price_vat','price_ati','sent','sent_date','users_id','modified_at','created_at']
-    read_only_fields = ['id','created_at','users_id','created_by','sent','sent_date','modified_at','total_price','price_vat','price_ati','price_et','clients_id']
+    fields = ['id','clients_id','price_et','price_vat','price_ati','sent','sent_date','invoiced_at','users_id','modified_at','created_at','version',]
+    read_only_fields = ['id','created_at','users_id','sent','sent_date','invoiced_at','modified_at','version','price_vat','price_ati','price_et',]
 
-class EstimateLinesSerializer(serializers.ModelSerializer):
+class EstimateLinesSerializer(DynamicFieldsModelSerializer):
   class Meta:
     model = EstimateLines
-    fields = ['id','client','estimate','product','quantity','price_unit','price_total','users_id','sent','sent_date']
-    read_only_fields = ['id','created_at','users_id','created_by','modified_at','sent_date',]
+    fields = ['id','estimates_id','description','line_type','quantity','price_unit','rate_vat','amount_et','note']
+    read_only_fields = ['id','amount_et',]
 
 
-class InvoicesSerializer(serializers.ModelSerializer):
+class InvoicesSerializer(DynamicFieldsModelSerializer):
   class Meta:
     model = Invoices
-    fields = ['id','invoice','product','quantity','price_unit','price_total','users_id','sent','sent_date','modified_at','payement_methode','payments_date','clients_id','users_id',]
-    read_only_fields = ['id','created_at','users_id','created_at','modified_at','clients_id','users_id','sent','sent_date','invoice_number','price_ati','price_vat','price_et',]
+    fields = ['id','invoice_number','clients_id','estimates_id','users_id','price_et','price_vat','price_ati','sent','sent_date','payements_method','payment_date','paid_at','created_at','modified_at','version',]
+    read_only_fields = ['id','created_at','users_id','modified_at','version','sent','sent_date','invoice_number','estimates_id','price_ati','price_vat','price_et',]
 
-class InvoiceLinesSerializer(serializers.ModelSerializer):
+class InvoiceLinesSerializer(DynamicFieldsModelSerializer):
   class Meta:
     model = InvoiceLines
-    fields = ['id','invoice','product','quantity','price_unit','price_total','users_id','sent','sent_date']
-    read_only_fields = ['id','clients_id','users_id','created_at','modified_at','sent','sent_date','invoice_number','price_ati','price_vat','price_et','price_total',]
\ No newline at end of file
+    fields = ['id','invoice','description','line_type','quantity','price_unit','taux_vat','amount_et','note']
+    read_only_fields = ['id','amount_et',]
+
+
+class ClientSummarySerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+  class Meta:
+    model = Clients
+    fields = ['id','clients_type','name_organisation','first_name','last_name','email',]
+    read_only_fields = fields
+
+
+class ClientSearchSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+  """Résultat de recherche : champs d'affichage et score de pertinence"""
+  rank = serializers.FloatField(read_only=True)
+
+  class Meta:
+    model = Clients
+    fields = ['id','clients_type','name_organisation','first_name','last_name','email','postal_code','siret','rank',]
+    read_only_fields = fields
+
+
+class EstimateDetailSerializer(EstimatesSerializer):
+  """Devis avec le résumé client et les lignes (select_related / prefetch_related côté vue)"""
+  client = ClientSummarySerializer(source='clients_id', read_only=True)
+  lines = EstimateLinesSerializer(source='estimate_lines', many=True, read_only=True)
+
+  class Meta(EstimatesSerializer.Meta):
+    fields = EstimatesSerializer.Meta.fields + ['client','lines',]
+
+
+class InvoiceDetailSerializer(InvoicesSerializer):
+  """Facture avec le résumé client et les lignes (select_related / prefetch_related côté vue)"""
+  client = ClientSummarySerializer(source='clients_id', read_only=True)
+  lines = InvoiceLinesSerializer(source='invoice_lines', many=True, read_only=True)
+
+  class Meta(InvoicesSerializer.Meta):
+    fields = InvoicesSerializer.Meta.fields + ['client','lines',]
+
+
+class EstimateConversionSerializer(serializers.Serializer):
+  """Paramètres de facturation des devis (POST estimates/{id}/convert/ et estimates/convert/)"""
+  ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+  payements_method = serializers.ChoiceField(choices=Invoices.PAYMENTS_METHOD_CHOICES)
+  payment_date = serializers.DateField()
+  sent_date = serializers.DateField(required=False)
+
+
+class RevenueRollupSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+  class Meta:
+    model = RevenueRollup
+    fields = ['month','payements_method','invoice_count','price_et','price_vat','price_ati',]
+    read_only_fields = fields
+
+
+class ClientRollupSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+  class Meta:
+    model = ClientRollup
+    fields = ['clients_id','month','invoice_count','price_et','price_vat','price_ati','estimate_count','outstanding_ati',]
+    read_only_fields = fields
+
+
+class JobSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+  class Meta:
+    model = Job
+    fields = ['id','kind','payload','status','attempts','max_attempts','run_at','last_error','result','created_at','finished_at',]
+    read_only_fields = fields
+
+
+class SendDocumentSerializer(serializers.Serializer):
+  """POST <documents>/{id}/send/ : destinataire (e-mail du client par défaut)"""
+  to = serializers.EmailField(required=False)
+
+
+class RenderBatchSerializer(serializers.Serializer):
+  """POST <documents>/render/ : rendu en lot, filtré par année / mois de création"""
+  year = serializers.IntegerField(required=False, min_value=2000, max_value=2100)
+  month = serializers.IntegerField(required=False, min_value=1, max_value=12)
+
+  def validate(self, attrs):
+    if 'month' in attrs and 'year' not in attrs:
+      raise serializers.ValidationError({'month': ["Nécessite year."]})
+    return attrs
\ No newline at end of file
@@ -0,0 +1,104 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from app import cache, partitioning, reports
+from app.models import Clients, Estimates, EstimateLines, Invoices, InvoiceLines, IssuedInvoiceNumber, Users
+from app.totals import totals_changed
+
+
+@receiver(pre_save, sender=Invoices)
+@receiver(pre_save, sender=Estimates)
+def load_reports_state(sender, instance, raw=False, **kwargs):
+    if not raw:
+        reports.document_saving(instance)
+
+
+@receiver(post_save, sender=Invoices)
+@receiver(post_save, sender=Estimates)
+def update_reports_on_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        reports.document_saved(instance, created)
+
+
+@receiver(post_delete, sender=Invoices)
+@receiver(post_delete, sender=Estimates)
+def update_reports_on_delete(sender, instance, origin=None, **kwargs):
+    # utilisateur supprimé : tous ses agrégats le sont aussi. Client supprimé : ses
+    # ClientRollup sont déjà supprimés et ne sont pas recréés (app/reports.py),
+    # le RevenueRollup de l'utilisateur est décrémenté
+    if isinstance(origin, Users) or getattr(origin, 'model', None) is Users:
+        return
+    reports.document_deleted(instance)
+
+
+@receiver(totals_changed)
+def update_reports_on_totals(sender, document_id, delta_et, delta_vat, **kwargs):
+    reports.totals_changed(sender, document_id, delta_et, delta_vat)
+
+
+@receiver(post_save, sender=Clients)
+@receiver(post_delete, sender=Clients)
+def invalidate_client(sender, instance, **kwargs):
+    # le résumé client est inclus dans le détail de ses devis / factures
+    cache.bump(Clients, [instance.pk])
+    for document_model in (Estimates, Invoices):
+        cache.bump(document_model, document_model.objects.filter(clients_id=instance.pk).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Estimates)
+@receiver(post_delete, sender=Estimates)
+@receiver(post_save, sender=Invoices)
+@receiver(post_delete, sender=Invoices)
+def invalidate_document(sender, instance, **kwargs):
+    cache.bump(sender, [instance.pk])
+
+
+@receiver(post_save, sender=EstimateLines)
+@receiver(post_delete, sender=EstimateLines)
+@receiver(post_save, sender=InvoiceLines)
+@receiver(post_delete, sender=InvoiceLines)
+def invalidate_line_document(sender, instance, **kwargs):
+    field = sender._meta.get_field(sender.DOCUMENT_FIELD)
+    # document précédent si la ligne a changé de document
+    snapshot = getattr(instance, '_totals_snapshot', None)
+    cache.bump(field.related_model, [getattr(instance, field.attname), snapshot and snapshot.document_id])
+
+
+@receiver(post_save, sender=Invoices)
+def update_invoiced_estimate(sender, instance, created, raw=False, **kwargs):
+    # Invoices.save marque le devis d'origine comme facturé (UPDATE direct)
+    if created and not raw and instance.estimates_id_id is not None:
+        reports.estimates_invoiced([instance.estimates_id_id])
+        cache.bump(Estimates, [instance.estimates_id_id])
+
+
+@receiver(post_delete, sender=Invoices)
+def release_estimate(sender, instance, origin=None, **kwargs):
+    # facture supprimée (pas archivée ni détachée) : le devis peut être refacturé
+    if instance.estimates_id_id is None:
+        return
+    released = Estimates.objects.filter(pk=instance.estimates_id_id, invoiced_at__isnull=False).update(
+        invoiced_at=None, version=F('version') + 1,
+    )
+    if released and not (isinstance(origin, Users) or getattr(origin, 'model', None) is Users):
+        reports.estimates_invoiced([instance.estimates_id_id], sign=-1)
+    cache.bump(Estimates, [instance.estimates_id_id])
+
+
+@receiver(post_delete, sender=Invoices)
+def release_invoice_number(sender, instance, **kwargs):
+    # facture supprimée (pas archivée ni détachée) : son numéro n'est plus réservé
+    IssuedInvoiceNumber.release(instance)
+
+
+@receiver(partitioning.year_detaching)
+def archive_year_amounts(sender, year, **kwargs):
+    # factures de l'année détachée : les reconstructions gardent leurs montants
+    start, end = partitioning.year_bounds(year)
+    reports.documents_archived(Invoices, Invoices.objects.filter(created_at__gte=start, created_at__lt=end))
+
+
+@receiver(totals_changed)
+def invalidate_on_totals(sender, document_id, **kwargs):
+    cache.bump(sender, [document_id])
@@ -0,0 +1,158 @@
+"""Jeu de données synthétique pour les benchmarks (commande generate_data).
+
+Échelle : users × clients par utilisateur × devis et factures par client ×
+lignes par document. Tout passe par bulk_create, par paquets, une transaction
+par utilisateur :
+- les montants des lignes et les totaux des documents sont calculés ici par
+  app/money.py (les save() et signaux ne sont pas appelés) ;
+- les numéros de facture sont réservés en un bloc par émetteur (app/numbering.py) ;
+- les dates de création sont réparties sur l'année en cours, puis les tables
+  de reporting de l'utilisateur sont reconstruites.
+"""
+import random
+import uuid
+from datetime import date
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import DateField, ExpressionWrapper, F, IntegerField, Value
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from app import money, numbering, partitioning, reports
+from app.models import Clients, EstimateLines, Estimates, InvoiceLines, Invoices, InvoiceSequence, IssuedInvoiceNumber, Users
+
+
+BATCH_SIZE = 1000
+PASSWORD = 'benchmark'
+
+SYLLABLES = ['du', 'pont', 'mar', 'tin', 'ber', 'nard', 'lef', 'evre', 'mo', 'reau', 'gar', 'nier',
+             'ro', 'bert', 'fa', 'ure', 'an', 'dre', 'bla', 'nc', 'leg', 'rand', 'bou', 'lan']
+LEGAL_FORMS = ['SARL', 'SAS', 'EURL', 'SA', 'SCI']
+SERVICES = ['Pose de carrelage', 'Peinture murale', 'Remplacement chaudière', 'Audit énergétique',
+            'Maintenance annuelle', 'Création de site', 'Déplacement', 'Fourniture de matériel']
+VAT_RATES = [2000, 1000, 550]  # centièmes de %
+
+
+def _name(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+
+def _client(rng, user):
+    first_name, last_name = _name(rng), _name(rng)
+    business = rng.random() < 0.6
+    return Clients(
+        users_id=user,
+        clients_type='business' if business else 'individuals',
+        name_organisation=f"{_name(rng)} {rng.choice(LEGAL_FORMS)}" if business else f"{first_name} {last_name}",
+        first_name=first_name,
+        last_name=last_name,
+        address=f"{rng.randint(1, 200)} rue {_name(rng)}",
+        postal_code=f"{rng.randint(1000, 95999):05d}",
+        email=f"{last_name.lower()}{rng.randint(1, 999)}@{_name(rng).lower()}.fr",
+        mobile=f"06{rng.randint(0, 99999999):08d}",
+        siret=f"{rng.randint(10 ** 13, 10 ** 14 - 1)}" if business else None,
+    )
+
+
+def _lines(rng, count, rule):
+    """Lignes (description, type, quantité, PU, TVA, HT) et totaux (HT, TVA, TTC), via app/money.py"""
+    quantities = [rng.randint(1, 20) for _ in range(count)]
+    prices = [rng.randint(500, 50000) for _ in range(count)]
+    rates = [rng.choice(VAT_RATES) for _ in range(count)]
+    amounts = money.line_amounts(quantities, prices)
+    lines = [
+        (rng.choice(SERVICES), rng.choice(['benefit', 'supply']), quantity,
+         money.from_cents(price), money.from_cents(rate), money.from_cents(amount))
+        for quantity, price, rate, amount in zip(quantities, prices, rates, amounts)
+    ]
+    return lines, [money.from_cents(value) for value in money.document_totals(amounts, rates, rule)]
+
+
+def _spread_dates(model, ids, first_day, days):
+    """created_at réparti sur [first_day, first_day + days[ (déterministe, par id)"""
+    created_at = ExpressionWrapper(
+        Value(first_day) + Cast(F('id') % days, IntegerField()), output_field=DateField(),
+    )
+    for start in range(0, len(ids), BATCH_SIZE):
+        model.objects.filter(pk__in=ids[start:start + BATCH_SIZE]).update(created_at=created_at)
+
+
+def _documents(rng, user, clients, per_client, lines_per_document, day):
+    estimates, invoices, estimate_lines, invoice_lines = [], [], [], []
+    rule = money.rounding_rule()
+    methods = [value for value, _ in Invoices.PAYMENTS_METHOD_CHOICES]
+    for client in clients:
+        for _ in range(per_client):
+            lines, (et, vat, ati) = _lines(rng, lines_per_document, rule)
+            estimates.append(Estimates(
+                users_id=user, clients_id=client, price_et=et, price_vat=vat, price_ati=ati,
+            ))
+            estimate_lines.append(lines)
+            lines, (et, vat, ati) = _lines(rng, lines_per_document, rule)
+            invoices.append(Invoices(
+                users_id=user, clients_id=client, price_et=et, price_vat=vat, price_ati=ati,
+                sent=True, sent_date=day, payements_method=rng.choice(methods), payment_date=day,
+            ))
+            invoice_lines.append(lines)
+    return estimates, estimate_lines, invoices, invoice_lines
+
+
+def generate(users=1, clients=100, documents=10, lines=5, seed=None, batch_size=BATCH_SIZE, log=None):
+    """Crée le jeu de données ; retourne le nombre de lignes créées par modèle"""
+    rng = random.Random(seed)
+    token = uuid.uuid4().hex[:8]
+    password = make_password(PASSWORD)
+    today = timezone.localdate()
+    first_day = date(today.year, 1, 1)
+    days = (today - first_day).days + 1
+    created = dict.fromkeys(['users', 'clients', 'estimates', 'invoices', 'estimate_lines', 'invoice_lines'], 0)
+
+    for index in range(users):
+        with transaction.atomic():
+            user = Users.objects.create(
+                email=f"bench-{token}-{index}@autodf.test",
+                name_business=f"{_name(rng)} {rng.choice(LEGAL_FORMS)}",
+                password=password,
+            )
+            user_clients = Clients.objects.bulk_create(
+                [_client(rng, user) for _ in range(clients)], batch_size=batch_size,
+            )
+            estimates, estimate_lines, invoices, invoice_lines = _documents(
+                rng, user, user_clients, documents, lines, today,
+            )
+            if invoices:
+                first = numbering.next_value(
+                    InvoiceSequence, user.pk, numbering.sequence_year(today), count=len(invoices),
+                )
+                for offset, invoice in enumerate(invoices):
+                    invoice.invoice_number = numbering.format_number(first + offset, today)
+            Estimates.objects.bulk_create(estimates, batch_size=batch_size)
+            partitioning.ensure_year(today.year)
+            Invoices.objects.bulk_create(invoices, batch_size=batch_size)
+            IssuedInvoiceNumber.reserve(invoices, batch_size=batch_size)
+            EstimateLines.objects.bulk_create((
+                EstimateLines(estimates_id=estimate, description=description, line_type=line_type,
+                              quantity=quantity, price_unit=price_unit, rate_vat=rate, amount_et=amount)
+                for estimate, document_lines in zip(estimates, estimate_lines)
+                for description, line_type, quantity, price_unit, rate, amount in document_lines
+            ), batch_size=batch_size)
+            InvoiceLines.objects.bulk_create((
+                InvoiceLines(invoice=invoice, description=description, line_type=line_type,
+                             quantity=quantity, price_unit=price_unit, taux_vat=rate, amount_et=amount)
+                for invoice, document_lines in zip(invoices, invoice_lines)
+                for description, line_type, quantity, price_unit, rate, amount in document_lines
+            ), batch_size=batch_size)
+            for model, objects in ((Clients, user_clients), (Estimates, estimates), (Invoices, invoices)):
+                _spread_dates(model, [instance.pk for instance in objects], first_day, days)
+            reports.rebuild_all(users_id=user.pk)
+
+        created['users'] += 1
+        created['clients'] += len(user_clients)
+        created['estimates'] += len(estimates)
+        created['invoices'] += len(invoices)
+        created['estimate_lines'] += len(estimates) * lines
+        created['invoice_lines'] += len(invoices) * lines
+        if log:
+            log(f"Utilisateur {index + 1}/{users} : {user.email} (id {user.pk})")
+    return created
@@ -1,3 +1,1919 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+
+from django.contrib.auth.hashers import make_password
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, modify_settings, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from app import auth, cache, coldstorage, importtime, jobs, metrics, money, partitioning, passwords, pdf, rendering, reports, throttling, totals
+from app.bulk import bulk_apply_lines
+from app.conversion import convert_estimates
+from app.exports import DATASETS, export_rows, stream
+from app.middleware import InstrumentationMiddleware
+from app.models import ArchivedDocument, ArchivedRollup, AuthToken, ClientRollup, Users, Clients, Estimates, EstimateLines, Invoices, InvoiceLines, Job, RevenueRollup, ThrottleBucket
+from app.serializers import InvoiceLinesSerializer, InvoicesSerializer
+from app.versioning import VersionConflict
+from config import env
+
+
+def create_tenant(email='tenant@autodf.fr'):
+    user = Users.objects.create(email=email, name_business="Entreprise", password='!')
+    client = Clients.objects.create(
+        clients_type='business',
+        name_organisation="Client",
+        address="1 rue de Paris",
+        postal_code="75001",
+        email='client@autodf.fr',
+        users_id=user,
+    )
+    return user, client
+
+
+def create_invoice(user, client):
+    return Invoices.objects.create(
+        users_id=user,
+        clients_id=client,
+        price_et=Decimal('0'),
+        price_vat=Decimal('0'),
+        price_ati=Decimal('0'),
+        sent_date='2026-01-01',
+        payements_method='CB',
+        payment_date='2026-01-31',
+    )
+
+
+def create_documents(user, client, count, lines_per_document=3):
+    for i in range(count):
+        estimate = Estimates.objects.create(users_id=user, clients_id=client)
+        invoice = create_invoice(user, client)
+        for _ in range(lines_per_document):
+            EstimateLines.objects.create(
+                estimates_id=estimate, quantity=2, price_unit=Decimal('10.00'), rate_vat=Decimal('20'),
+            )
+            InvoiceLines.objects.create(
+                invoice=invoice, quantity=2, price_unit=Decimal('10.00'), taux_vat=Decimal('20'),
+            )
+
+
+@override_settings(THROTTLE_BACKEND='memory')
+class QueryCountTests(TestCase):
+    """Nombre de requêtes SQL par endpoint, indépendant du nombre de lignes renvoyées.
+
+    Chaque endpoint est mesuré sur un petit puis un gros jeu de données : le
+    budget doit être respecté dans les deux cas (pas de N+1). Limitation de
+    débit en mémoire : les budgets ne comptent que les requêtes de la vue.
+    """
+
+    # (url, nombre de requêtes attendu)
+    LIST_BUDGETS = [
+        ('/api/clients/', 1),
+        ('/api/estimates/', 1),
+        ('/api/estimates/?expand=lines', 2),
+        ('/api/invoices/', 1),
+        ('/api/invoices/?expand=lines', 2),
+        ('/api/estimate_lines/', 1),
+        ('/api/invoice_lines/', 1),
+    ]
+    DETAIL_BUDGETS = [
+        ('/api/estimates/{estimate}/', 2),
+        ('/api/invoices/{invoice}/', 2),
+    ]
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.user)
+
+    def assertQueryBudget(self, url, expected):
+        with self.assertNumQueries(expected, msg=url):
+            response = self.api.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response
+
+    def test_list_endpoints_have_constant_query_count(self):
+        for size in (1, 10):
+            create_documents(self.user, self.client_record, size)
+            for url, expected in self.LIST_BUDGETS:
+                with self.subTest(url=url, documents=size):
+                    self.assertQueryBudget(url, expected)
+
+    def test_detail_endpoints_have_constant_query_count(self):
+        for lines in (1, 20):
+            create_documents(self.user, self.client_record, 1, lines_per_document=lines)
+            ids = {
+                'estimate': Estimates.objects.latest('id').pk,
+                'invoice': Invoices.objects.latest('id').pk,
+            }
+            for url, expected in self.DETAIL_BUDGETS:
+                with self.subTest(url=url, lines=lines):
+                    response = self.assertQueryBudget(url.format(**ids), expected)
+                    self.assertEqual(len(response.data['lines']), lines)
+                    self.assertEqual(response.data['client']['id'], self.client_record.pk)
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class KeysetPaginationTests(TestCase):
+    """Curseurs keyset (app/pagination.py) : parcours stable et curseurs invalides"""
+
+    def setUp(self):
+        self.user, first = create_tenant()
+        self.clients = [first] + [
+            Clients.objects.create(
+                clients_type='business', name_organisation=f"Client {i}", address="1 rue de Paris",
+                postal_code="75001", email=f'client{i}@autodf.fr', users_id=self.user,
+            )
+            for i in range(6)
+        ]
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.user)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.api.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.json()['results']]
+            url = response.json()['next']
+        return ids
+
+    def test_pages_cover_every_row_once_in_order(self):
+        expected = [client.pk for client in sorted(self.clients, key=lambda client: (client.created_at, client.pk))]
+        self.assertEqual(self.walk('/api/clients/?page_size=3'), expected)
+        self.assertEqual(self.walk('/api/async/clients/?page_size=2'), expected)
+
+    def test_inserts_do_not_shift_later_pages(self):
+        first = self.api.get('/api/clients/?page_size=3')
+        seen = [row['id'] for row in first.data['results']]
+        create_tenant('other@autodf.fr')
+        Clients.objects.create(
+            clients_type='business', name_organisation="Nouveau", address="1 rue de Paris",
+            postal_code="75001", email='new@autodf.fr', users_id=self.user,
+        )
+        rest = self.walk(first.data['next'])
+        self.assertFalse(set(seen) & set(rest))
+        self.assertEqual(len(seen) + len(rest), len(self.clients) + 1)
+
+    def test_invalid_cursors_are_rejected(self):
+        today = timezone.localdate().isoformat()
+        cursors = [
+            '!!!',
+            base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+            encode_cursor('not a list'),
+            encode_cursor([today]),
+            encode_cursor([None, None]),
+            encode_cursor([today, None]),
+            encode_cursor([True, 1]),
+            encode_cursor([today, [1]]),
+            encode_cursor(['2026-13-45', 1]),
+            encode_cursor([today, 'abc']),
+            encode_cursor([today, 10 ** 30]),
+        ]
+        for cursor in cursors:
+            for url in ('/api/clients/', '/api/async/clients/'):
+                with self.subTest(cursor=cursor, url=url):
+                    response = self.api.get(url, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('cursor', response.json())
+
+    def test_tampered_cursor_stays_within_tenant(self):
+        other, other_client = create_tenant('other@autodf.fr')
+        response = self.api.get('/api/clients/', {'cursor': encode_cursor(['2000-01-01', 0]), 'page_size': 50})
+        self.assertEqual(response.status_code, 200)
+        ids = [row['id'] for row in response.data['results']]
+        self.assertNotIn(other_client.pk, ids)
+        self.assertEqual(len(ids), len(self.clients))
+
+
+def rollup_state():
+    """Agrégats de reporting non vides, comparables après rebuild_all()"""
+    revenue = sorted(
+        row for row in RevenueRollup.objects.values_list(
+            'users_id', 'month', 'payements_method', 'invoice_count', 'price_et', 'price_vat', 'price_ati',
+        )
+        if any(row[3:])
+    )
+    clients = sorted(
+        row for row in ClientRollup.objects.values_list(
+            'clients_id', 'month', 'invoice_count', 'price_et', 'price_vat', 'price_ati', 'estimate_count', 'outstanding_ati',
+        )
+        if any(row[2:])
+    )
+    return revenue, clients
+
+
+class ReportsTests(TestCase):
+    """Agrégats incrémentaux (app/reports.py, app/signals.py) égaux à une reconstruction complète"""
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+        self.other_client = Clients.objects.create(
+            clients_type='business', name_organisation="Autre", address="2 rue de Lyon",
+            postal_code="69001", email='autre@autodf.fr', users_id=self.user,
+        )
+        create_documents(self.user, self.client_record, 2)
+        create_documents(self.user, self.other_client, 1)
+
+    def assertMatchesRebuild(self):
+        # contraintes différées (clés étrangères des agrégats) vérifiées maintenant
+        connection.check_constraints()
+        incremental = rollup_state()
+        reports.rebuild_all()
+        self.assertEqual(incremental, rollup_state())
+        self.assertTrue(incremental[0])
+
+    def test_document_writes(self):
+        self.assertMatchesRebuild()
+        invoice = Invoices.objects.filter(clients_id=self.client_record).first()
+        invoice.payements_method = 'Virement'
+        invoice.save()
+        InvoiceLines.objects.filter(invoice=invoice).first().delete()
+        Estimates.objects.filter(clients_id=self.other_client).get().delete()
+        self.assertMatchesRebuild()
+
+    def test_invoiced_estimates_leave_outstanding(self):
+        estimate = Estimates.objects.filter(clients_id=self.client_record).first()
+        outstanding = ClientRollup.objects.get(clients_id=self.client_record).outstanding_ati
+        invoice = Invoices.objects.create(
+            users_id=self.user, clients_id=self.client_record, estimates_id=estimate,
+            payements_method='CB', payment_date='2026-01-31',
+        )
+        rollup = ClientRollup.objects.get(clients_id=self.client_record)
+        self.assertEqual(rollup.outstanding_ati, outstanding - estimate.price_ati)
+        self.assertMatchesRebuild()
+        # lignes d'un devis facturé : hors encours
+        EstimateLines.objects.create(estimates_id=estimate, quantity=1, price_unit=Decimal('5.00'), rate_vat=Decimal('20'))
+        self.assertMatchesRebuild()
+        invoice.delete()
+        self.assertEqual(ClientRollup.objects.get(clients_id=self.client_record).outstanding_ati, outstanding + Decimal('6.00'))
+        self.assertMatchesRebuild()
+
+    def test_saving_with_deferred_fields_moves_both_buckets(self):
+        invoice = Invoices.objects.filter(clients_id=self.client_record).first()
+        invoice = Invoices.objects.defer('clients_id').get(pk=invoice.pk)
+        invoice.clients_id = self.other_client
+        invoice.save()
+        self.assertMatchesRebuild()
+        estimate = Estimates.objects.only('id', 'version').filter(clients_id=self.client_record).first()
+        estimate.clients_id = self.other_client
+        estimate.save()
+        self.assertMatchesRebuild()
+
+    def test_deleting_a_client_with_documents(self):
+        self.client_record.delete()
+        self.assertFalse(ClientRollup.objects.filter(clients_id=self.client_record.pk).exists())
+        self.assertMatchesRebuild()
+
+    def test_deleting_a_user(self):
+        other_user, other_client = create_tenant('other@autodf.fr')
+        create_documents(other_user, other_client, 1)
+        other_user.delete()
+        self.assertFalse(RevenueRollup.objects.filter(users_id=other_user.pk).exists())
+        self.assertMatchesRebuild()
+
+
+class BenchmarkToolingTests(TestCase):
+    """Jeu synthétique (generate_data) cohérent et rapport run_benchmarks en JSON"""
+
+    def setUp(self):
+        call_command('generate_data', users=1, clients=3, documents=2, lines=3, seed=7, stdout=StringIO())
+        self.user = Users.objects.get(email__startswith='bench-')
+
+    def test_generated_totals_match_lines(self):
+        for model in (Estimates, Invoices):
+            documents = model.objects.filter(users_id=self.user)
+            self.assertEqual(documents.count(), 6)
+            for document in documents:
+                self.assertEqual(
+                    (document.price_et, document.price_vat, document.price_ati),
+                    tuple(totals.aggregate_totals(document)),
+                )
+
+    def test_generated_rollups_match_rebuild(self):
+        connection.check_constraints()
+        generated = rollup_state()
+        reports.rebuild_all()
+        self.assertEqual(generated, rollup_state())
+        invoiced = sum(Invoices.objects.filter(users_id=self.user).values_list('price_ati', flat=True))
+        self.assertEqual(sum(row[6] for row in generated[0]), invoiced)
+
+    def test_run_benchmarks_emits_json(self):
+        out = StringIO()
+        call_command(
+            'run_benchmarks', user=self.user.pk, requests=2, warmup=0, only=['invoices-*', 'clients-list'],
+            stdout=out, stderr=StringIO(),
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['dataset']['invoices'], 6)
+        names = {result['name'] for result in report['results']}
+        self.assertIn('invoices-detail', names)
+        self.assertIn('clients-list', names)
+        for result in report['results']:
+            self.assertEqual(result['status'], 200, result['name'])
+            self.assertEqual(result['requests'], 2)
+            self.assertEqual(result['errors'], 0)
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class ExportTests(TestCase):
+    """Export comptable en flux (app/exports.py) : contenu, tenant et ?year"""
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+        other, other_client = create_tenant('other@autodf.fr')
+        create_documents(self.user, self.client_record, 2, lines_per_document=2)
+        create_documents(other, other_client, 1)
+        self.invoices = list(Invoices.objects.filter(users_id=self.user).order_by('id'))
+        # première facture (et ses lignes) sur l'année précédente
+        self.year = timezone.localdate().year - 1
+        partitioning.ensure_year(self.year)
+        Invoices.objects.filter(pk=self.invoices[0].pk).update(created_at=date(self.year, 3, 1))
+        connection.check_constraints()
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.user)
+
+    def export(self, **params):
+        response = self.api.get('/api/invoices/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_contains_only_own_invoices(self):
+        response, content = self.export(output='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="invoices-all.csv"')
+        header, *rows = csv.reader(StringIO(content), delimiter=';')
+        self.assertEqual(header, DATASETS['invoices'][2])
+        self.assertEqual([int(row[0]) for row in rows], [invoice.pk for invoice in self.invoices])
+        first = dict(zip(header, rows[0]))
+        self.assertEqual(first['invoice_number'], self.invoices[0].invoice_number)
+        self.assertEqual(first['created_at'], f"{self.year}-03-01")
+        self.assertEqual(Decimal(first['price_ati']), self.invoices[0].price_ati)
+
+    def test_jsonl_lines_filtered_by_year(self):
+        response, content = self.export(output='jsonl', dataset='lines', year=self.year)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual({row['invoice_id'] for row in rows}, {self.invoices[0].pk})
+        self.assertEqual(list(rows[0]), DATASETS['lines'][2])
+        self.assertEqual(rows[0]['amount_et'], '20.00')
+        _, content = self.export(output='jsonl', year=timezone.localdate().year)
+        self.assertEqual([json.loads(line)['id'] for line in content.splitlines()], [self.invoices[1].pk])
+
+    def test_invalid_parameters(self):
+        for params in ({'output': 'xml'}, {'dataset': 'clients'}, {'year': 'abc'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.api.get('/api/invoices/export/', params).status_code, 400)
+
+    def test_stream_yields_chunks(self):
+        columns, rows = export_rows('invoices', user=self.user, chunk_size=1)
+        self.assertEqual(len(list(stream('csv', columns, rows, chunk_size=1))), 1 + len(self.invoices))
+
+    def test_command_writes_one_tenant(self):
+        out = StringIO()
+        call_command('export_invoices', user=self.user.pk, output_format='jsonl', stdout=out)
+        self.assertEqual([json.loads(line)['id'] for line in out.getvalue().splitlines()], [invoice.pk for invoice in self.invoices])
+        with self.assertRaises(CommandError):
+            call_command('export_invoices', user=0, stdout=StringIO())
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class ClientSearchTests(TestCase):
+    """GET /api/clients/search/ : préfixes, fautes de frappe, classement (app/search.py)"""
+
+    def setUp(self):
+        self.user, _ = create_tenant()
+        self.other, _ = create_tenant('other@autodf.fr')
+        Clients.objects.all().delete()
+        self.dupont = self.create_client(self.user, 'Plomberie Dupont', last_name='Dupont', email='contact@plomberie.fr')
+        self.durand = self.create_client(self.user, 'Durand Électricité', last_name='Durand', email='durand@elec.fr')
+        self.martin = self.create_client(self.user, 'Menuiserie Martin', last_name='Martin', email='atelier@bois.fr')
+        self.by_email = self.create_client(self.user, 'Garage du Centre', email='martin@garage.fr')
+        self.create_client(self.other, 'Dupont Frères', last_name='Dupont', email='dupont@freres.fr')
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.user)
+
+    def create_client(self, user, name, **fields):
+        return Clients.objects.create(
+            users_id=user, clients_type='business', name_organisation=name,
+            address="1 rue de Paris", postal_code="75001", **fields,
+        )
+
+    def search(self, q, status_code=200):
+        response = self.api.get('/api/clients/search/', {'q': q})
+        self.assertEqual(response.status_code, status_code)
+        return response.data
+
+    def ids(self, q):
+        return [row['id'] for row in self.search(q)['results']]
+
+    def test_prefixes_match_while_typing(self):
+        self.assertEqual(self.ids('dupo'), [self.dupont.pk])
+        self.assertEqual(self.ids('plomb dup'), [self.dupont.pk])
+        self.assertEqual(self.ids('menuis'), [self.martin.pk])
+
+    def test_typos_above_the_similarity_threshold(self):
+        self.assertEqual(self.ids('Dupond'), [self.dupont.pk])
+        self.assertEqual(self.ids('Durnad'), [])
+        with override_settings(CLIENT_SEARCH_SIMILARITY=0.3):
+            self.assertIn(self.durand.pk, self.ids('Durnad'))
+
+    def test_results_are_ranked(self):
+        results = self.search('martin')['results']
+        # nom (poids A) avant email (poids B)
+        self.assertEqual([row['id'] for row in results], [self.martin.pk, self.by_email.pk])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+
+    def test_other_tenants_are_not_searched(self):
+        self.assertEqual(self.ids('dupont'), [self.dupont.pk])
+        self.assertEqual(self.ids('freres'), [])
+
+    def test_empty_or_too_long_terms_are_rejected(self):
+        for q in ('', '   ', 'x' * 101):
+            with self.subTest(q=q):
+                self.assertIn('q', self.search(q, status_code=400))
+        self.assertEqual(self.api.get('/api/clients/search/').status_code, 400)
+
+
+class ConversionTests(TestCase):
+    """Conversion de devis en factures par lot (app/conversion.py)"""
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+        create_documents(self.user, self.client_record, 3)
+        self.estimates = list(Estimates.objects.filter(users_id=self.user).order_by('id'))
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {auth.issue_token(self.user)[0]}')
+
+    def convert(self, ids):
+        return self.api.post(
+            '/api/estimates/convert/',
+            {'ids': ids, 'payements_method': 'CB', 'payment_date': '2026-01-31'},
+            format='json',
+        )
+
+    def test_batch_copies_lines_and_numbers_invoices(self):
+        before = sequence_numbers(self.user)
+        response = self.convert([estimate.pk for estimate in self.estimates])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(sequence_numbers(self.user), before + [before[-1] + 1, before[-1] + 2, before[-1] + 3])
+        for estimate in self.estimates:
+            invoice = Invoices.objects.get(estimates_id=estimate)
+            self.assertEqual((invoice.price_et, invoice.price_ati), (estimate.price_et, estimate.price_ati))
+            copied = list(InvoiceLines.objects.filter(invoice=invoice).order_by('id').values_list('quantity', 'price_unit', 'taux_vat', 'amount_et'))
+            source = list(EstimateLines.objects.filter(estimates_id=estimate).order_by('id').values_list('quantity', 'price_unit', 'rate_vat', 'amount_et'))
+            self.assertEqual(copied, source)
+            estimate.refresh_from_db()
+            self.assertIsNotNone(estimate.invoiced_at)
+
+    def test_estimate_is_converted_once(self):
+        first = self.estimates[0].pk
+        self.assertEqual(self.convert([first]).status_code, 201)
+        response = self.convert([first, self.estimates[1].pk])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['errors'], [{'id': first, 'errors': ["Devis déjà facturé."]}])
+        self.assertEqual(len(response.data['created']), 1)
+        self.assertEqual(Invoices.objects.filter(estimates_id=first).count(), 1)
+        response = self.api.post(
+            f'/api/estimates/{first}/convert/', {'payements_method': 'CB', 'payment_date': '2026-01-31'}, format='json',
+        )
+        self.assertEqual(response.status_code, 409)
+
+    def test_rollups_match_rebuild(self):
+        self.assertEqual(self.convert([estimate.pk for estimate in self.estimates[:2]]).status_code, 201)
+        rollup = ClientRollup.objects.get(clients_id=self.client_record)
+        self.assertEqual(rollup.outstanding_ati, self.estimates[2].price_ati)
+        self.assertEqual(rollup.invoice_count, 5)
+        incremental = rollup_state()
+        reports.rebuild_all()
+        self.assertEqual(incremental, rollup_state())
+
+
+def sequence_numbers(user):
+    """Numéros de séquence (partie numérique) des factures de l'utilisateur, triés"""
+    numbers = Invoices.objects.filter(users_id=user).values_list('invoice_number', flat=True)
+    return sorted(int(number.rsplit('-', 1)[1]) for number in numbers)
+
+
+class InvoiceNumberingTests(TestCase):
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+
+    def test_numbers_follow_format_and_sequence(self):
+        year = timezone.localdate().year
+        numbers = [create_invoice(self.user, self.client_record).invoice_number for _ in range(3)]
+        self.assertEqual(numbers, [f"FA{year}-{value:05d}" for value in (1, 2, 3)])
+
+    @override_settings(INVOICE_NUMBER_PREFIX='AC-', INVOICE_NUMBER_FORMAT='{prefix}{number}', INVOICE_NUMBER_YEARLY_RESET=False)
+    def test_custom_prefix_without_yearly_reset(self):
+        self.assertEqual(create_invoice(self.user, self.client_record).invoice_number, 'AC-1')
+
+    def test_sequences_are_per_issuer(self):
+        other, other_client = create_tenant('other@autodf.fr')
+        create_invoice(self.user, self.client_record)
+        create_invoice(other, other_client)
+        create_invoice(self.user, self.client_record)
+        self.assertEqual(sequence_numbers(self.user), [1, 2])
+        self.assertEqual(sequence_numbers(other), [1])
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_create_through_api(self):
+        api = APIClient()
+        api.force_authenticate(user=self.user)
+        response = api.post('/api/invoices/', {
+            'clients_id': self.client_record.pk, 'payements_method': 'CB', 'payment_date': '2026-01-31',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['price_ati'], '0.00')
+        self.assertIsNone(response.data['sent_date'])
+        self.assertEqual(sequence_numbers(self.user), [1])
+        response = api.post('/api/estimates/', {'clients_id': self.client_record.pk}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def test_rolled_back_invoice_leaves_no_gap(self):
+        create_invoice(self.user, self.client_record)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            create_invoice(self.user, self.client_record)
+            raise RuntimeError
+        create_invoice(self.user, self.client_record)
+        self.assertEqual(sequence_numbers(self.user), [1, 2])
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentInvoiceNumberingTests(TransactionTestCase):
+    """Créations simultanées depuis plusieurs threads (une connexion chacun)"""
+
+    THREADS = 16
+    INVOICES_PER_THREAD = 10
+
+    def test_concurrent_allocation_has_no_gap_and_no_duplicate(self):
+        tenants = [create_tenant(f'tenant{i}@autodf.fr') for i in range(2)]
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def worker(user, client):
+            try:
+                barrier.wait()
+                for _ in range(self.INVOICES_PER_THREAD):
+                    create_invoice(user, client)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=tenants[i % len(tenants)])
+            for i in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        expected = self.THREADS // len(tenants) * self.INVOICES_PER_THREAD
+        for user, _ in tenants:
+            self.assertEqual(sequence_numbers(user), list(range(1, expected + 1)))
+
+
+def reference_totals(lines, rule):
+    """Référence Decimal (ROUND_HALF_UP) des totaux de lignes [(quantité, PU, taux)]"""
+    cent = Decimal('0.01')
+    amounts = [Decimal(quantity) * price for quantity, price, _ in lines]
+    if rule == money.LINE:
+        vat = sum((
+            (amount * rate / 100).quantize(cent, rounding=ROUND_HALF_UP)
+            for amount, (_, _, rate) in zip(amounts, lines)
+        ), Decimal('0.00'))
+    else:
+        by_rate = {}
+        for amount, (_, _, rate) in zip(amounts, lines):
+            by_rate[rate] = by_rate.get(rate, Decimal('0.00')) + amount
+        vat = sum((
+            (amount * rate / 100).quantize(cent, rounding=ROUND_HALF_UP) for rate, amount in by_rate.items()
+        ), Decimal('0.00'))
+    et = sum(amounts, Decimal('0.00'))
+    return et, vat, et + vat
+
+
+def random_lines(rng, count, max_cents=10 ** 7):
+    rates = [Decimal('20.00'), Decimal('10.00'), Decimal('5.50'), Decimal('2.10'), Decimal('0.00')]
+    return [
+        (rng.randint(-5, 1000), Decimal(rng.randint(0, max_cents)) / 100, rng.choice(rates))
+        for _ in range(count)
+    ]
+
+
+class MoneyTests(SimpleTestCase):
+    """app/money.py (centimes entiers) recoupé avec un calcul Decimal de référence"""
+
+    CASES = 500
+
+    def test_cents_round_trip(self):
+        rng = random.Random(20)
+        for _ in range(self.CASES):
+            value = Decimal(rng.randint(-10 ** 9, 10 ** 9)) / 100
+            self.assertEqual(money.from_cents(money.to_cents(value)), value)
+        self.assertEqual(money.to_cents(Decimal('0.005')), 1)
+        self.assertEqual(money.to_cents(Decimal('-0.005')), -1)
+        self.assertEqual(money.to_cents(None), 0)
+        self.assertEqual(money.to_rate(Decimal('5.5')), 550)
+
+    def test_divide_matches_round_half_up(self):
+        rng = random.Random(21)
+        for _ in range(self.CASES):
+            numerator, denominator = rng.randint(-10 ** 12, 10 ** 12), rng.choice([2, 3, 100, 10_000])
+            expected = (Decimal(numerator) / denominator).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+            self.assertEqual(money.divide(numerator, denominator), int(expected))
+
+    def test_document_totals_match_decimal_reference(self):
+        rng = random.Random(22)
+        for rule in money.ROUNDING_RULES:
+            for _ in range(self.CASES):
+                lines = random_lines(rng, rng.randint(0, 30))
+                amounts = money.line_amounts(
+                    [quantity for quantity, _, _ in lines], [money.to_cents(price) for _, price, _ in lines],
+                )
+                cents = money.document_totals(amounts, [money.to_rate(rate) for _, _, rate in lines], rule)
+                with self.subTest(rule=rule, lines=lines):
+                    self.assertEqual(tuple(map(money.from_cents, cents)), reference_totals(lines, rule))
+
+    def test_rounding_rules_differ_on_half_cents(self):
+        # 3 lignes à 0,25 € HT et 10 % : 3 × 0,03 (par ligne) contre 0,08 (par document)
+        amounts, rates = [25, 25, 25], [1000, 1000, 1000]
+        self.assertEqual(money.document_totals(amounts, rates, money.LINE).vat, 9)
+        self.assertEqual(money.document_totals(amounts, rates, money.DOCUMENT).vat, 8)
+
+
+class DocumentTotalsTests(TestCase):
+    """Totaux stockés (incrémentaux ou recalculés) égaux à la référence Decimal"""
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+
+    def check_invoice(self, rule):
+        rng = random.Random(23)
+        invoice = create_invoice(self.user, self.client_record)
+        lines = [
+            InvoiceLines.objects.create(invoice=invoice, quantity=quantity, price_unit=price, taux_vat=rate)
+            for quantity, price, rate in random_lines(rng, 12, max_cents=10 ** 5) if quantity > 0 and price
+        ]
+        lines[0].quantity += 3
+        lines[0].save()
+        lines[-1].delete()
+        expected = [(line.quantity, line.price_unit, line.taux_vat) for line in lines[:-1]]
+
+        invoice.refresh_from_db()
+        self.assertEqual((invoice.price_et, invoice.price_vat, invoice.price_ati), reference_totals(expected, rule))
+        self.assertEqual(tuple(invoice.calculate_totals()), reference_totals(expected, rule))
+
+    def test_line_rounding(self):
+        self.check_invoice(money.LINE)
+
+    @override_settings(VAT_ROUNDING=money.DOCUMENT)
+    def test_document_rounding(self):
+        self.check_invoice(money.DOCUMENT)
+
+    def assertTotalsMatchLines(self, *invoices):
+        for invoice in invoices:
+            invoice.refresh_from_db()
+            expected = [(line.quantity, line.price_unit, line.taux_vat) for line in invoice.invoice_lines.all()]
+            self.assertEqual((invoice.price_et, invoice.price_vat, invoice.price_ati), reference_totals(expected, money.LINE))
+
+    def test_create_update_move_delete(self):
+        invoice, other = create_invoice(self.user, self.client_record), create_invoice(self.user, self.client_record)
+        line = InvoiceLines.objects.create(invoice=invoice, quantity=2, price_unit=Decimal('10.00'), taux_vat=Decimal('20'))
+        InvoiceLines.objects.create(invoice=invoice, quantity=1, price_unit=Decimal('3.33'), taux_vat=Decimal('5.50'))
+        self.assertTotalsMatchLines(invoice)
+        line.price_unit = Decimal('12.50')
+        line.save()
+        self.assertTotalsMatchLines(invoice)
+        line.invoice = other
+        line.save()
+        self.assertTotalsMatchLines(invoice, other)
+        line.delete()
+        self.assertTotalsMatchLines(invoice, other)
+        self.assertEqual(other.price_ati, Decimal('0.00'))
+
+    def test_stale_instance_does_not_drift(self):
+        invoice = create_invoice(self.user, self.client_record)
+        line = InvoiceLines.objects.create(invoice=invoice, quantity=1, price_unit=Decimal('10.00'), taux_vat=Decimal('20'))
+        stale = InvoiceLines.objects.get(pk=line.pk)
+        line.quantity = 5
+        line.save()
+        # delta calculé depuis la ligne en base (quantité 5), pas depuis l'instance chargée (1)
+        stale.quantity = 2
+        stale.save()
+        self.assertTotalsMatchLines(invoice)
+        InvoiceLines.objects.get(pk=line.pk).save(update_fields=['note'])
+        stale.delete()
+        self.assertTotalsMatchLines(invoice)
+        self.assertEqual(invoice.price_et, Decimal('0.00'))
+
+    def test_loading_lines_takes_no_snapshot(self):
+        invoice = create_invoice(self.user, self.client_record)
+        InvoiceLines.objects.create(invoice=invoice, quantity=1, price_unit=Decimal('10.00'), taux_vat=Decimal('20'))
+        self.assertFalse(hasattr(InvoiceLines.objects.get(), '_totals_snapshot'))
+
+
+@override_settings(THROTTLE_ENABLED=False)
+@override_settings(THROTTLE_ENABLED=False)
+class VersioningTests(TestCase):
+    """Version monotone et verrou optimiste (app/versioning.py)"""
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+        self.invoice = create_invoice(self.user, self.client_record)
+        self.url = f'/api/invoices/{self.invoice.pk}/'
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {auth.issue_token(self.user)[0]}')
+
+    def version(self):
+        return Invoices.objects.values_list('version', flat=True).get(pk=self.invoice.pk)
+
+    def test_stale_save_raises_version_conflict(self):
+        stale = Invoices.objects.get(pk=self.invoice.pk)
+        version = self.version()
+        self.invoice.payements_method = 'Virement'
+        self.invoice.save()
+        self.assertEqual((self.invoice.version, self.version()), (version + 1, version + 1))
+        stale.payements_method = 'Chèque'
+        with self.assertRaises(VersionConflict), transaction.atomic():
+            stale.save()
+        self.assertTrue(Invoices.objects.filter(pk=self.invoice.pk, payements_method='Virement').exists())
+
+    def concurrent_write(self, **headers):
+        """PATCH pendant lequel une autre écriture passe entre lecture et sauvegarde"""
+        update = InvoicesSerializer.update
+
+        def interleaved(serializer, instance, validated_data):
+            Invoices.objects.filter(pk=instance.pk).update(version=F('version') + 1)
+            return update(serializer, instance, validated_data)
+
+        # DRF annule le bloc atomique englobant quand il traite l'exception
+        with mock.patch.object(InvoicesSerializer, 'update', interleaved), transaction.atomic():
+            return self.api.patch(self.url, {'payements_method': 'Virement'}, format='json', **headers)
+
+    def test_conflict_is_412_with_if_match_and_409_without(self):
+        etag = self.api.get(self.url)['ETag']
+        self.assertEqual(self.concurrent_write(HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertEqual(self.concurrent_write().status_code, 409)
+        self.assertTrue(Invoices.objects.filter(pk=self.invoice.pk, payements_method='CB').exists())
+
+    def test_line_writes_and_recompute_bump_the_version(self):
+        stale = Invoices.objects.get(pk=self.invoice.pk)
+        version = self.version()
+        line = InvoiceLines.objects.create(invoice=self.invoice, quantity=1, price_unit=Decimal('10.00'), taux_vat=Decimal('20'))
+        self.assertEqual(self.version(), version + 1)
+        line.note = "Sans effet sur les montants"
+        line.save()
+        self.assertEqual(self.version(), version + 2)
+        line.delete()
+        self.assertEqual(self.version(), version + 3)
+        self.invoice.refresh_from_db()
+        totals.recompute_totals(self.invoice)
+        self.assertEqual((self.invoice.version, self.version()), (version + 4, version + 4))
+        # l'instance lue avant ces écritures est périmée
+        with self.assertRaises(VersionConflict), transaction.atomic():
+            stale.save()
+
+
+class BulkLinesTests(TestCase):
+    """POST /api/invoice_lines/bulk/ (app/bulk.py) : erreurs par ligne, 207"""
+
+    URL = '/api/invoice_lines/bulk/'
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+        self.invoice = create_invoice(self.user, self.client_record)
+        self.lines = [
+            InvoiceLines.objects.create(invoice=self.invoice, quantity=1, price_unit=Decimal('10.00'), taux_vat=Decimal('20'))
+            for _ in range(3)
+        ]
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.user)
+
+    def post(self, payload):
+        return self.api.post(self.URL, payload, format='json')
+
+    def test_valid_batch_updates_totals(self):
+        response = self.post({
+            'create': [{'invoice': self.invoice.pk, 'quantity': 2, 'price_unit': '5.00', 'taux_vat': '20'}],
+            'update': [{'id': self.lines[0].pk, 'quantity': 3}],
+            'delete': [self.lines[1].pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(response.data['deleted'], [self.lines[1].pk])
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.price_et, Decimal('50.00'))
+
+    def test_row_errors_return_207_and_apply_valid_rows(self):
+        response = self.post({
+            'create': [
+                {'invoice': self.invoice.pk, 'quantity': 'x'},
+                {'quantity': 1},
+                {'invoice': self.invoice.pk, 'quantity': 1, 'price_unit': '1.00', 'taux_vat': '20'},
+            ],
+            'update': [{'id': 999999, 'quantity': 2}],
+            'delete': [999999],
+        })
+        self.assertEqual(response.status_code, 207)
+        errors = {(error['op'], error['index']): error['errors'] for error in response.data['errors']}
+        self.assertEqual(set(errors), {('create', 0), ('create', 1), ('update', 0), ('delete', 0)})
+        self.assertIn('quantity', errors['create', 0])
+        self.assertIn('invoice', errors['create', 1])
+        self.assertEqual(errors['update', 0], {'id': ["Ligne introuvable."]})
+        self.assertEqual(len(response.data['created']), 1)
+
+    def test_cross_tenant_lines_and_documents_are_not_found(self):
+        other, other_client = create_tenant('other@autodf.fr')
+        foreign_invoice = create_invoice(other, other_client)
+        foreign_line = InvoiceLines.objects.create(invoice=foreign_invoice, quantity=1, price_unit=Decimal('1.00'))
+        response = self.post({
+            'create': [{'invoice': foreign_invoice.pk, 'quantity': 1}],
+            'update': [{'id': foreign_line.pk, 'quantity': 5}, {'id': self.lines[0].pk, 'invoice': foreign_invoice.pk}],
+            'delete': [foreign_line.pk],
+        })
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(len(response.data['errors']), 4)
+        self.assertEqual(response.data['deleted'], [])
+        self.assertTrue(InvoiceLines.objects.filter(pk=foreign_line.pk, quantity=1).exists())
+        self.assertEqual(InvoiceLines.objects.get(pk=self.lines[0].pk).invoice_id, self.invoice.pk)
+
+    def test_id_in_update_and_delete_is_rejected(self):
+        pk = self.lines[0].pk
+        response = self.post({'update': [{'id': pk, 'quantity': 4}], 'delete': [pk, self.lines[1].pk]})
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(
+            {(error['op'], error['index']) for error in response.data['errors']}, {('update', 0), ('delete', 0)},
+        )
+        self.assertEqual(response.data['updated'], [])
+        self.assertEqual(response.data['deleted'], [self.lines[1].pk])
+        self.assertEqual(InvoiceLines.objects.get(pk=pk).quantity, 1)
+
+
+class RenderCacheTests(TestCase):
+    """Cache disque des PDF (app/rendering.py)"""
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+        self.invoice = create_invoice(self.user, self.client_record)
+        self.line = InvoiceLines.objects.create(invoice=self.invoice, quantity=1, price_unit=Decimal('100.00'), taux_vat=Decimal('20'))
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.cache = rendering.RenderCache(directory, grace=60)
+        self.render = self.enterContext(mock.patch('app.pdf.render_document', wraps=pdf.render_document))
+
+    def open(self):
+        with rendering.open_one('invoices', self.invoice, cache=self.cache) as rendered:
+            return rendered.read()
+
+    def versions(self):
+        return sorted(self.cache.directory.glob(f'invoices/{self.invoice.pk}/*.pdf'))
+
+    def test_unchanged_document_is_a_hit(self):
+        content = self.open()
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.assertEqual(self.open(), content)
+        self.assertEqual(self.render.call_count, 1)
+
+    def test_change_renders_a_new_version_and_prunes_after_grace(self):
+        self.open()
+        [first] = self.versions()
+        self.line.quantity = 2
+        self.line.save()
+        self.invoice.refresh_from_db()
+        self.open()
+        self.assertEqual(self.render.call_count, 2)
+        # ancienne version conservée pendant le délai de grâce
+        self.assertEqual(len(self.versions()), 2)
+        os.utime(first, (time.time() - 120, time.time() - 120))
+        self.line.quantity = 3
+        self.line.save()
+        self.invoice.refresh_from_db()
+        self.open()
+        self.assertNotIn(first, self.versions())
+        self.assertEqual(len(self.versions()), 2)
+
+    def test_file_removed_before_open_is_rendered_again(self):
+        self.open()
+        [path] = self.versions()
+        path.unlink()
+        with mock.patch.object(rendering.RenderCache, 'get', return_value=path):
+            self.assertTrue(self.open().startswith(b'%PDF'))
+        self.assertEqual(self.render.call_count, 2)
+        self.assertTrue(path.exists())
+
+
+class PdfLayoutTests(SimpleTestCase):
+    """Mise en page des PDF (app/pdf.py)"""
+
+    def payload(self, lines):
+        return {
+            'title': "Facture FA2026-00001", 'date': '2026-01-31', 'issuer': ["Entreprise"], 'client': ["Client"],
+            'lines': [
+                {'description': description, 'quantity': 1, 'price_unit': '10', 'rate_vat': 20, 'amount_et': '10'}
+                for description in lines
+            ],
+            'totals': {'price_et': '10', 'price_vat': '2', 'price_ati': '12'},
+        }
+
+    def texts(self, content):
+        return re.findall(r'\((.*?)\) Tj', content.decode('latin-1'))
+
+    def test_long_descriptions_wrap_instead_of_being_cut(self):
+        description = ' '.join(f"Fourniture et pose n°{i}" for i in range(12)) + ' Réf-' + 'X' * 60
+        rows = pdf.wrap_text(description, pdf.DESCRIPTION_WIDTH)
+        self.assertGreater(len(rows), 3)
+        self.assertEqual(''.join(rows).replace(' ', ''), description.replace(' ', ''))
+        texts = self.texts(pdf.render_document(self.payload([description])))
+        for row in rows:
+            self.assertLessEqual(pdf.text_width(row, 10), pdf.DESCRIPTION_WIDTH)
+            self.assertIn(row, texts)
+
+    def test_wrapped_lines_break_across_pages(self):
+        content = pdf.render_document(self.payload(['mot ' * 200] * 12))
+        self.assertGreater(content.count(b'/Type /Page '), 1)
+        self.assertEqual(sum(text.count('mot') for text in self.texts(content)), 200 * 12)
+
+class JobQueueTests(TestCase):
+    """File de tâches (app/jobs.py) exécutée dans le thread du test ; e-mails en mémoire (locmem)"""
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.user)
+        self.invoice = create_invoice(self.user, self.client_record)
+        InvoiceLines.objects.create(invoice=self.invoice, quantity=1, price_unit=Decimal('100.00'), taux_vat=Decimal('20'))
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(RENDER_CACHE_DIR=Path(directory.name)))
+
+    def work(self):
+        """Exécute les tâches dues une à une ; retourne les tâches traitées"""
+        processed = []
+        while claimed := jobs.claim('test'):
+            processed.append(jobs.run(claimed[0]))
+        return processed
+
+    def test_send_document_emails_pdf_and_marks_sent(self):
+        response = self.api.post(f'/api/invoices/{self.invoice.pk}/send/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(mail.outbox), 0)
+
+        [job] = self.work()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(len(mail.outbox), 1)
+        message = mail.outbox[0]
+        self.assertEqual(message.to, [self.client_record.email])
+        self.assertIn(self.invoice.invoice_number, message.subject)
+        filename, content, mimetype = message.attachments[0]
+        self.assertEqual((filename, mimetype), (f'invoices-{self.invoice.pk}.pdf', 'application/pdf'))
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.invoice.refresh_from_db()
+        self.assertTrue(self.invoice.sent)
+        self.assertEqual(self.invoice.sent_date, timezone.localdate())
+        self.assertEqual(self.api.get(f'/api/jobs/{job.pk}/').data['status'], Job.DONE)
+
+    def test_send_is_idempotent(self):
+        first = self.api.post(f'/api/invoices/{self.invoice.pk}/send/')
+        second = self.api.post(f'/api/invoices/{self.invoice.pk}/send/')
+        keyed = self.api.post(f'/api/invoices/{self.invoice.pk}/send/', HTTP_IDEMPOTENCY_KEY='abc')
+        again = self.api.post(f'/api/invoices/{self.invoice.pk}/send/', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual([r.status_code for r in (first, second, keyed, again)], [202, 200, 202, 200])
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(keyed.data['id'], again.data['id'])
+        self.work()
+        self.assertEqual(len(mail.outbox), 2)
+
+    @override_settings(JOBS_RETRY_DELAY=10, JOBS_RETRY_MAX_DELAY=25)
+    def test_failures_are_retried_with_backoff_then_failed(self):
+        calls = []
+
+        def flaky(job):
+            calls.append(job.attempts)
+            raise ConnectionError("SMTP indisponible")
+
+        with mock.patch.dict(jobs.HANDLERS, {'flaky': flaky}):
+            job, _ = jobs.enqueue('flaky', max_attempts=3)
+            delays = []
+            for _ in range(3):
+                Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+                started = timezone.now()
+                with self.assertLogs('app.jobs', 'WARNING'):
+                    [job] = self.work()
+                delays.append((job.run_at - started).total_seconds())
+        self.assertEqual(calls, [1, 2, 3])
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("SMTP indisponible", job.last_error)
+        self.assertAlmostEqual(delays[0], 10, delta=1.1)
+        self.assertAlmostEqual(delays[1], 20, delta=2.1)
+        self.assertEqual(self.work(), [])
+
+    def test_permanent_error_is_not_retried(self):
+        Clients.objects.filter(pk=self.client_record.pk).update(email='')
+        job, _ = jobs.enqueue('send_document', {'kind': 'invoices', 'id': self.invoice.pk}, user=self.user)
+        with self.assertLogs('app.jobs', 'ERROR'):
+            [job] = self.work()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_render_batch_job(self):
+        response = self.api.post('/api/invoices/render/', {'year': timezone.localdate().year}, format='json')
+        self.assertEqual(response.status_code, 202)
+        [job] = self.work()
+        self.assertEqual(job.result, {'rendered': 1, 'cached': 0})
+
+    def test_outcome_of_a_requeued_run_is_ignored(self):
+        def stalled(job):
+            # verrou expiré pendant le handler : reprise puis nouvelle prise
+            jobs.requeue_stale(timeout=0)
+            [retaken] = jobs.claim('other')
+            self.assertEqual(retaken.pk, job.pk)
+            raise ConnectionError("délai dépassé")
+
+        with mock.patch.dict(jobs.HANDLERS, {'stalled': stalled}):
+            job, _ = jobs.enqueue('stalled')
+            [claimed] = jobs.claim('test')
+            with self.assertLogs('app.jobs', 'WARNING') as logs:
+                job = jobs.run(claimed)
+        self.assertIn("issue ignorée", logs.output[-1])
+        self.assertEqual((job.status, job.locked_by, job.attempts, job.last_error), (Job.RUNNING, 'other', 2, ''))
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class ConcurrentJobWorkerTests(TransactionTestCase):
+    """Plusieurs threads sur la même file : chaque tâche exécutée une seule fois"""
+
+    JOBS = 40
+
+    def test_each_job_runs_once(self):
+        executed = []
+        lock = threading.Lock()
+
+        def record(job):
+            with lock:
+                executed.append(job.pk)
+            return {'ok': True}
+
+        with mock.patch.dict(jobs.HANDLERS, {'record': record}):
+            created = [jobs.enqueue('record')[0].pk for _ in range(self.JOBS)]
+            processed = jobs.Worker(concurrency=8, burst=True, poll_interval=0).run()
+
+        self.assertEqual(processed, self.JOBS)
+        self.assertEqual(sorted(executed), sorted(created))
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), self.JOBS)
+
+    @override_settings(JOBS_LOCK_TIMEOUT=0.3)
+    def test_long_handlers_keep_their_lock(self):
+        def slow(job):
+            claimed_at = job.locked_at
+            time.sleep(0.5)
+            # locked_at rafraîchi : la tâche n'est pas considérée abandonnée
+            self.assertGreater(Job.objects.get(pk=job.pk).locked_at, claimed_at)
+            self.assertEqual(jobs.requeue_stale(), 0)
+            return {'ok': True}
+
+        with mock.patch.dict(jobs.HANDLERS, {'slow': slow}):
+            job, _ = jobs.enqueue('slow')
+            [claimed] = jobs.claim('test')
+            job = jobs.run(claimed)
+        self.assertEqual((job.status, job.result), (Job.DONE, {'ok': True}))
+
+
+class AuthTests(TestCase):
+    """Connexion, jetons d'API, re-hachage et pool de hachage (app/auth.py, app/passwords.py)"""
+
+    PASSWORD = 'correct horse battery'
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+        self.user.set_password(self.PASSWORD)
+        self.user.save()
+        self.api = APIClient()
+        self.addCleanup(passwords.reset)
+
+    def login(self, password=None, email='tenant@autodf.fr'):
+        return self.api.post('/api/auth/login/', {'email': email, 'password': password or self.PASSWORD}, format='json')
+
+    def test_login_issues_token_usable_on_api(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        token = response.data['token']
+        self.assertFalse(AuthToken.objects.filter(digest=token).exists())
+        self.assertEqual(self.api.get('/api/clients/').status_code, 401)
+        response = self.api.get('/api/clients/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([client['id'] for client in response.data['results']], [self.client_record.pk])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login, timezone.localdate())
+
+    def test_invalid_credentials(self):
+        self.assertEqual(self.login(password='wrong').status_code, 400)
+        self.assertEqual(self.login(email='nobody@autodf.fr').status_code, 400)
+        self.assertEqual(AuthToken.objects.count(), 0)
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.ScryptPasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher',
+    ])
+    def test_outdated_hash_is_upgraded_on_login(self):
+        Users.objects.filter(pk=self.user.pk).update(password=make_password(self.PASSWORD, hasher='md5'))
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+        self.assertTrue(self.user.check_password(self.PASSWORD))
+
+    def test_logout_and_expiry_revoke_token(self):
+        token = self.login().data['token']
+        header = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+        self.assertEqual(self.api.post('/api/auth/logout/', **header).status_code, 204)
+        self.assertEqual(self.api.get('/api/clients/', **header).status_code, 401)
+
+        token = self.login().data['token']
+        AuthToken.objects.update(expires_at=timezone.now())
+        self.assertEqual(self.api.get('/api/clients/', HTTP_AUTHORIZATION=f'Bearer {token}').status_code, 401)
+
+    @override_settings(AUTH_HASH_WORKERS=1, AUTH_HASH_QUEUE=0, AUTH_HASH_TIMEOUT=0.05)
+    def test_saturated_hash_pool_returns_503(self):
+        passwords.reset()
+        _, slots = passwords._pool()
+        slots.acquire()
+        try:
+            response = self.login()
+        finally:
+            slots.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.login().status_code, 200)
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class AccountTests(TestCase):
+    """Endpoint /api/users/ : inscription ouverte, sinon le seul compte du jeton"""
+
+    PASSWORD = 'correct horse battery'
+
+    def setUp(self):
+        self.user, _ = create_tenant()
+        self.user.set_password(self.PASSWORD)
+        self.user.save()
+        self.other, _ = create_tenant('other@autodf.fr')
+        self.token = auth.issue_token(self.user)[0]
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.addCleanup(passwords.reset)
+
+    def test_anonymous_can_only_sign_up(self):
+        anonymous = APIClient()
+        self.assertEqual(anonymous.get('/api/users/').status_code, 401)
+        self.assertEqual(anonymous.get(f'/api/users/{self.user.pk}/').status_code, 401)
+        response = anonymous.patch(f'/api/users/{self.user.pk}/', {'password': 'pirate'}, format='json')
+        self.assertEqual(response.status_code, 401)
+        response = anonymous.post('/api/users/', {
+            'email': 'new@autodf.fr', 'name_business': "Nouvelle", 'password': 'secret password',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertNotIn('password', response.data)
+
+    def test_other_accounts_are_not_visible(self):
+        response = self.api.get('/api/users/')
+        self.assertEqual([user['id'] for user in response.data['results']], [self.user.pk])
+        self.assertEqual(self.api.get(f'/api/users/{self.other.pk}/').status_code, 404)
+        response = self.api.patch(f'/api/users/{self.other.pk}/', {'password': 'pirate'}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.api.delete(f'/api/users/{self.other.pk}/').status_code, 404)
+        self.assertTrue(Users.objects.filter(pk=self.other.pk).exists())
+
+    def test_password_change_requires_current_password_and_revokes_tokens(self):
+        url = f'/api/users/{self.user.pk}/'
+        response = self.api.patch(url, {'password': 'new password'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('current_password', response.data)
+        response = self.api.patch(url, {'password': 'new password', 'current_password': 'wrong'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.api.patch(url, {'first_name': "Jeanne"}, format='json').status_code, 200)
+
+        response = self.api.patch(url, {'password': 'new password', 'current_password': self.PASSWORD}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('new password'))
+        self.assertFalse(AuthToken.objects.filter(users_id=self.user).exists())
+        self.assertEqual(self.api.get(url).status_code, 401)
+
+
+class TenantScopingTests(TestCase):
+    """Chaque utilisateur ne voit et ne modifie que ses données (TenantScopedMixin), via de vrais jetons"""
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+        self.other, self.other_client = create_tenant('other@autodf.fr')
+        create_documents(self.other, self.other_client, 1)
+        self.other_invoice = Invoices.objects.get(users_id=self.other)
+        self.other_estimate = Estimates.objects.get(users_id=self.other)
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {auth.issue_token(self.user)[0]}')
+
+    def test_anonymous_requests_are_rejected(self):
+        anonymous = APIClient()
+        for url in ('/api/clients/', '/api/invoices/', '/api/estimate_lines/', f'/api/async/invoices/{self.other_invoice.pk}/'):
+            with self.subTest(url=url):
+                self.assertEqual(anonymous.get(url).status_code, 401)
+
+    def test_lists_only_contain_own_rows(self):
+        create_documents(self.user, self.client_record, 1)
+        for url, model in (('/api/clients/', Clients), ('/api/invoices/', Invoices), ('/api/invoice_lines/', InvoiceLines)):
+            with self.subTest(url=url):
+                ids = {row['id'] for row in self.api.get(url, {'page_size': 50}).data['results']}
+                own = set(model.objects.for_tenant(self.user).values_list('pk', flat=True))
+                self.assertEqual(ids, own)
+                self.assertTrue(own)
+
+    def test_other_tenant_objects_are_not_found(self):
+        requests = [
+            ('get', f'/api/invoices/{self.other_invoice.pk}/'),
+            ('get', f'/api/async/estimates/{self.other_estimate.pk}/'),
+            ('patch', f'/api/clients/{self.other_client.pk}/'),
+            ('delete', f'/api/estimates/{self.other_estimate.pk}/'),
+            ('get', f'/api/invoice_lines/{self.other_invoice.invoice_lines.first().pk}/'),
+        ]
+        for method, url in requests:
+            with self.subTest(method=method, url=url):
+                self.assertEqual(getattr(self.api, method)(url, {}, format='json').status_code, 404)
+        self.assertTrue(Estimates.objects.filter(pk=self.other_estimate.pk).exists())
+
+    def test_cannot_attach_to_other_tenant_rows(self):
+        response = self.api.post('/api/invoices/', {
+            'clients_id': self.other_client.pk, 'payements_method': 'CB', 'payment_date': '2026-01-31',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('clients_id', response.data)
+        response = self.api.post('/api/invoice_lines/', {
+            'invoice': self.other_invoice.pk, 'quantity': 1, 'price_unit': '1.00',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('invoice', response.data)
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class CachedRetrieveTests(TestCase):
+    """Détail servi depuis le cache (CachedRetrieveMixin, app/cache.py)"""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.user, self.client_record = create_tenant()
+        self.invoice = create_invoice(self.user, self.client_record)
+        self.url = f'/api/invoices/{self.invoice.pk}/'
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {auth.issue_token(self.user)[0]}')
+
+    def get(self, query=''):
+        response = self.api.get(f'{self.url}{query}')
+        return response['X-Cache'], response.json()
+
+    def test_each_representation_has_its_own_entry(self):
+        self.assertEqual(self.get('?fields=invoice_number,id'), ('MISS', {'id': self.invoice.pk, 'invoice_number': self.invoice.invoice_number}))
+        # mêmes champs, autre ordre : même entrée
+        self.assertEqual(self.get('?fields=id,invoice_number')[0], 'HIT')
+        status, data = self.get()
+        self.assertEqual(status, 'MISS')
+        self.assertIn('lines', data)
+        self.assertEqual(self.get()[0], 'HIT')
+        self.assertEqual(self.get('?format=json')[0], 'HIT')
+
+    def test_writes_invalidate_the_entries(self):
+        self.get()
+        self.get('?fields=payements_method')
+        self.api.patch(self.url, {'payements_method': 'Virement'}, format='json')
+        self.assertEqual(self.get()[0], 'MISS')
+        self.assertEqual(self.get('?fields=payements_method'), ('MISS', {'payements_method': 'Virement'}))
+
+        InvoiceLines.objects.create(invoice=self.invoice, quantity=1, price_unit=Decimal('10.00'), taux_vat=Decimal('20'))
+        status, data = self.get()
+        self.assertEqual((status, len(data['lines']), data['price_et']), ('MISS', 1, '10.00'))
+
+        self.assertEqual(self.api.delete(self.url).status_code, 204)
+        self.assertEqual(self.api.get(self.url).status_code, 404)
+
+
+@override_settings(THROTTLE_ENABLED=False)
+@override_settings(THROTTLE_ENABLED=False)
+class AsyncReadTests(TestCase):
+    """Lectures /api/async/... (app/views/async_reads.py) : mêmes données que les viewsets"""
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+        create_documents(self.user, self.client_record, 4, lines_per_document=2)
+        other, other_client = create_tenant('other@autodf.fr')
+        create_documents(other, other_client, 1)
+        self.other_invoice = Invoices.objects.get(users_id=other)
+        self.token = auth.issue_token(self.user)[0]
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def aget(self, url, token=True, headers=None):
+        headers = dict(headers or {})
+        if token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        return async_to_sync(self.async_client.get)(url, headers=headers)
+
+    def test_lists_match_the_sync_endpoints(self):
+        for resource, query in (('clients', ''), ('estimates', ''), ('invoices', '?expand=lines'), ('invoices', '?page_size=2')):
+            with self.subTest(resource=resource, query=query):
+                expected = self.api.get(f'/api/{resource}/{query}').json()
+                response = self.aget(f'/api/async/{resource}/{query}')
+                self.assertEqual(response.status_code, 200)
+                data = json.loads(response.content)
+                self.assertEqual(data['results'], expected['results'])
+                self.assertEqual(data['next'] is None, expected['next'] is None)
+
+    def test_details_match_the_sync_endpoints(self):
+        invoice = Invoices.objects.filter(users_id=self.user).first()
+        estimate = Estimates.objects.filter(users_id=self.user).first()
+        for url in (f'invoices/{invoice.pk}/', f'estimates/{estimate.pk}/', f'clients/{self.client_record.pk}/'):
+            with self.subTest(url=url):
+                response = self.aget(f'/api/async/{url}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(json.loads(response.content), self.api.get(f'/api/{url}').json())
+        self.assertEqual(len(json.loads(self.aget(f'/api/async/invoices/{invoice.pk}/').content)['lines']), 2)
+
+    def test_anonymous_and_foreign_requests(self):
+        response = self.aget('/api/async/invoices/', token=False)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+        self.assertEqual(self.aget(f'/api/async/invoices/{self.other_invoice.pk}/').status_code, 404)
+        self.assertEqual(self.aget('/api/async/estimates/999999/').status_code, 404)
+
+    def test_etags_give_304(self):
+        invoice = Invoices.objects.filter(users_id=self.user).first()
+        for url in ('/api/async/invoices/', f'/api/async/invoices/{invoice.pk}/'):
+            with self.subTest(url=url):
+                etag = self.aget(url)['ETag']
+                self.assertEqual(self.aget(url, headers={'If-None-Match': etag}).status_code, 304)
+        etag = self.aget(f'/api/async/invoices/{invoice.pk}/')['ETag']
+        InvoiceLines.objects.create(invoice=invoice, quantity=1, price_unit=Decimal('5.00'), taux_vat=Decimal('20'))
+        self.assertEqual(self.aget(f'/api/async/invoices/{invoice.pk}/', headers={'If-None-Match': etag}).status_code, 200)
+
+
+class ConditionalRequestTests(TestCase):
+    """ETag / If-None-Match / If-Match (app/etags.py, ConditionalRequestMixin)"""
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+        self.invoice = create_invoice(self.user, self.client_record)
+        self.url = f'/api/invoices/{self.invoice.pk}/'
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {auth.issue_token(self.user)[0]}')
+
+    def test_if_none_match_returns_304_until_the_resource_changes(self):
+        etag = self.api.get(self.url)['ETag']
+        self.assertEqual(self.api.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # autre représentation : autre ETag
+        projected = self.api.get(f'{self.url}?fields=invoice_number', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(projected.status_code, 200)
+        self.assertNotEqual(projected['ETag'], etag)
+        self.api.patch(self.url, {'payements_method': 'Virement'}, format='json')
+        self.assertEqual(self.api.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_match_accepts_etags_of_any_representation(self):
+        for query in ('?fields=invoice_number', '?format=json', '?expand=lines', ''):
+            with self.subTest(query=query):
+                etag = self.api.get(f'{self.url}{query}')['ETag']
+                response = self.api.patch(self.url, {'payements_method': 'Virement'}, format='json', HTTP_IF_MATCH=etag)
+                self.assertEqual(response.status_code, 200, response.content)
+
+    def test_if_match_with_an_outdated_etag_returns_412(self):
+        etag = self.api.get(self.url)['ETag']
+        Invoices.objects.get(pk=self.invoice.pk).save()
+        response = self.api.patch(self.url, {'payements_method': 'Virement'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.api.delete(self.url, HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertEqual(self.api.patch(self.url, {}, format='json', HTTP_IF_MATCH='W/' + etag).status_code, 412)
+        self.assertTrue(Invoices.objects.filter(pk=self.invoice.pk, payements_method='CB').exists())
+
+    def test_unversioned_rows_compare_the_whole_row(self):
+        url = f'/api/users/{self.user.pk}/'
+        etag = self.api.get(f'{url}?fields=email')['ETag']
+        self.assertEqual(self.api.patch(url, {'first_name': "Jeanne"}, format='json', HTTP_IF_MATCH=etag).status_code, 200)
+        self.assertEqual(self.api.patch(url, {'first_name': "Louise"}, format='json', HTTP_IF_MATCH=etag).status_code, 412)
+
+
+class ThrottleTests(TestCase):
+    """Seaux à jetons par utilisateur et par route (app/throttling.py), sur les deux stockages"""
+
+    RATES = {
+        'tenant': '100/min', 'read': '100/min', 'write': '2/min', 'expensive': '1/min',
+        'login': '10/min', 'login_failures': '10/min',
+    }
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.user)
+        self.enterContext(override_settings(THROTTLE_RATES=self.RATES))
+        for backend in throttling.BACKENDS:
+            throttling.get_store(backend).clear()
+
+    def test_write_bucket_returns_429_with_retry_after(self):
+        other, _ = create_tenant('other@autodf.fr')
+        other_api = APIClient()
+        other_api.force_authenticate(user=other)
+        for backend in throttling.BACKENDS:
+            with self.subTest(backend=backend), override_settings(THROTTLE_BACKEND=backend):
+                throttling.get_store().clear()
+                self.assertEqual(self.api.post('/api/clients/', {}, format='json').status_code, 400)
+                self.assertEqual(self.api.post('/api/clients/', {}, format='json').status_code, 400)
+                response = self.api.post('/api/clients/', {}, format='json')
+                self.assertEqual(response.status_code, 429)
+                # 2/min : un jeton toutes les 30 s
+                self.assertEqual(response['Retry-After'], '30')
+                # autres routes et autres utilisateurs non concernés
+                self.assertEqual(self.api.get('/api/clients/').status_code, 200)
+                self.assertEqual(other_api.post('/api/clients/', {}, format='json').status_code, 400)
+
+    def test_database_buckets_refill_over_time(self):
+        for _ in range(2):
+            self.api.post('/api/clients/', {}, format='json')
+        self.assertEqual(self.api.post('/api/clients/', {}, format='json').status_code, 429)
+        ThrottleBucket.objects.update(updated_at=F('updated_at') - timedelta(seconds=30))
+        self.assertEqual(self.api.post('/api/clients/', {}, format='json').status_code, 400)
+        self.assertEqual(self.api.post('/api/clients/', {}, format='json').status_code, 429)
+
+    def test_expensive_actions_have_their_own_limit(self):
+        self.assertEqual(self.api.get('/api/invoices/export/').status_code, 200)
+        response = self.api.get('/api/invoices/export/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(self.api.get('/api/invoices/').status_code, 200)
+
+    @override_settings(THROTTLE_RATES={**RATES, 'tenant': '3/min'})
+    def test_tenant_bucket_spans_endpoints(self):
+        for url in ('/api/clients/', '/api/invoices/', '/api/estimates/'):
+            self.assertEqual(self.api.get(url).status_code, 200)
+        self.assertEqual(self.api.get('/api/jobs/').status_code, 429)
+        response = self.api.get('/api/async/clients/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+
+    @override_settings(THROTTLE_RATES={**RATES, 'tenant': '3/min'})
+    def test_refused_requests_consume_no_token(self):
+        for backend in throttling.BACKENDS:
+            with self.subTest(backend=backend), override_settings(THROTTLE_BACKEND=backend):
+                throttling.get_store().clear()
+                for _ in range(2):
+                    self.assertEqual(self.api.post('/api/clients/', {}, format='json').status_code, 400)
+                # seau de la route vide : le jeton restant de l'utilisateur n'est pas pris
+                for _ in range(3):
+                    self.assertEqual(self.api.post('/api/clients/', {}, format='json').status_code, 429)
+                self.assertEqual(self.api.get('/api/clients/').status_code, 200)
+                self.assertEqual(self.api.get('/api/clients/').status_code, 429)
+
+    def test_login_is_limited_per_client_address_and_per_account(self):
+        anonymous = APIClient()
+
+        def login(email, forwarded):
+            return anonymous.post(
+                '/api/auth/login/', {'email': email, 'password': 'wrong'}, format='json', HTTP_X_FORWARDED_FOR=forwarded,
+            ).status_code
+
+        # adresse ajoutée par nginx en dernier : la partie fournie par le client est ignorée
+        for i in range(10):
+            self.assertEqual(login(f'user{i}@autodf.fr', f'10.0.0.{i}, 203.0.113.1'), 400)
+        self.assertEqual(login('tenant@autodf.fr', '10.0.0.99, 203.0.113.1'), 429)
+        throttling.get_store().clear()
+        # adresse différente à chaque essai : le compte reste limité
+        for i in range(10):
+            self.assertEqual(login(' Tenant@autodf.fr', f'198.51.100.{i}'), 400)
+        self.assertEqual(login('tenant@AUTODF.fr', '198.51.100.200'), 429)
+        self.assertEqual(login('other@autodf.fr', '198.51.100.201'), 400)
+
+    @override_settings(THROTTLE_RATES={**RATES, 'login_failures': '20/min'})
+    def test_successful_logins_do_not_lock_the_account(self):
+        self.user.set_password('secret')
+        self.user.save()
+        anonymous = APIClient()
+
+        def login(password, forwarded):
+            return anonymous.post(
+                '/api/auth/login/', {'email': 'tenant@autodf.fr', 'password': password}, format='json',
+                HTTP_X_FORWARDED_FOR=forwarded,
+            ).status_code
+
+        for i in range(12):
+            self.assertEqual(login('secret', f'198.51.100.{i}'), 200)
+        # un tiers épuise le seau de son adresse avant celui du compte
+        for _ in range(10):
+            self.assertEqual(login('wrong', '203.0.113.7'), 400)
+        self.assertEqual(login('wrong', '203.0.113.7'), 429)
+        self.assertEqual(login('secret', '198.51.100.99'), 200)
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_disabled(self):
+        for _ in range(3):
+            self.assertEqual(self.api.post('/api/clients/', {}, format='json').status_code, 400)
+
+
+class PartitioningTests(TestCase):
+    """Partitions annuelles des factures et lignes (app/partitioning.py)"""
+
+    def setUp(self):
+        self.user, self.client_record = create_tenant()
+        self.invoice = create_invoice(self.user, self.client_record)
+        self.line = InvoiceLines.objects.create(
+            invoice=self.invoice, quantity=1, price_unit=Decimal('10.00'), taux_vat=Decimal('20'),
+        )
+
+    def move_invoice(self, year):
+        partitioning.ensure_year(year)
+        Invoices.objects.filter(pk=self.invoice.pk).update(created_at=date(year, 6, 1))
+        # déclenche la cascade différée vers les lignes
+        connection.check_constraints()
+
+    def test_lines_follow_their_invoice_partition(self):
+        self.assertEqual(self.line.invoice_created_at, self.invoice.created_at)
+        year = timezone.localdate().year - 3
+        self.move_invoice(year)
+        self.assertIn(year, partitioning.attached_years('invoice_lines'))
+        line = InvoiceLines.objects.get(pk=self.line.pk)
+        self.assertEqual(line.invoice_created_at, date(year, 6, 1))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT tableoid::regclass::text FROM invoice_lines WHERE id = %s", [line.pk])
+            self.assertEqual(cursor.fetchone()[0], f"invoice_lines_y{year}")
+
+    def test_invoice_number_is_unique_within_a_year(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Invoices.objects.create(
+                users_id=self.user, clients_id=self.client_record, invoice_number=self.invoice.invoice_number,
+                price_et=Decimal('0'), price_vat=Decimal('0'), price_ati=Decimal('0'),
+                sent_date='2026-01-01', payements_method='CB', payment_date='2026-01-31',
+            )
+
+    def create_numbered(self, number):
+        return Invoices.objects.create(
+            users_id=self.user, clients_id=self.client_record, invoice_number=number,
+            price_et=Decimal('0'), price_vat=Decimal('0'), price_ati=Decimal('0'),
+            sent_date='2026-01-01', payements_method='CB', payment_date='2026-01-31',
+        )
+
+    @override_settings(INVOICE_NUMBER_YEARLY_RESET=False, INVOICE_NUMBER_FORMAT='{prefix}{number:05d}')
+    def test_invoice_number_is_unique_across_years_and_archives(self):
+        number = self.invoice.invoice_number
+        year = timezone.localdate().year - 5
+        self.move_invoice(year)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.create_numbered(number)
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('archive_invoices', before=year + 1, output=directory, drop=True, stdout=StringIO())
+        self.assertFalse(Invoices.objects.exists())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.create_numbered(number)
+
+    def test_deleting_the_invoice_releases_its_number(self):
+        number = self.invoice.invoice_number
+        self.invoice.delete()
+        self.assertEqual(self.create_numbered(number).invoice_number, number)
+
+    def test_year_filter_reads_a_single_partition(self):
+        year = timezone.localdate().year
+        start, end = partitioning.year_bounds(year)
+        plan = InvoiceLines.objects.filter(invoice_created_at__gte=start, invoice_created_at__lt=end).explain()
+        self.assertIn(f"invoice_lines_y{year}", plan)
+        self.assertNotIn(f"invoice_lines_y{year + 1}", plan)
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_detail_reads_lines_from_the_invoice_partition(self):
+        year = timezone.localdate().year
+        partitioning.ensure_year(year + 1)
+        api = APIClient()
+        api.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = api.get(f'/api/invoices/{self.invoice.pk}/')
+        self.assertEqual([line['id'] for line in response.json()['lines']], [self.line.pk])
+        sql = next(query['sql'] for query in queries if query['sql'].startswith('SELECT') and 'FROM "invoice_lines"' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {sql}")
+            plan = '\n'.join(row for row, in cursor.fetchall())
+        self.assertIn(f"invoice_lines_y{year}", plan)
+        self.assertNotIn(f"invoice_lines_y{year + 1}", plan)
+
+    def test_totals_and_bulk_writes_are_pruned(self):
+        year = timezone.localdate().year
+        partitioning.ensure_year(year + 1)
+        self.assertNotIn(f"invoice_lines_y{year + 1}", totals.document_lines(self.invoice).explain())
+        with CaptureQueriesContext(connection) as queries:
+            result = bulk_apply_lines(
+                InvoiceLinesSerializer, {'update': [{'id': self.line.pk, 'quantity': 2}]},
+                queryset=InvoiceLines.objects.all(), document_queryset=Invoices.objects.all(),
+            )
+        self.assertEqual(result['errors'], [])
+        # écritures des lignes / factures et agrégat des totaux
+        statements = [query['sql'] for query in queries]
+        writes = [sql for sql in statements if sql.startswith('UPDATE "invoice') or 'SUM(' in sql and 'FROM "invoice_lines"' in sql]
+        self.assertTrue(writes)
+        for sql in writes:
+            self.assertIn('created_at" ', sql)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.price_ati, Decimal('24.00'))
+
+    def test_archive_detaches_and_exports_past_years(self):
+        year = timezone.localdate().year - 5
+        self.move_invoice(year)
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('archive_invoices', before=year + 1, output=directory, drop=True, stdout=StringIO())
+            manifest = json.loads((Path(directory) / str(year) / 'manifest.json').read_text())
+            self.assertEqual(manifest['tables']['invoices']['rows'], 1)
+            self.assertEqual(manifest['tables']['invoice_lines']['rows'], 1)
+            with gzip.open(Path(directory) / str(year) / f"invoices_y{year}.csv.gz", 'rt') as archive:
+                rows = list(csv.DictReader(archive))
+            self.assertEqual(rows[0]['invoice_number'], self.invoice.invoice_number)
+        self.assertNotIn(year, partitioning.partition_years('invoices'))
+        self.assertFalse(Invoices.objects.filter(pk=self.invoice.pk).exists())
+        self.assertFalse(InvoiceLines.objects.exists())
+
+    def test_rebuild_keeps_detached_years(self):
+        year = timezone.localdate().year - 5
+        self.move_invoice(year)
+        reports.rebuild_all()
+        state = rollup_state()
+        self.assertTrue(state[0])
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('archive_invoices', before=year + 1, output=directory, stdout=StringIO())
+        self.assertFalse(Invoices.objects.exists())
+        reports.rebuild_all()
+        self.assertEqual(rollup_state(), state)
+
+    def test_estimate_stays_invoiced_after_its_partition_is_dropped(self):
+        estimate = Estimates.objects.create(users_id=self.user, clients_id=self.client_record)
+        Invoices.objects.filter(pk=self.invoice.pk).update(estimates_id=estimate)
+        Estimates.objects.filter(pk=estimate.pk).update(invoiced_at=self.invoice.created_at)
+        year = timezone.localdate().year - 5
+        self.move_invoice(year)
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('archive_invoices', before=year + 1, output=directory, drop=True, stdout=StringIO())
+        estimate.refresh_from_db()
+        self.assertIsNotNone(estimate.invoiced_at)
+        options = {'payements_method': 'CB', 'payment_date': date(2026, 1, 31)}
+        invoices, errors = convert_estimates(Estimates.objects.all(), [estimate.pk], options)
+        self.assertEqual(invoices, [])
+        self.assertEqual(errors, [{'id': estimate.pk, 'errors': ["Devis déjà facturé."]}])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Invoices.objects.create(
+                users_id=self.user, clients_id=self.client_record, estimates_id=estimate,
+                payements_method='CB', payment_date='2026-01-31',
+            )
+
+    def test_deleting_the_invoice_releases_its_estimate(self):
+        estimate = Estimates.objects.create(users_id=self.user, clients_id=self.client_record)
+        invoice = Invoices.objects.create(
+            users_id=self.user, clients_id=self.client_record, estimates_id=estimate,
+            payements_method='CB', payment_date='2026-01-31',
+        )
+        estimate.refresh_from_db()
+        self.assertEqual(estimate.invoiced_at, invoice.created_at)
+        invoice.delete()
+        estimate.refresh_from_db()
+        self.assertIsNone(estimate.invoiced_at)
+
+    def test_archive_refuses_current_year(self):
+        with self.assertRaises(CommandError):
+            call_command('archive_invoices', before=timezone.localdate().year + 1, stdout=StringIO())
+
+
+@override_settings(THROTTLE_BACKEND='memory')
+class ColdStorageTests(TestCase):
+    """Archivage froid des documents clos et lecture transparente (app/coldstorage.py)"""
+
+    def setUp(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(COLD_STORAGE_DIR=Path(directory)))
+        self.addCleanup(coldstorage.snapshots.clear)
+        self.user, self.client_record = create_tenant()
+        create_documents(self.user, self.client_record, 1, lines_per_document=2)
+        Invoices.objects.update(paid_at=timezone.localdate())
+        self.invoice = Invoices.objects.get()
+        self.estimate = Estimates.objects.get()
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.user)
+        self.tomorrow = timezone.localdate() + timedelta(days=1)
+
+    def test_archived_documents_are_served_by_retrieve(self):
+        urls = [
+            f'/api/invoices/{self.invoice.pk}/',
+            f'/api/estimates/{self.estimate.pk}/',
+            f'/api/async/invoices/{self.invoice.pk}/',
+        ]
+        before = {url: self.api.get(url).json() for url in urls}
+        revenue = list(RevenueRollup.objects.values_list('price_et', flat=True))
+        archived = coldstorage.archive(self.tomorrow)
+        self.assertEqual([(kind, count) for kind, _, _, _, count in archived], [('invoices', 1), ('estimates', 1)])
+        self.assertFalse(Invoices.objects.exists() or InvoiceLines.objects.exists())
+        self.assertFalse(Estimates.objects.exists() or EstimateLines.objects.exists())
+        # suppression hors signaux : les agrégats restent
+        self.assertEqual(list(RevenueRollup.objects.values_list('price_et', flat=True)), revenue)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.api.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['X-Archived'], 'true')
+                self.assertEqual(response.json(), before[url])
+                self.assertEqual(self.api.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        response = self.api.get(f'/api/invoices/{self.invoice.pk}/?fields=invoice_number,lines')
+        self.assertEqual(list(response.json()), ['invoice_number', 'lines'])
+        self.assertEqual(len(response.json()['lines']), 2)
+
+    def test_snapshot_is_compressed_jsonl(self):
+        coldstorage.archive(self.tomorrow, kinds=['invoices'])
+        record = ArchivedDocument.objects.get()
+        self.assertEqual(record.number, self.invoice.invoice_number)
+        with gzip.open(settings.COLD_STORAGE_DIR / record.path, 'rt') as snapshot:
+            rows = [json.loads(line) for line in snapshot]
+        self.assertEqual([row['id'] for row in rows], [self.invoice.pk])
+
+    def test_other_tenants_and_unknown_ids_get_404(self):
+        coldstorage.archive(self.tomorrow)
+        other, _ = create_tenant('other@autodf.fr')
+        other_api = APIClient()
+        other_api.force_authenticate(user=other)
+        self.assertEqual(other_api.get(f'/api/invoices/{self.invoice.pk}/').status_code, 404)
+        self.assertEqual(other_api.get(f'/api/async/estimates/{self.estimate.pk}/').status_code, 404)
+        self.assertEqual(self.api.get(f'/api/invoices/{self.invoice.pk + 1000}/').status_code, 404)
+
+    def test_unpaid_invoices_and_their_estimates_stay(self):
+        # échéance passée, mais pas de règlement enregistré
+        Invoices.objects.filter(pk=self.invoice.pk).update(
+            estimates_id=self.estimate, payment_date=timezone.localdate() - timedelta(days=30), paid_at=None,
+        )
+        self.assertEqual(coldstorage.archive(self.tomorrow), [])
+        self.assertTrue(Invoices.objects.exists() and Estimates.objects.exists())
+
+    def test_invoices_paid_after_the_cutoff_stay(self):
+        Invoices.objects.filter(pk=self.invoice.pk).update(paid_at=self.tomorrow)
+        self.assertEqual(coldstorage.archive(self.tomorrow, kinds=['invoices']), [])
+        self.api.patch(f'/api/invoices/{self.invoice.pk}/', {'paid_at': str(timezone.localdate())}, format='json')
+        self.assertEqual(len(coldstorage.archive(self.tomorrow, kinds=['invoices'])), 1)
+
+    @override_settings(VAT_ROUNDING='document')
+    def test_rebuilds_keep_archived_amounts(self):
+        state = rollup_state()
+        coldstorage.archive(self.tomorrow)
+        self.assertEqual(ArchivedRollup.objects.get(payements_method='CB').price_ati, self.invoice.price_ati)
+        reports.rebuild_all()
+        self.assertEqual(rollup_state(), state)
+        # recalcul complet d'une facture du même mois : agrégats du mois reconstruits
+        create_documents(self.user, self.client_record, 1)
+        state = rollup_state()
+        Invoices.objects.get().calculate_totals()
+        self.assertEqual(rollup_state(), state)
+        reports.rebuild_all()
+        self.assertEqual(rollup_state(), state)
+
+    def test_command_uses_default_cutoff(self):
+        Estimates.objects.update(created_at=date(2020, 1, 1))
+        out = StringIO()
+        call_command('archive_documents', dry_run=True, stdout=out)
+        self.assertIn("1 document(s)", out.getvalue())
+        self.assertTrue(Estimates.objects.exists())
+        call_command('archive_documents', stdout=StringIO())
+        self.assertFalse(Estimates.objects.exists())
+        self.assertTrue(Invoices.objects.exists())
+        self.assertEqual(ArchivedDocument.objects.get().year, 2020)
+
+
+@modify_settings(MIDDLEWARE={'prepend': 'app.middleware.InstrumentationMiddleware'})
+@override_settings(THROTTLE_ENABLED=False, METRICS_ENABLED=True, METRICS_SAMPLE_RATE=1.0, METRICS_SERVER_TIMING=True)
+class InstrumentationTests(TestCase):
+    """Mesures par requête (app/middleware.py, app/metrics.py)"""
+
+    def setUp(self):
+        metrics.registry.reset()
+        self.user, self.client_record = create_tenant()
+        self.token = auth.issue_token(self.user)[0]
+
+    def test_middleware_follows_the_chain_mode(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(InstrumentationMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(InstrumentationMiddleware(lambda request: HttpResponse())))
+
+    async def test_async_views_are_profiled_without_leaving_the_event_loop(self):
+        response = await AsyncClient().get('/api/async/clients/', headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 200)
+        # requêtes SQL exécutées dans les threads de sync_to_async, comptées quand même
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    def get(self, url='/api/clients/', **headers):
+        return self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {self.token}', **headers)
+
+    def test_server_timing_and_histograms(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, render;dur=[\d.]+, total;dur=[\d.]+$')
+        exposition = metrics.registry.exposition()
+        labels = 'method="GET",route="clients-list",status="200"'
+        self.assertIn(f'autodf_http_request_duration_seconds_count{{{labels}}} 1', exposition)
+        self.assertIn('autodf_db_queries_count{method="GET",route="clients-list"} 1', exposition)
+
+    @override_settings(METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_only_timed(self):
+        self.assertRegex(self.get()['Server-Timing'], r'^total;dur=[\d.]+$')
+        exposition = metrics.registry.exposition()
+        self.assertIn('autodf_http_request_duration_seconds_count', exposition)
+        self.assertNotIn('autodf_db_queries', exposition)
+
+    def test_exposition_format(self):
+        metrics.registry.observe('autodf_db_queries', {'route': 'x', 'method': 'GET'}, 3, metrics.QUERY_BUCKETS)
+        metrics.registry.observe('autodf_db_queries', {'route': 'x', 'method': 'GET'}, 30, metrics.QUERY_BUCKETS)
+        metrics.registry.increment('autodf_slow_requests_total', {'route': 'x', 'method': 'GET'})
+        lines = metrics.registry.exposition().splitlines()
+        self.assertIn('# TYPE autodf_db_queries histogram', lines)
+        # seaux cumulés
+        self.assertIn('autodf_db_queries_bucket{method="GET",route="x",le="3"} 1', lines)
+        self.assertIn('autodf_db_queries_bucket{method="GET",route="x",le="50"} 2', lines)
+        self.assertIn('autodf_db_queries_bucket{method="GET",route="x",le="+Inf"} 2', lines)
+        self.assertIn('autodf_db_queries_sum{method="GET",route="x"} 33.0', lines)
+        self.assertIn('# TYPE autodf_slow_requests_total counter', lines)
+        self.assertIn('autodf_slow_requests_total{method="GET",route="x"} 1', lines)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics_endpoint_requires_the_token(self):
+        self.get()
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION=f'Bearer {self.token}').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('route="clients-list"', response.content.decode())
+        # /metrics lui-même n'est pas mesuré
+        self.assertNotIn('route="metrics"', response.content.decode())
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_endpoint_is_off_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+
+class StartupTests(SimpleTestCase):
+    """Coût de démarrage mesuré par python -X importtime (interpréteur neuf).
+
+    Les budgets sont larges (machines de CI lentes) : ils détectent un import
+    lourd ou un effet de bord ajouté aux settings, pas une variation de bruit.
+    """
+
+    SETTINGS_BUDGET = 0.3   # secondes, import de config.settings
+    WSGI_BUDGET = 3.0       # secondes, config.wsgi (django.setup compris)
+
+    def test_settings_import_is_silent_and_light(self):
+        times = importtime.measure('import config.settings')
+        self.assertEqual(times.stdout, '')
+        self.assertLess(times.cumulative('config.settings'), self.SETTINGS_BUDGET, times.slowest())
+        for heavy in ('django.db', 'rest_framework', 'app'):
+            self.assertNotIn(heavy, times.modules)
+
+    def test_wsgi_application_import_budget(self):
+        times = importtime.measure('import config.wsgi')
+        self.assertEqual(times.stdout, '')
+        self.assertLess(times.cumulative('config.wsgi'), self.WSGI_BUDGET, times.slowest())
+
+    def test_missing_env_file_is_not_fatal(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertIsNone(env.load_env_file(Path(directory)))
+
+    def test_env_values_are_typed(self):
+        values = {'T_INT': '12', 'T_BOOL': 'false', 'T_LIST': 'a, b,,c', 'T_BAD': 'douze'}
+        with mock.patch.dict(os.environ, values):
+            self.assertEqual(env.env_int('T_INT', 0), 12)
+            self.assertIs(env.env_bool('T_BOOL', True), False)
+            self.assertEqual(env.env_list('T_LIST'), ['a', 'b', 'c'])
+            self.assertEqual(env.env_float('T_MISSING', 0.5), 0.5)
+            with self.assertRaisesMessage(ImproperlyConfigured, 'T_BAD'):
+                env.env_int('T_BAD', 0)
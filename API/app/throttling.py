@@ -0,0 +1,292 @@
+"""Limitation de débit par seaux à jetons (throttle DRF).
+
+Chaque requête consomme un jeton dans deux seaux :
+- le seau de l'utilisateur (portée 'tenant'), toutes routes confondues : un
+  script d'import ne peut pas monopoliser les workers partagés ;
+- le seau de la route pour cet utilisateur, dont la portée fixe le débit :
+  'read' (GET...), 'write', 'expensive' (exports, rendus, lots : déclarée par
+  throttle_scope sur la vue ou l'action), 'login' (par adresse IP).
+Tous les seaux sont vérifiés avant d'en débiter un : une requête refusée ne
+coûte aucun jeton.
+
+Connexion : le compte visé (get_throttle_account de la vue, ici l'email
+normalisé) a aussi un seau, 'login_failures', indépendant de l'adresse (une
+rotation d'IP ne remet pas le compteur à zéro). Il est vérifié à chaque
+essai mais seulement débité par les échecs (charge_failure()) : un tiers ne
+bloque le compte qu'en échouant plus que ce débit, plus large que 'login'.
+
+Adresse IP : dernière entrée de X-Forwarded-For ajoutée par nginx
+(REST_FRAMEWORK['NUM_PROXIES']) ; un client ne peut pas la choisir.
+
+Un débit 'N/période' donne un seau de N jetons rempli à N par période :
+rafales de N requêtes, puis N par période en régime continu. Seau vide :
+429 avec Retry-After (secondes avant le prochain jeton).
+
+Stockage (THROTTLE_BACKEND) :
+- 'database' : table UNLOGGED throttle_buckets, partagée par tous les workers
+  et serveurs ; une lecture de tous les seaux, puis une requête SQL par seau
+  débité (UPDATE sur la clé primaire) ;
+- 'memory' : dictionnaire du processus, sans aller-retour réseau mais par
+  worker (le débit réel est multiplié par le nombre de workers).
+"""
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from app import metrics
+from app.models import ThrottleBucket, Users
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+@lru_cache(maxsize=64)
+def parse_rate(rate):
+    """'N/période' (s, min, h, jour...) -> (capacité, jetons par seconde) ; None si vide"""
+    if not rate:
+        return None
+    try:
+        count, period = rate.split('/')
+        capacity = int(count)
+        seconds = PERIODS[period.strip()[0].lower()]
+    except (ValueError, KeyError, IndexError):
+        raise ImproperlyConfigured(f"Débit de limitation invalide : {rate!r}")
+    if capacity < 1:
+        raise ImproperlyConfigured(f"Débit de limitation invalide : {rate!r}")
+    return capacity, capacity / seconds
+
+
+def configured_rates():
+    """{portée: (capacité, jetons par seconde)} des portées limitées"""
+    rates = {scope: parse_rate(rate) for scope, rate in settings.THROTTLE_RATES.items()}
+    return {scope: rate for scope, rate in rates.items() if rate is not None}
+
+
+class MemoryBucketStore:
+    """Seaux du processus courant ; au-delà de max_entries, les plus anciens sont oubliés (remplis)"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def peek(self, limits, cost=1):
+        """[(clé, capacité, débit)] -> attente (secondes) de chaque seau avant cost jetons, sans les prendre"""
+        now = time.monotonic()
+        waits = []
+        with self._lock:
+            for key, capacity, rate in limits:
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                tokens = min(capacity, tokens + (now - updated) * rate)
+                waits.append(max(0.0, (cost - tokens) / rate))
+        return waits
+
+    def consume(self, key, capacity, rate, cost=1):
+        """Prend cost jetons ; retourne 0 ou l'attente (secondes) si le seau est vide"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def refund(self, key, capacity, cost=1):
+        """Rend cost jetons pris par consume()"""
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated = self._buckets[key]
+                self._buckets[key] = (min(capacity, tokens + cost), updated)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class DatabaseBucketStore:
+    """Seaux dans throttle_buckets, horloge du serveur PostgreSQL.
+
+    Cas courant : un seul UPDATE, qui ne modifie la ligne que s'il reste un
+    jeton ; le verrou de ligne ne dure que l'instruction (hors transaction).
+    Seau vide ou absent : lecture du niveau, ou création du seau.
+    """
+
+    LEVEL = (
+        "LEAST(%(capacity)s, tokens + %(rate)s * GREATEST(0, EXTRACT(EPOCH FROM clock_timestamp() - updated_at)))"
+    )
+    CONSUME = (
+        f"UPDATE throttle_buckets SET tokens = {LEVEL} - %(cost)s, updated_at = clock_timestamp() "
+        f"WHERE key = %(key)s AND {LEVEL} >= %(cost)s"
+    )
+    READ = f"SELECT {LEVEL} FROM throttle_buckets WHERE key = %(key)s"
+    # niveau de plusieurs seaux en une requête (seau absent : plein)
+    PEEK = (
+        "SELECT limits.key, LEAST(limits.capacity, tokens + limits.rate * "
+        "GREATEST(0, EXTRACT(EPOCH FROM clock_timestamp() - updated_at))) "
+        "FROM throttle_buckets JOIN (VALUES {values}) AS limits (key, capacity, rate) USING (key)"
+    )
+    REFUND = "UPDATE throttle_buckets SET tokens = LEAST(%(capacity)s, tokens + %(cost)s) WHERE key = %(key)s"
+    CREATE = (
+        "INSERT INTO throttle_buckets (key, tokens, updated_at) "
+        "VALUES (%(key)s, %(capacity)s - %(cost)s, clock_timestamp()) ON CONFLICT (key) DO NOTHING"
+    )
+    # seaux pleins depuis longtemps : équivalents à une absence de seau
+    PURGE = "DELETE FROM throttle_buckets WHERE updated_at < clock_timestamp() - make_interval(secs => %(age)s)"
+    PURGE_PROBABILITY = 0.001
+
+    def peek(self, limits, cost=1):
+        values = ', '.join(['(%s, %s::float, %s::float)'] * len(limits))
+        with connection.cursor() as cursor:
+            cursor.execute(self.PEEK.format(values=values), [value for limit in limits for value in limit])
+            levels = dict(cursor.fetchall())
+        return [
+            max(0.0, (cost - levels[key]) / rate) if key in levels else 0.0
+            for key, capacity, rate in limits
+        ]
+
+    def consume(self, key, capacity, rate, cost=1):
+        if random.random() < self.PURGE_PROBABILITY:
+            self.purge()
+        params = {'key': key, 'capacity': capacity, 'rate': rate, 'cost': cost}
+        with connection.cursor() as cursor:
+            for _ in range(3):
+                cursor.execute(self.CONSUME, params)
+                if cursor.rowcount:
+                    return 0.0
+                cursor.execute(self.READ, params)
+                row = cursor.fetchone()
+                if row is not None:
+                    if row[0] < cost:
+                        return (cost - row[0]) / rate
+                    # rempli entre les deux requêtes
+                    continue
+                cursor.execute(self.CREATE, params)
+                if cursor.rowcount:
+                    return 0.0
+                # créé par une requête concurrente
+        return 0.0
+
+    def refund(self, key, capacity, cost=1):
+        with connection.cursor() as cursor:
+            cursor.execute(self.REFUND, {'key': key, 'capacity': capacity, 'cost': cost})
+
+    def purge(self):
+        """Supprime les seaux inutilisés depuis plus longtemps que la plus longue période de remplissage"""
+        age = max((capacity / rate for capacity, rate in configured_rates().values()), default=0)
+        with connection.cursor() as cursor:
+            cursor.execute(self.PURGE, {'age': age})
+            return cursor.rowcount
+
+    def clear(self):
+        ThrottleBucket.objects.all().delete()
+
+
+BACKENDS = {
+    'memory': MemoryBucketStore,
+    'database': DatabaseBucketStore,
+}
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(backend=None):
+    backend = backend or settings.THROTTLE_BACKEND
+    with _stores_lock:
+        if backend not in _stores:
+            _stores[backend] = BACKENDS[backend]()
+        return _stores[backend]
+
+
+def endpoint(request, view):
+    match = getattr(request, 'resolver_match', None)
+    if match is not None and match.view_name:
+        return match.view_name
+    return type(view).__name__
+
+
+def _limit(scope, key):
+    """(clé du seau, capacité, débit) ; None si la portée n'est pas limitée"""
+    rate = parse_rate(settings.THROTTLE_RATES.get(scope))
+    return None if rate is None else (f"{scope}:{key}", *rate)
+
+
+def account_limit(request, view):
+    """Seau 'login_failures' du compte visé par la requête ; None sans compte"""
+    account = getattr(view, 'get_throttle_account', lambda request: None)(request)
+    if not account:
+        return None
+    return _limit('login_failures', f"account:{account}:{endpoint(request, view)}")
+
+
+def charge_failure(request, view):
+    """Débite le seau du compte visé après un échec d'authentification"""
+    if not settings.THROTTLE_ENABLED:
+        return
+    limit = account_limit(request, view)
+    if limit is not None:
+        get_store().consume(*limit)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Seau de l'utilisateur puis seau de la route (voir le docstring du module)"""
+
+    def allow_request(self, request, view):
+        self.duration = None
+        if not settings.THROTTLE_ENABLED:
+            return True
+        user = getattr(request, 'user', None)
+        if isinstance(user, Users):
+            ident = f"user:{user.pk}"
+            buckets = [('tenant', ident), (self.get_scope(request, view), f"{ident}:{endpoint(request, view)}")]
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+            buckets = [(self.get_scope(request, view), f"{ident}:{endpoint(request, view)}")]
+        charged = [(scope, limit) for scope, key in buckets if (limit := _limit(scope, key)) is not None]
+        checked = list(charged)
+        if not isinstance(user, Users) and (limit := account_limit(request, view)) is not None:
+            # vérifié seulement : débité par charge_failure()
+            checked.append(('login_failures', limit))
+        if not checked:
+            return True
+        store = get_store()
+        waits = store.peek([limit for scope, limit in checked])
+        wait, scope = max(zip(waits, [scope for scope, limit in checked]))
+        if wait:
+            return self.refuse(scope, wait)
+        for index, (scope, limit) in enumerate(charged):
+            wait = store.consume(*limit)
+            if wait:
+                # vidé par une requête concurrente depuis la vérification
+                for _, (key, capacity, rate) in charged[:index]:
+                    store.refund(key, capacity)
+                return self.refuse(scope, wait)
+        return True
+
+    def refuse(self, scope, wait):
+        metrics.registry.increment('autodf_throttled_requests_total', {'scope': scope})
+        self.duration = wait
+        return False
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        return 'read' if request.method in SAFE_METHODS else 'write'
+
+    def wait(self):
+        return self.duration
@@ -0,0 +1,195 @@
+"""Moteur de calcul des totaux HT / TVA / TTC des devis et factures.
+
+Les montants sont calculés en centimes par app/money.py (règle d'arrondi de
+la TVA : VAT_ROUNDING). Deux modes :
+- recalcul complet : un agrégat SQL sur les lignes du document (somme des TVA
+  arrondies par ligne, ou une ligne de résultat par taux), puis un UPDATE
+  limité aux trois colonnes de prix ;
+- incrémental : on applique au document le delta de la ligne modifiée
+  (UPDATE ... SET price_et = price_et + delta), sans relire les autres lignes.
+  L'état d'avant est relu en base, ligne verrouillée, au moment de l'écriture.
+  Uniquement avec la TVA arrondie par ligne : arrondie par document, la TVA
+  d'une ligne n'a pas de contribution propre et on recalcule tout.
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce, Round
+from django.dispatch import Signal
+
+from app import money, partitioning
+
+
+ZERO = Decimal('0.00')
+HUNDRED = Decimal('100')
+
+# Envoyé après chaque écriture de totaux (sender = modèle du document).
+# delta_et / delta_vat valent None après un recalcul complet.
+totals_changed = Signal()
+
+Totals = namedtuple('Totals', ['price_et', 'price_vat', 'price_ati'])
+LineSnapshot = namedtuple('LineSnapshot', ['document_id', 'amount_et', 'vat'])
+
+
+def document_lines(document):
+    """Manager des lignes rattachées au document"""
+    return getattr(document, document.LINES_RELATED_NAME)
+
+
+def line_vat_expression(vat_field):
+    """TVA d'une ligne en SQL, arrondie au centime (ROUND : demi-centime vers l'extérieur)"""
+    return Round(
+        Coalesce(F('amount_et'), Value(ZERO)) * Coalesce(F(vat_field), Value(ZERO)) / Value(HUNDRED),
+        2,
+        output_field=DecimalField(max_digits=20, decimal_places=2),
+    )
+
+
+def aggregate_totals(document):
+    """Calcule HT / TVA / TTC du document en une requête d'agrégat sur ses lignes"""
+    lines = document_lines(document)
+    vat_field = lines.model.VAT_FIELD
+    if money.rounding_rule() == money.LINE:
+        result = lines.aggregate(
+            et=Coalesce(Sum('amount_et'), Value(ZERO)),
+            vat=Coalesce(Sum(line_vat_expression(vat_field)), Value(ZERO)),
+        )
+        et, vat = money.to_cents(result['et']), money.to_cents(result['vat'])
+        return Totals(*map(money.from_cents, (et, vat, et + vat)))
+    # une ligne par taux : seul l'arrondi de ces sommes se fait en Python
+    rows = lines.order_by().values(vat_field).annotate(et=Coalesce(Sum('amount_et'), Value(ZERO)))
+    amounts = [money.to_cents(row['et']) for row in rows]
+    rates = [money.to_rate(row[vat_field]) for row in rows]
+    result = money.document_totals(amounts, rates, money.DOCUMENT)
+    return Totals(*map(money.from_cents, result))
+
+
+def version_bump(document_model):
+    """SET version = version + 1 pour les documents versionnés (app/versioning.py)"""
+    name = getattr(document_model, 'VERSION_FIELD', None)
+    return {name: F(name) + 1} if name else {}
+
+
+def recompute_totals(document):
+    """Recalcul complet : un agrégat + un UPDATE des trois colonnes de prix"""
+    totals = aggregate_totals(document)
+    type(document)._default_manager.filter(**partitioning.instance_filter(document)).update(
+        **totals._asdict(), **version_bump(type(document)),
+    )
+    document.price_et, document.price_vat, document.price_ati = totals
+    name = getattr(document, 'VERSION_FIELD', None)
+    if name and name not in document.get_deferred_fields():
+        setattr(document, name, getattr(document, name) + 1)
+    totals_changed.send(type(document), document_id=document.pk, delta_et=None, delta_vat=None)
+    return totals
+
+
+def apply_delta(document_model, document_id, delta_et, delta_vat):
+    """Mode incrémental : ajoute le delta d'une ligne aux totaux du document.
+
+    La version du document est incrémentée dans le même UPDATE, y compris
+    sans delta (ligne modifiée sans effet sur les montants).
+    """
+    if document_id is None:
+        return
+    documents = document_model._default_manager.filter(pk=document_id)
+    if not delta_et and not delta_vat:
+        documents.update(**version_bump(document_model))
+        return
+    documents.update(
+        price_et=Coalesce(F('price_et'), Value(ZERO)) + Value(delta_et),
+        price_vat=Coalesce(F('price_vat'), Value(ZERO)) + Value(delta_vat),
+        price_ati=Coalesce(F('price_ati'), Value(ZERO)) + Value(delta_et + delta_vat),
+        **version_bump(document_model),
+    )
+    totals_changed.send(document_model, document_id=document_id, delta_et=delta_et, delta_vat=delta_vat)
+
+
+def _document_field(line):
+    return line._meta.get_field(line.DOCUMENT_FIELD)
+
+
+def _contribution(document_id, amount_et, rate):
+    amount = money.to_cents(amount_et)
+    return LineSnapshot(
+        document_id,
+        money.from_cents(amount),
+        money.from_cents(money.line_vat(amount, money.to_rate(rate))),
+    )
+
+
+def line_snapshot(line):
+    """Contribution d'une ligne (valeurs de l'instance) aux totaux de son document.
+
+    Retourne None si un des champs nécessaires est différé (.only/.defer) :
+    on ne peut alors pas calculer de delta fiable.
+    """
+    field = _document_field(line)
+    deferred = line.get_deferred_fields()
+    if {field.attname, 'amount_et', line.VAT_FIELD} & deferred:
+        return None
+    return _contribution(getattr(line, field.attname), line.amount_et, getattr(line, line.VAT_FIELD))
+
+
+def stored_snapshot(line):
+    """Contribution de la ligne telle qu'enregistrée, None si elle n'existe pas.
+
+    La ligne est verrouillée (FOR UPDATE) jusqu'à la fin de la transaction :
+    une écriture concurrente attend, le delta part de l'état réel de la ligne
+    et non de celui, peut-être périmé, chargé dans l'instance.
+    """
+    if line.pk is None:
+        return None
+    field = _document_field(line)
+    row = (
+        type(line)._default_manager.select_for_update()
+        .filter(pk=line.pk)
+        .values_list(field.attname, 'amount_et', line.VAT_FIELD)
+        .first()
+    )
+    return _contribution(*row) if row is not None else None
+
+
+def apply_line_change(line, before, update_fields=None):
+    """Répercute l'écriture d'une ligne sur les totaux de son document.
+
+    before : stored_snapshot() lu avant l'écriture, dans la même transaction.
+    """
+    field = _document_field(line)
+    document_model = field.related_model
+    # écriture partielle : les autres champs de l'instance peuvent être périmés
+    after = line_snapshot(line) if update_fields is None else stored_snapshot(line)
+
+    if after is None or money.rounding_rule() != money.LINE:
+        # État de la ligne inconnu (champs différés) ou TVA arrondie par
+        # document : recalcul complet du ou des documents
+        document_ids = {getattr(line, field.attname)}
+        if before is not None:
+            document_ids.add(before.document_id)
+        for document in document_model._default_manager.filter(pk__in=document_ids):
+            recompute_totals(document)
+    elif before is None:
+        apply_delta(document_model, after.document_id, after.amount_et, after.vat)
+    elif before.document_id != after.document_id:
+        apply_delta(document_model, before.document_id, -before.amount_et, -before.vat)
+        apply_delta(document_model, after.document_id, after.amount_et, after.vat)
+    else:
+        apply_delta(
+            document_model,
+            after.document_id,
+            after.amount_et - before.amount_et,
+            after.vat - before.vat,
+        )
+
+
+def apply_line_removal(line, snapshot):
+    """Retire la contribution d'une ligne supprimée (stored_snapshot() lu avant la suppression)"""
+    if snapshot is None:
+        return
+    document_model = _document_field(line).related_model
+    if money.rounding_rule() != money.LINE:
+        for document in document_model._default_manager.filter(pk=snapshot.document_id):
+            recompute_totals(document)
+        return
+    apply_delta(document_model, snapshot.document_id, -snapshot.amount_et, -snapshot.vat)
@@ -1,7 +1,8 @@
 from django.urls import path,include
 from rest_framework.routers import DefaultRouter
 from rest_framework import routers
-from app.views import UsersViewSet, ClientsViewSet, EstimatesViewSet, EstimateLinesViewSet, InvoicesViewSet, InvoiceLinesViewSet
+from app.views import ClientsAsyncView, EstimatesAsyncView, InvoicesAsyncView, LoginView, LogoutView
+from app.views import UsersViewSet, ClientsViewSet, EstimatesViewSet, EstimateLinesViewSet, InvoicesViewSet, InvoiceLinesViewSet, RevenueReportViewSet, ClientReportViewSet, CacheStatsViewSet, JobsViewSet
 
 router = routers.DefaultRouter()
 router.register(r'users', UsersViewSet)
@@ -10,6 +11,25 @@ router.register(r'estimates', EstimatesViewSet)
 router.register(r'estimate_lines', EstimateLinesViewSet)
 router.register(r'invoices', InvoicesViewSet)
 router.register(r'invoice_lines', InvoiceLinesViewSet)
+router.register(r'reports/revenue', RevenueReportViewSet)
+router.register(r'reports/clients', ClientReportViewSet)
+router.register(r'cache/stats', CacheStatsViewSet, basename='cache-stats')
+router.register(r'jobs', JobsViewSet)
 
 
-urlpatterns = router.urls
\ No newline at end of file
+# Lectures async (ORM async), à servir sous ASGI : voir gunicorn.conf.py
+async_urlpatterns = [
+    path('async/clients/', ClientsAsyncView.as_view(), name='clients-async-list'),
+    path('async/clients/<int:pk>/', ClientsAsyncView.as_view(), name='clients-async-detail'),
+    path('async/estimates/', EstimatesAsyncView.as_view(), name='estimates-async-list'),
+    path('async/estimates/<int:pk>/', EstimatesAsyncView.as_view(), name='estimates-async-detail'),
+    path('async/invoices/', InvoicesAsyncView.as_view(), name='invoices-async-list'),
+    path('async/invoices/<int:pk>/', InvoicesAsyncView.as_view(), name='invoices-async-detail'),
+]
+
+auth_urlpatterns = [
+    path('auth/login/', LoginView.as_view(), name='auth-login'),
+    path('auth/logout/', LogoutView.as_view(), name='auth-logout'),
+]
+
+urlpatterns = router.urls + async_urlpatterns + auth_urlpatterns
\ No newline at end of file
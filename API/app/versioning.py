@@ -0,0 +1,38 @@
+"""Version de ligne monotone et verrou optimiste (Clients, Estimates, Invoices).
+
+Chaque UPDATE d'un modèle versionné fait SET version = version + 1 ... WHERE
+id = %s AND version = <version lue>. Si une autre écriture est passée entre la
+lecture et la sauvegarde, aucune ligne n'est modifiée et VersionConflict est
+levée au lieu d'écraser silencieusement l'autre modification.
+"""
+from django.db import DatabaseError
+from django.db.models import F
+
+
+class VersionConflict(DatabaseError):
+    """La ligne a été modifiée depuis sa lecture"""
+
+
+class VersionedMixin:
+    """À combiner avec models.Model ; le modèle déclare un champ `version`"""
+
+    VERSION_FIELD = 'version'
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        name = self.VERSION_FIELD
+        field = self._meta.get_field(name)
+        values = [value for value in values if value[0] is not field]
+        values.append((field, None, F(name) + 1))
+        expected = None if name in self.get_deferred_fields() else getattr(self, name)
+        filtered = base_qs.filter(pk=pk_val)
+        if expected is not None:
+            filtered = filtered.filter(**{name: expected})
+        if filtered._update(values) > 0:
+            if expected is not None:
+                setattr(self, name, expected + 1)
+            return True
+        if expected is not None and base_qs.filter(pk=pk_val).exists():
+            raise VersionConflict(
+                f"{self._meta.verbose_name} #{pk_val} modifié entre-temps (version {expected} périmée)"
+            )
+        return False
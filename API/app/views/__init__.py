@@ -5,6 +5,11 @@ from .estimate_lines import EstimateLinesViewSet
 from .invoice_lines import InvoiceLinesViewSet
 from .clients import ClientsViewSet
 from .users import UsersViewSet
+from .reports import RevenueReportViewSet, ClientReportViewSet
+from .cache_stats import CacheStatsViewSet
+from .jobs import JobsViewSet
+from .auth import LoginView, LogoutView
+from .async_reads import ClientsAsyncView, EstimatesAsyncView, InvoicesAsyncView
 
 __all__ = [
     "UsersViewSet",
@@ -13,4 +18,13 @@ __all__ = [
     "EstimateLinesViewSet",
     "InvoicesViewSet",
     "InvoiceLinesViewSet",
+    "RevenueReportViewSet",
+    "ClientReportViewSet",
+    "CacheStatsViewSet",
+    "JobsViewSet",
+    "LoginView",
+    "LogoutView",
+    "ClientsAsyncView",
+    "EstimatesAsyncView",
+    "InvoicesAsyncView",
 ]
\ No newline at end of file
@@ -0,0 +1,180 @@
+"""Lectures asynchrones (list / retrieve) des clients, devis et factures.
+
+Servies sous /api/async/... Sous ASGI (workers uvicorn, voir gunicorn.conf.py),
+une requête qui attend PostgreSQL ne bloque pas le worker : les autres
+requêtes avancent pendant ce temps. Les lectures passent par l'ORM async
+(aiterator / aget) et la sérialisation travaille sur des objets déjà chargés
+(client joint, lignes préchargées), sans requête.
+
+Mêmes représentations, pagination keyset et ETag que les viewsets ; ?fields=
+et le cache de détail restent propres aux vues synchrones.
+"""
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound, Throttled
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from app import coldstorage, etags, metrics
+from app.models import Clients, Estimates, Invoices, Users
+from app.pagination import KeysetPagination
+from app.serializers import (
+    ClientsSerializer, EstimatesSerializer, EstimateDetailSerializer, InvoicesSerializer, InvoiceDetailSerializer,
+)
+
+
+class AsyncReadView(View):
+    """GET liste (sans pk) ou détail (avec pk), restreint à l'utilisateur authentifié"""
+
+    http_method_names = ['get', 'head', 'options']
+    queryset = None
+    serializer_class = None
+    detail_serializer_class = None  # représentation imbriquée (client + lignes)
+    client_field = 'clients_id'
+    expand_query_param = 'expand'
+    pagination_class = KeysetPagination
+    renderer_class = JSONRenderer
+
+    async def get(self, request, pk=None):
+        self.request = Request(
+            request,
+            authenticators=[authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+        )
+        try:
+            # authentification DRF et limitation de débit : synchrones, hors boucle d'événements
+            tenant = await sync_to_async(self.initial)()
+            queryset = self.queryset.for_tenant(tenant)
+            if pk is None:
+                return await self.list(queryset)
+            return await self.retrieve(queryset, pk)
+        except APIException as exc:
+            return self.handle_exception(exc)
+
+    def get_tenant(self):
+        user = self.request.user
+        if not isinstance(user, Users):
+            raise NotAuthenticated()
+        return user
+
+    def initial(self):
+        """Utilisateur authentifié, après les mêmes limites de débit que les vues DRF"""
+        tenant = self.get_tenant()
+        waits = []
+        for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+            throttle = throttle_class()
+            if not throttle.allow_request(self.request, self):
+                waits.append(throttle.wait())
+        if waits:
+            raise Throttled(max((wait for wait in waits if wait is not None), default=None))
+        return tenant
+
+    def is_nested(self, detail):
+        if self.detail_serializer_class is None:
+            return False
+        expand = self.request.query_params.get(self.expand_query_param, '')
+        return detail or expand.lower() in ('1', 'true', 'lines')
+
+    def nested(self, queryset):
+        lines = queryset.model.LINES_RELATED_NAME
+        line_model = queryset.model._meta.get_field(lines).related_model
+        return queryset.select_related(self.client_field).prefetch_related(
+            Prefetch(lines, queryset=line_model.objects.order_by('id'))
+        )
+
+    def get_etag(self, objects, *extra):
+        return etags.compute_etag(
+            objects, self.request.user.pk, self.request.get_full_path(), 'json', *extra,
+        )
+
+    def get_object_etag(self, instance):
+        return etags.object_etag(instance, self.request.user.pk, self.request.get_full_path(), 'json')
+
+    async def list(self, queryset):
+        nested = self.is_nested(detail=False)
+        if nested:
+            queryset = self.nested(queryset)
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(queryset, self.request, view=self)
+        etag = self.get_etag(page, paginator.has_next)
+        if etags.matches(self.request, etag):
+            return self.not_modified(etag)
+        serializer_class = self.detail_serializer_class if nested else self.serializer_class
+        data = serializer_class(page, many=True).data
+        return self.render(paginator.get_paginated_response(data).data, etag)
+
+    async def retrieve(self, queryset, pk):
+        if self.detail_serializer_class is not None:
+            queryset = self.nested(queryset)
+        try:
+            instance = await queryset.aget(pk=pk)
+        except queryset.model.DoesNotExist:
+            return await self.retrieve_archived(queryset.model, pk)
+        etag = self.get_object_etag(instance)
+        if etags.matches(self.request, etag):
+            return self.not_modified(etag)
+        serializer_class = self.detail_serializer_class or self.serializer_class
+        return self.render(serializer_class(instance).data, etag)
+
+    async def retrieve_archived(self, model, pk):
+        """Document archivé (app/coldstorage.py) : index et lecture de l'instantané hors boucle"""
+        archived = await sync_to_async(coldstorage.retrieve)(model, self.request.user, pk)
+        if archived is None:
+            raise NotFound()
+        record, data = archived
+        etag = self.get_object_etag(record)
+        if etags.matches(self.request, etag):
+            return self.not_modified(etag)
+        response = self.render(data, etag)
+        response['X-Archived'] = 'true'
+        return response
+
+    def render(self, data, etag=None, status_code=status.HTTP_200_OK):
+        with metrics.phase('render'):
+            content = self.renderer_class().render(data)
+        response = HttpResponse(content, content_type=self.renderer_class.media_type, status=status_code)
+        return self.with_etag(response, etag) if etag else response
+
+    def not_modified(self, etag):
+        return self.with_etag(HttpResponse(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+    def with_etag(self, response, etag):
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def handle_exception(self, exc):
+        """Même convention que DRF : 401 si un schéma d'authentification est annoncé, sinon 403"""
+        # erreurs de validation (dict / liste) telles quelles, comme le gestionnaire DRF
+        data = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+        response = self.render(data, status_code=exc.status_code)
+        if isinstance(exc, NotAuthenticated):
+            authenticators = self.request.authenticators
+            header = authenticators[0].authenticate_header(self.request) if authenticators else None
+            if header:
+                response['WWW-Authenticate'] = header
+            else:
+                response.status_code = status.HTTP_403_FORBIDDEN
+        if getattr(exc, 'wait', None):
+            response['Retry-After'] = '%d' % exc.wait
+        return response
+
+
+class ClientsAsyncView(AsyncReadView):
+    queryset = Clients.objects.all()
+    serializer_class = ClientsSerializer
+
+
+class EstimatesAsyncView(AsyncReadView):
+    queryset = Estimates.objects.all()
+    serializer_class = EstimatesSerializer
+    detail_serializer_class = EstimateDetailSerializer
+
+
+class InvoicesAsyncView(AsyncReadView):
+    queryset = Invoices.objects.all()
+    serializer_class = InvoicesSerializer
+    detail_serializer_class = InvoiceDetailSerializer
\ No newline at end of file
@@ -0,0 +1,50 @@
+from rest_framework import status
+from rest_framework.exceptions import NotAuthenticated, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from app import auth, throttling
+from app.models import AuthToken
+from app.passwords import HashPoolBusy
+from app.serializers import LoginSerializer, UsersSerializer
+
+class LoginView(APIView):
+    """POST {"email", "password"} -> jeton d'API à passer en Authorization: Bearer <jeton>"""
+    authentication_classes = []
+    permission_classes = []
+    throttle_scope = 'login'
+
+    def get_throttle_account(self, request):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        return email.strip().lower() if isinstance(email, str) else None
+
+    def post(self, request):
+        params = LoginSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        try:
+            result = auth.login(
+                params.validated_data['email'],
+                params.validated_data['password'],
+                name=request.headers.get('User-Agent', ''),
+            )
+        except HashPoolBusy:
+            # pool de hachage saturé : le client réessaie plutôt que d'occuper le worker
+            return Response(
+                {'detail': "Service de connexion surchargé, réessayez."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '1'},
+            )
+        if result is None:
+            throttling.charge_failure(request, self)
+            raise ValidationError({'non_field_errors': ["Email ou mot de passe incorrect."]})
+        user, token, record = result
+        return Response({'token': token, 'expires_at': record.expires_at, 'user': UsersSerializer(user).data})
+
+
+class LogoutView(APIView):
+    """POST : révoque le jeton de la requête"""
+
+    def post(self, request):
+        if not isinstance(request.auth, AuthToken):
+            raise NotAuthenticated()
+        auth.logout(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
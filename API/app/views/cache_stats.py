@@ -0,0 +1,11 @@
+from rest_framework import viewsets
+from rest_framework.response import Response
+from app import cache
+from app.views.mixins import TenantScopedMixin
+
+class CacheStatsViewSet(TenantScopedMixin, viewsets.ViewSet):
+    """Compteurs hit / miss du cache de lecture (processus courant)"""
+
+    def list(self, request):
+        self.get_tenant()
+        return Response(cache.stats())
\ No newline at end of file
@@ -1,7 +1,24 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from app.models import Clients
-from app.serializers import ClientsSerializer
+from app.pagination import RankedPagination
+from app.search import SearchError, search_clients, similarity_threshold
+from app.serializers import ClientsSerializer, ClientSearchSerializer
+from app.views.mixins import TenantScopedMixin, CachedRetrieveMixin, FieldsProjectionMixin
 
-class ClientsViewSet(viewsets.ModelViewSet):
+class ClientsViewSet(TenantScopedMixin, CachedRetrieveMixin, FieldsProjectionMixin, viewsets.ModelViewSet):
     queryset = Clients.objects.all()
-    serializer_class = ClientsSerializer
\ No newline at end of file
+    serializer_class = ClientsSerializer
+
+    @action(detail=False, methods=['get'], pagination_class=RankedPagination, serializer_class=ClientSearchSerializer)
+    def search(self, request):
+        """Recherche classée par pertinence : ?q=dupon (préfixes, tolérance aux fautes)"""
+        fields = [name for name in ClientSearchSerializer.Meta.fields if name != 'rank']
+        try:
+            queryset = search_clients(self.get_queryset().only(*fields), request.query_params.get('q'))
+        except SearchError as exc:
+            raise ValidationError({'q': [str(exc)]})
+        with similarity_threshold():
+            page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
\ No newline at end of file
@@ -1,7 +1,10 @@
 from rest_framework import viewsets
-from app.models import EstimateLines
+from app.models import EstimateLines, Estimates
 from app.serializers import EstimateLinesSerializer
+from app.views.mixins import TenantScopedMixin, BulkLinesMixin, FieldsProjectionMixin, ConditionalRequestMixin
 
-class EstimateLinesViewSet(viewsets.ModelViewSet):
+class EstimateLinesViewSet(TenantScopedMixin, ConditionalRequestMixin, FieldsProjectionMixin, BulkLinesMixin, viewsets.ModelViewSet):
     queryset = EstimateLines.objects.all()
-    serializer_class = EstimateLinesSerializer
\ No newline at end of file
+    serializer_class = EstimateLinesSerializer
+    document_queryset = Estimates.objects.all()
+    keyset_ordering = ('id',)
\ No newline at end of file
@@ -1,7 +1,42 @@
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from app.conversion import ConversionError, convert_estimates
 from app.models import Estimates
-from app.serializers import EstimatesSerializer
+from app.serializers import EstimatesSerializer, EstimateDetailSerializer, EstimateConversionSerializer, InvoicesSerializer
+from app.views.mixins import TenantScopedMixin, ArchivedRetrieveMixin, CachedRetrieveMixin, FieldsProjectionMixin, NestedDocumentMixin, PdfRenderMixin, DocumentJobsMixin
 
-class EstimatesViewSet(viewsets.ModelViewSet):
+class EstimatesViewSet(TenantScopedMixin, ArchivedRetrieveMixin, CachedRetrieveMixin, FieldsProjectionMixin, NestedDocumentMixin, PdfRenderMixin, DocumentJobsMixin, viewsets.ModelViewSet):
     queryset = Estimates.objects.all()
-    serializer_class = EstimatesSerializer
\ No newline at end of file
+    serializer_class = EstimatesSerializer
+    detail_serializer_class = EstimateDetailSerializer
+    render_kind = 'estimates'
+
+    def _convert(self, ids, options):
+        try:
+            return convert_estimates(self.get_queryset(), ids, options)
+        except ConversionError as exc:
+            raise ValidationError({'ids': [str(exc)]})
+
+    @action(detail=True, methods=['post'], throttle_scope='expensive')
+    def convert(self, request, pk=None):
+        """Transforme le devis en facture (lignes copiées, totaux repris)"""
+        params = EstimateConversionSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        estimate = self.get_object()
+        invoices, errors = self._convert([estimate.pk], params.validated_data)
+        if errors:
+            return Response({'non_field_errors': errors[0]['errors']}, status=status.HTTP_409_CONFLICT)
+        return Response(InvoicesSerializer(invoices[0]).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='convert', url_name='convert-batch', throttle_scope='expensive')
+    def convert_batch(self, request):
+        """Transforme un lot de devis : {"ids": [...], "payements_method": ..., "payment_date": ...}"""
+        params = EstimateConversionSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        if 'ids' not in params.validated_data:
+            raise ValidationError({'ids': ["Ce champ est obligatoire."]})
+        invoices, errors = self._convert(params.validated_data['ids'], params.validated_data)
+        status_code = status.HTTP_207_MULTI_STATUS if errors else status.HTTP_201_CREATED
+        return Response({'created': InvoicesSerializer(invoices, many=True).data, 'errors': errors}, status=status_code)
\ No newline at end of file
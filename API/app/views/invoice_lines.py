@@ -1,7 +1,10 @@
 from rest_framework import viewsets
-from app.models import InvoiceLines
+from app.models import InvoiceLines, Invoices
 from app.serializers import InvoiceLinesSerializer
+from app.views.mixins import TenantScopedMixin, BulkLinesMixin, FieldsProjectionMixin, ConditionalRequestMixin
 
-class InvoiceLinesViewSet(viewsets.ModelViewSet):
+class InvoiceLinesViewSet(TenantScopedMixin, ConditionalRequestMixin, FieldsProjectionMixin, BulkLinesMixin, viewsets.ModelViewSet):
     queryset = InvoiceLines.objects.all()
-    serializer_class = InvoiceLinesSerializer
\ No newline at end of file
+    serializer_class = InvoiceLinesSerializer
+    document_queryset = Invoices.objects.all()
+    keyset_ordering = ('id',)
\ No newline at end of file
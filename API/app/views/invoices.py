@@ -1,7 +1,32 @@
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from app.exports import ExportError, FORMATS, export_rows, stream
 from app.models import Invoices
-from app.serializers import InvoicesSerializer
+from app.serializers import InvoicesSerializer, InvoiceDetailSerializer
+from app.views.mixins import TenantScopedMixin, ArchivedRetrieveMixin, CachedRetrieveMixin, FieldsProjectionMixin, NestedDocumentMixin, PdfRenderMixin, DocumentJobsMixin
 
-class InvoicesViewSet(viewsets.ModelViewSet):
+class InvoicesViewSet(TenantScopedMixin, ArchivedRetrieveMixin, CachedRetrieveMixin, FieldsProjectionMixin, NestedDocumentMixin, PdfRenderMixin, DocumentJobsMixin, viewsets.ModelViewSet):
     queryset = Invoices.objects.all()
-    serializer_class = InvoicesSerializer
\ No newline at end of file
+    serializer_class = InvoicesSerializer
+    detail_serializer_class = InvoiceDetailSerializer
+    render_kind = 'invoices'
+
+    @action(detail=False, methods=['get'], throttle_scope='expensive')
+    def export(self, request):
+        """Export comptable en flux : ?output=csv|jsonl&dataset=invoices|lines&year=AAAA"""
+        output = request.query_params.get('output', 'csv')
+        dataset = request.query_params.get('dataset', 'invoices')
+        year = request.query_params.get('year')
+        if output not in FORMATS:
+            raise ValidationError({'output': [f"Formats disponibles : {', '.join(FORMATS)}"]})
+        try:
+            year = int(year) if year else None
+            columns, rows = export_rows(dataset, user=self.get_tenant(), year=year)
+        except ValueError as exc:
+            message = str(exc) if isinstance(exc, ExportError) else "Année invalide."
+            raise ValidationError({'non_field_errors': [message]})
+        response = StreamingHttpResponse(stream(output, columns, rows), content_type=FORMATS[output])
+        response['Content-Disposition'] = f'attachment; filename="{dataset}-{year or "all"}.{output}"'
+        return response
\ No newline at end of file
@@ -0,0 +1,10 @@
+from rest_framework import viewsets
+from app.models import Job
+from app.serializers import JobSerializer
+from app.views.mixins import TenantScopedMixin
+
+class JobsViewSet(TenantScopedMixin, viewsets.ReadOnlyModelViewSet):
+    """Suivi des tâches d'arrière-plan de l'utilisateur (envois, rendus en lot)"""
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    keyset_ordering = ('-created_at', '-id')
\ No newline at end of file
@@ -0,0 +1,20 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.authentication import get_authorization_header
+from app.metrics import registry
+
+
+@require_GET
+def metrics(request):
+    """Compteurs du processus courant, format d'exposition Prometheus ; réservé au collecteur (METRICS_TOKEN)"""
+    if not settings.METRICS_TOKEN:
+        raise Http404
+    expected = f'Bearer {settings.METRICS_TOKEN}'.encode()
+    if not hmac.compare_digest(get_authorization_header(request), expected):
+        response = HttpResponse(status=401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return HttpResponse(registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
\ No newline at end of file
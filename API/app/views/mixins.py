@@ -0,0 +1,360 @@
+from django.db.models import Prefetch
+from django.http import FileResponse, Http404
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotAuthenticated, ValidationError
+from rest_framework.relations import RelatedField
+from rest_framework.response import Response
+
+from app import cache, coldstorage, etags, jobs, partitioning
+from app.bulk import BulkPayloadError, bulk_apply_lines
+from app.models import Job, Users
+from app.rendering import open_one
+from app.serializers import JobSerializer, RenderBatchSerializer, SendDocumentSerializer
+from app.versioning import VersionConflict
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "La ressource a été modifiée depuis votre lecture (If-Match)."
+    default_code = 'precondition_failed'
+
+
+class EditConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "La ressource a été modifiée par une autre requête, rechargez-la."
+    default_code = 'conflict'
+
+
+class TenantScopedMixin:
+    """Restreint toutes les lectures / écritures à l'utilisateur authentifié.
+
+    - le queryset est filtré par Model.TENANT_FIELD ;
+    - les relations en écriture (client, devis...) ne proposent que les objets
+      du même utilisateur ;
+    - users_id est imposé à la création.
+    """
+
+    def get_tenant(self):
+        user = getattr(self.request, 'user', None)
+        if not isinstance(user, Users):
+            raise NotAuthenticated()
+        return user
+
+    def get_queryset(self):
+        return super().get_queryset().for_tenant(self.get_tenant())
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        tenant = self.get_tenant()
+        for field in getattr(serializer, 'child', serializer).fields.values():
+            queryset = getattr(field, 'queryset', None)
+            if isinstance(field, RelatedField) and hasattr(queryset, 'for_tenant'):
+                field.queryset = queryset.for_tenant(tenant)
+        return serializer
+
+    def perform_create(self, serializer):
+        if self.get_queryset().model.TENANT_FIELD == 'users_id':
+            serializer.save(users_id=self.get_tenant())
+        else:
+            serializer.save()
+
+
+class NestedDocumentMixin:
+    """Représentation imbriquée (client + lignes) d'un devis / d'une facture.
+
+    Servie par retrieve et par list avec ?expand=lines. Le client est joint
+    (select_related) et les lignes chargées en une requête (prefetch_related) :
+    le nombre de requêtes ne dépend pas de la taille de la page.
+    """
+
+    detail_serializer_class = None
+    expand_query_param = 'expand'
+    client_field = 'clients_id'
+
+    def is_nested(self):
+        if self.action == 'retrieve':
+            return True
+        expand = self.request.query_params.get(self.expand_query_param, '') if self.request else ''
+        return self.action == 'list' and expand.lower() in ('1', 'true', 'lines')
+
+    def get_serializer_class(self):
+        if self.is_nested():
+            return self.detail_serializer_class
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('update', 'partial_update', 'destroy'):
+            # même empreinte (ETag) qu'en lecture détaillée, pour If-Match
+            return queryset.select_related(self.client_field)
+        if not self.is_nested():
+            return queryset
+        requested = getattr(self, 'get_requested_fields', lambda: None)()
+        if requested is None or 'client' in requested:
+            queryset = queryset.select_related(self.client_field)
+        if requested is None or 'lines' in requested:
+            lines = queryset.model.LINES_RELATED_NAME
+            line_model = queryset.model._meta.get_field(lines).related_model
+            queryset = queryset.prefetch_related(
+                Prefetch(lines, queryset=line_model.objects.order_by('id'))
+            )
+        return queryset
+
+
+class FieldsProjectionMixin:
+    """?fields=a,b,c : ne lit (.only) et ne sérialise que les champs demandés"""
+
+    fields_query_param = 'fields'
+
+    def get_requested_fields(self):
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = None
+            raw = self.request.query_params.get(self.fields_query_param) if self.request else None
+            if raw and self.action in ('list', 'retrieve'):
+                readable = {
+                    name for name, field in self.get_serializer_class()().fields.items()
+                    if not field.write_only
+                }
+                requested = [name.strip() for name in raw.split(',')]
+                unknown = [name for name in requested if name not in readable]
+                if unknown:
+                    raise ValidationError({self.fields_query_param: [f"Champs inconnus : {', '.join(unknown)}"]})
+                self._requested_fields = requested
+        return self._requested_fields
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        requested = self.get_requested_fields()
+        if requested is None:
+            return queryset
+        model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+        ordering = getattr(self.paginator, 'get_ordering', lambda view: ())(self)
+        columns = {name for name in requested if name in model_fields}
+        columns.update(name.lstrip('-') for name in ordering)
+        etag_fields = getattr(queryset.model, 'ETAG_FIELDS', None)
+        if etag_fields is None and self.action == 'retrieve':
+            # l'état de l'ETag (If-Match) couvre alors toute la ligne
+            return queryset
+        columns.update(etag_fields or ())
+        # clé de partition : le prefetch des lignes ne lit que les partitions de la page
+        columns.update(filter(None, [partitioning.partition_key(queryset.model)]))
+        if queryset.query.select_related:
+            # une relation jointe ne peut pas être différée
+            columns.update(queryset.query.select_related)
+        return queryset.only('pk', *columns)
+
+    def get_serializer(self, *args, **kwargs):
+        requested = self.get_requested_fields()
+        if requested is not None:
+            kwargs.setdefault('fields', requested)
+        return super().get_serializer(*args, **kwargs)
+
+
+class BulkLinesMixin:
+    """Ajoute POST <lignes>/bulk/ : créations, mises à jour et suppressions en un lot"""
+
+    document_queryset = None
+    throttle_scope = None  # limitation de débit (app/throttling.py), 'expensive' pour bulk
+
+    def get_document_queryset(self):
+        return self.document_queryset.for_tenant(self.get_tenant())
+
+    @action(detail=False, methods=['post'], url_path='bulk', throttle_scope='expensive')
+    def bulk(self, request):
+        try:
+            result = bulk_apply_lines(
+                self.get_serializer_class(),
+                request.data,
+                queryset=self.get_queryset(),
+                document_queryset=self.get_document_queryset(),
+            )
+        except BulkPayloadError as exc:
+            raise ValidationError({'non_field_errors': [str(exc)]})
+        status_code = status.HTTP_207_MULTI_STATUS if result['errors'] else status.HTTP_200_OK
+        return Response(result, status=status_code)
+
+
+class PdfRenderMixin:
+    """Ajoute GET <documents>/{id}/pdf/ : rendu servi depuis le cache disque"""
+
+    render_kind = None
+    throttle_scope = None  # limitation de débit (app/throttling.py), 'expensive' pour pdf
+
+    @action(detail=True, methods=['get'], throttle_scope='expensive')
+    def pdf(self, request, pk=None):
+        document = self.get_object()
+        return FileResponse(
+            open_one(self.render_kind, document),
+            content_type='application/pdf',
+            filename=f"{self.render_kind}-{document.pk}.pdf",
+        )
+
+
+class DocumentJobsMixin:
+    """Tâches d'arrière-plan sur les documents (app/jobs.py), réponse 202 + tâche.
+
+    - POST <documents>/{id}/send/ : envoi par e-mail, PDF joint ;
+    - POST <documents>/render/ : rendu PDF en lot (?year / month dans le corps).
+
+    En-tête Idempotency-Key facultatif ; sans lui, un envoi est identifié par
+    (document, version, destinataire) : un double clic ne part qu'une fois.
+    Une clé déjà connue renvoie la tâche existante (200), relancée si elle
+    avait échoué.
+    """
+
+    render_kind = None
+    throttle_scope = None  # limitation de débit (app/throttling.py), 'expensive' pour send / render
+
+    def enqueue(self, kind, payload, default_key=None):
+        tenant = self.get_tenant()
+        header = self.request.headers.get('Idempotency-Key')
+        key = f"{tenant.pk}:{header}" if header else default_key and f"{tenant.pk}:{default_key}"
+        job, created = jobs.enqueue(kind, payload, user=tenant, idempotency_key=key)
+        if not created and job.status == Job.FAILED:
+            jobs.retry(job)
+        return Response(
+            JobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=['post'], throttle_scope='expensive')
+    def send(self, request, pk=None):
+        params = SendDocumentSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        document = self.get_object()
+        to = params.validated_data.get('to')
+        payload = {'kind': self.render_kind, 'id': document.pk}
+        if to:
+            payload['to'] = to
+        return self.enqueue(
+            'send_document', payload, f"send:{self.render_kind}:{document.pk}:v{document.version}:{to or ''}",
+        )
+
+    @action(detail=False, methods=['post'], url_path='render', url_name='render-batch', throttle_scope='expensive')
+    def render_batch(self, request):
+        params = RenderBatchSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        return self.enqueue('render_batch', {'kind': self.render_kind, **params.validated_data})
+
+
+class ConditionalRequestMixin:
+    """ETag fort sur list et retrieve ; If-None-Match identique => 304.
+
+    L'ETag est calculé sur les objets chargés (app/etags.py) avant toute
+    sérialisation : un 304 ne coûte que la lecture en base. Pour une liste,
+    l'empreinte couvre la page et l'existence d'une page suivante.
+
+    En écriture (PUT / PATCH / DELETE), If-Match doit porter l'ETag courant
+    de l'objet, sinon 412 : seule sa partie état est comparée, un ETag lu
+    avec ?fields= / ?expand= / ?format= convient. Une écriture concurrente détectée par le verrou
+    optimiste (app/versioning.py) donne 412 avec If-Match, 409 sans.
+    """
+
+    write_methods = ('PUT', 'PATCH', 'DELETE')
+
+    def get_variant(self, *extra):
+        user = getattr(self.request, 'user', None)
+        return (getattr(user, 'pk', None), self.request.get_full_path(), self.request.accepted_renderer.format, *extra)
+
+    def get_etag(self, objects, *extra):
+        return etags.compute_etag(objects, *self.get_variant(*extra))
+
+    def get_object_etag(self, instance):
+        return etags.object_etag(instance, *self.get_variant())
+
+    def conditional_response(self, etag, data=None):
+        """304 si le client a déjà cette version, sinon data (callable) en 200"""
+        if etags.matches(self.request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data())
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            objects = list(queryset)
+            etag = self.get_etag(objects)
+            return self.conditional_response(etag, lambda: self.get_serializer(objects, many=True).data)
+        etag = self.get_etag(page, getattr(self.paginator, 'has_next', None))
+        response = self.conditional_response(etag, lambda: None)
+        if response.status_code == status.HTTP_304_NOT_MODIFIED:
+            return response
+        paginated = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        for header in ('ETag', 'Cache-Control'):
+            paginated[header] = response[header]
+        return paginated
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return self.conditional_response(self.get_object_etag(instance), lambda: self.get_serializer(instance).data)
+
+    def get_object(self):
+        instance = super().get_object()
+        if self.request.method in self.write_methods:
+            if not etags.precondition_holds(self.request, instance):
+                raise PreconditionFailed()
+        return instance
+
+    def perform_update(self, serializer):
+        try:
+            super().perform_update(serializer)
+        except VersionConflict:
+            raise PreconditionFailed() if 'HTTP_IF_MATCH' in self.request.META else EditConflict()
+
+
+class ArchivedRetrieveMixin:
+    """retrieve d'un document archivé (app/coldstorage.py), en lecture seule.
+
+    Un id absent des tables est cherché dans l'index des archives de
+    l'utilisateur ; la représentation vient de l'instantané (?fields=
+    appliqué). En-tête X-Archived: true. À placer avant ConditionalRequestMixin.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+            archived = coldstorage.retrieve(self.get_queryset().model, self.get_tenant(), pk)
+            if archived is None:
+                raise
+        record, data = archived
+        requested = getattr(self, 'get_requested_fields', lambda: None)()
+        if requested is not None:
+            data = {name: data[name] for name in requested if name in data}
+        response = self.conditional_response(self.get_object_etag(record), lambda: data)
+        response['X-Archived'] = 'true'
+        return response
+
+
+class CachedRetrieveMixin(ConditionalRequestMixin):
+    """retrieve servi depuis le cache, une entrée par représentation.
+
+    L'entrée contient la représentation et son ETag : une requête
+    conditionnelle sur une entrée en cache n'interroge pas la base. La clé
+    inclut l'utilisateur (un autre tenant ne peut pas lire l'entrée), le
+    format et les paramètres ?fields= / ?expand= normalisés.
+    En-tête X-Cache : HIT / MISS.
+    """
+
+    def get_cache_namespace(self):
+        requested = getattr(self, 'get_requested_fields', lambda: None)()
+        fields = ','.join(sorted(set(requested))) if requested is not None else '*'
+        nested = 'nested' if getattr(self, 'is_nested', lambda: False)() else 'flat'
+        return f"tenant{self.get_tenant().pk}:{self.request.accepted_renderer.format}:{fields}:{nested}"
+
+    def retrieve(self, request, *args, **kwargs):
+        def build():
+            instance = self.get_object()
+            return {'etag': self.get_object_etag(instance), 'data': dict(self.get_serializer(instance).data)}
+
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        entry, hit = cache.get_or_build(self.get_cache_namespace(), self.get_queryset().model, pk, build)
+        response = self.conditional_response(entry['etag'], lambda: entry['data'])
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
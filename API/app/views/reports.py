@@ -0,0 +1,38 @@
+from datetime import date
+
+from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
+from app.models import RevenueRollup, ClientRollup
+from app.serializers import RevenueRollupSerializer, ClientRollupSerializer
+from app.views.mixins import TenantScopedMixin, ConditionalRequestMixin
+
+
+class RollupFilterMixin:
+    """Filtres ?year=2026, ?month=2026-03 et ?clients_id= sur les agrégats"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        try:
+            if 'year' in params:
+                queryset = queryset.filter(month__year=int(params['year']))
+            if 'month' in params:
+                year, month = params['month'].split('-')
+                queryset = queryset.filter(month=date(int(year), int(month), 1))
+            if 'clients_id' in params and hasattr(queryset.model, 'clients_id'):
+                queryset = queryset.filter(clients_id=int(params['clients_id']))
+        except ValueError:
+            raise ValidationError("Filtre invalide (year=AAAA, month=AAAA-MM, clients_id=<id>)")
+        return queryset
+
+
+class RevenueReportViewSet(TenantScopedMixin, ConditionalRequestMixin, RollupFilterMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = RevenueRollup.objects.all()
+    serializer_class = RevenueRollupSerializer
+    keyset_ordering = ('-month', 'id')
+
+
+class ClientReportViewSet(TenantScopedMixin, ConditionalRequestMixin, RollupFilterMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = ClientRollup.objects.all()
+    serializer_class = ClientRollupSerializer
+    keyset_ordering = ('-month', 'id')
\ No newline at end of file
@@ -1,7 +1,18 @@
 from rest_framework import viewsets
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from app.models import Users
 from app.serializers import UsersSerializer
+from app.views.mixins import FieldsProjectionMixin, ConditionalRequestMixin
 
-class UsersViewSet(viewsets.ModelViewSet):
+class UsersViewSet(ConditionalRequestMixin, FieldsProjectionMixin, viewsets.ModelViewSet):
+    """Compte de l'utilisateur authentifié ; seule l'inscription (create) est ouverte"""
     queryset = Users.objects.all()
-    serializer_class = UsersSerializer
\ No newline at end of file
+    serializer_class = UsersSerializer
+
+    def get_permissions(self):
+        if self.action == 'create':
+            return [AllowAny()]
+        return [IsAuthenticated()]
+
+    def get_queryset(self):
+        return super().get_queryset().filter(pk=self.request.user.pk)
\ No newline at end of file
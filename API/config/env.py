@@ -0,0 +1,75 @@
+"""Lecture typée des variables d'environnement pour config.settings.
+
+Aucun effet de bord à l'import : pas d'affichage, pas d'arrêt du processus.
+Un fichier .env.local (sinon .env) à la racine de l'API complète
+l'environnement sans écraser les variables déjà définies.
+Une valeur invalide lève ImproperlyConfigured avec le nom de la variable.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+ENV_FILES = ('.env.local', '.env')
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'off', '')
+
+
+def load_env_file(base_dir):
+    """Charge le premier fichier d'ENV_FILES présent ; retourne son chemin (ou None)"""
+    for name in ENV_FILES:
+        path = base_dir / name
+        if path.exists():
+            from dotenv import load_dotenv
+            load_dotenv(path, encoding='utf-8', override=False)
+            return path
+    return None
+
+
+def _parse(name, default, parse):
+    raw = os.environ.get(name)
+    if raw is None:
+        return default
+    try:
+        return parse(raw.strip())
+    except ValueError:
+        raise ImproperlyConfigured(f"Variable d'environnement {name} invalide : {raw!r}")
+
+
+def env_str(name, default=''):
+    return os.environ.get(name, default)
+
+
+def env_int(name, default):
+    return _parse(name, default, int)
+
+
+def env_float(name, default):
+    return _parse(name, default, float)
+
+
+def _bool(raw):
+    value = raw.lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(raw)
+
+
+def env_bool(name, default):
+    return _parse(name, default, _bool)
+
+
+def env_list(name, default=()):
+    """Liste séparée par des virgules, éléments vides ignorés"""
+    return _parse(name, list(default), lambda raw: [item.strip() for item in raw.split(',') if item.strip()])
+
+
+def env_choice(name, default, choices):
+    """Valeur parmi choices (clés d'un dict acceptées)"""
+    def parse(raw):
+        if raw not in choices:
+            raise ValueError(raw)
+        return raw
+    return _parse(name, default, parse)
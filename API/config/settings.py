@@ -1,56 +1,55 @@
-import os
+from importlib.util import find_spec
 from pathlib import Path
-from dotenv import load_dotenv
-import dj_database_url
-import sys
+
+from django.core.exceptions import ImproperlyConfigured
+
+from config.env import env_bool, env_choice, env_float, env_int, env_list, env_str, load_env_file
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-ENV_FILE = BASE_DIR / '.env.local'
-if ENV_FILE.exists():
-    load_dotenv(ENV_FILE, encoding='utf-8', override=True)
-    print(f"✅ Fichier chargé : {ENV_FILE}")
-else:
-    ENV_FILE_FALLBACK = BASE_DIR / '.env'
-    if ENV_FILE_FALLBACK.exists():
-        load_dotenv(ENV_FILE_FALLBACK, encoding='utf-8', override=True)
-        print(f"✅ Fichier chargé : {ENV_FILE_FALLBACK}")
-    else:
-        print(f"❌ ERREUR : Aucun fichier .env trouvé")
-        sys.exit(1)
-
-SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key")
-DEBUG = os.getenv("DEBUG", "True") == "True"
-ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1").split(",")
-CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "http://localhost:3000").split(",")
-
-print("\n=== DEBUG DATABASE CONFIG ===")
-print(f"DB_USER: {os.getenv('DB_USER')}")
-print(f"DB_PASSWORD: {os.getenv('DB_PASSWORD')[:3]}*** (première 3 lettres)")
-print(f"DB_NAME: {os.getenv('DB_NAME')}")
-print(f"DB_HOST: {os.getenv('DB_HOST', 'localhost')}")
-print(f"DB_PORT: {os.getenv('DB_PORT', '5432')}")
-
-db_url = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST', 'localhost')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_NAME')}"
-print(f"\n📌 URL construite :")
-print(f"postgresql://{os.getenv('DB_USER')}:***@{os.getenv('DB_HOST', 'localhost')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_NAME')}")
-print("="*60)
+# .env.local, sinon .env : complète l'environnement sans l'écraser
+ENV_FILE = load_env_file(BASE_DIR)
+
+SECRET_KEY = env_str('SECRET_KEY', 'dev-secret-key')
+DEBUG = env_bool('DEBUG', True)
+ALLOWED_HOSTS = env_list('ALLOWED_HOSTS', ['localhost', '127.0.0.1'])
+CORS_ALLOWED_ORIGINS = env_list('CORS_ALLOWED_ORIGINS', ['http://localhost:3000'])
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('DB_NAME', 'autodf'),
-        'USER': os.getenv('DB_USER', 'postgres'),
-        'PASSWORD': os.getenv('DB_PASSWORD', ''),
-        'HOST': os.getenv('DB_HOST', 'localhost'),
-        'PORT': os.getenv('DB_PORT', '53630'),
+        'NAME': env_str('DB_NAME', 'autodf'),
+        'USER': env_str('DB_USER', 'postgres'),
+        'PASSWORD': env_str('DB_PASSWORD'),
+        'HOST': env_str('DB_HOST', 'localhost'),
+        'PORT': env_str('DB_PORT', '53630'),
+        'CONN_HEALTH_CHECKS': True,
         'OPTIONS': {
             'client_encoding': 'UTF8',
         },
     }
 }
 
+# Connexions à PostgreSQL (psycopg 3) :
+# - DB_POOL=True : pool natif de Django (psycopg_pool), un par processus ;
+#   CONN_HEALTH_CHECKS : une connexion est vérifiée avant d'être rendue ;
+# - DB_POOL=False : connexions persistantes (DB_CONN_MAX_AGE secondes,
+#   0 = une connexion par requête) avec contrôle de santé.
+# Sous ASGI (SERVER_MODE=async), préférer le pool : les connexions
+# persistantes sont propres à chaque thread.
+DB_POOL = env_bool('DB_POOL', True)
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': env_int('DB_POOL_MIN_SIZE', 2),
+        'max_size': env_int('DB_POOL_MAX_SIZE', 10),
+        'timeout': env_float('DB_POOL_TIMEOUT', 10),
+        'max_idle': env_float('DB_POOL_MAX_IDLE', 300),
+        'max_lifetime': env_float('DB_POOL_MAX_LIFETIME', 3600),
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = env_int('DB_CONN_MAX_AGE', 60)
+
 INSTALLED_APPS = [
     'corsheaders',
     'django.contrib.admin',
@@ -59,11 +58,13 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'app',
 ]
 
 MIDDLEWARE = [
+    'app.middleware.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -75,6 +76,148 @@ MIDDLEWARE = [
 ]
 CORS_ALLOW_ALL_ORIGINS = True
 
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': ['app.auth.TokenAuthentication'],
+    'DEFAULT_THROTTLE_CLASSES': ['app.throttling.TokenBucketThrottle'],
+    'DEFAULT_PAGINATION_CLASS': 'app.pagination.KeysetPagination',
+    'PAGE_SIZE': env_int('API_PAGE_SIZE', 50),
+    # proxys de confiance devant l'API (nginx) : l'IP client est prise dans
+    # X-Forwarded-For à cette profondeur, 0 = REMOTE_ADDR seule
+    'NUM_PROXIES': env_int('NUM_PROXIES', 1),
+}
+
+# Limitation de débit (app/throttling.py) : seaux à jetons par utilisateur
+# ('tenant', toutes routes) et par route selon sa portée ; 'N/période' =
+# rafale de N requêtes puis N par période, vide = pas de limite.
+# 'login_failures' : échecs de connexion par compte visé, toutes adresses.
+# THROTTLE_BACKEND : 'database' (partagé entre workers) ou 'memory' (par processus)
+THROTTLE_ENABLED = env_bool('THROTTLE_ENABLED', True)
+THROTTLE_BACKEND = env_choice('THROTTLE_BACKEND', 'database', ('database', 'memory'))
+THROTTLE_RATES = {
+    scope: env_str(f'THROTTLE_RATE_{scope.upper()}', default)
+    for scope, default in {
+        'tenant': '3000/min',
+        'read': '600/min',
+        'write': '300/min',
+        'expensive': '20/min',
+        'login': '10/min',
+        'login_failures': '50/h',
+    }.items()
+}
+
+# Mots de passe (app/passwords.py) : hasheur préféré parmi scrypt, argon2
+# (paquet argon2-cffi) et pbkdf2. Les autres restent acceptés : un mot de
+# passe haché avec est re-haché à la connexion. Calculs sur un pool de
+# AUTH_HASH_WORKERS threads par processus, AUTH_HASH_QUEUE en attente au plus.
+PASSWORD_HASHER_CHOICES = {
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+AUTH_PASSWORD_HASHER = env_choice('AUTH_PASSWORD_HASHER', 'scrypt', PASSWORD_HASHER_CHOICES)
+if AUTH_PASSWORD_HASHER == 'argon2' and find_spec('argon2') is None:
+    raise ImproperlyConfigured("AUTH_PASSWORD_HASHER=argon2 nécessite le paquet argon2-cffi")
+PASSWORD_HASHERS = [PASSWORD_HASHER_CHOICES[AUTH_PASSWORD_HASHER]] + [
+    path for name, path in PASSWORD_HASHER_CHOICES.items() if name != AUTH_PASSWORD_HASHER
+]
+AUTH_HASH_WORKERS = env_int('AUTH_HASH_WORKERS', 2)
+AUTH_HASH_QUEUE = env_int('AUTH_HASH_QUEUE', 32)
+AUTH_HASH_TIMEOUT = env_float('AUTH_HASH_TIMEOUT', 5)
+
+# Jetons d'API (app/auth.py) : durée de vie en secondes (0 = sans expiration),
+# intervalle minimal entre deux mises à jour de last_used_at
+AUTH_TOKEN_TTL = env_int('AUTH_TOKEN_TTL', 30 * 24 * 3600)
+AUTH_TOKEN_TOUCH_INTERVAL = env_int('AUTH_TOKEN_TOUCH_INTERVAL', 300)
+
+# Cache : LRU en mémoire locale par défaut, Redis si CACHE_URL=redis://...
+# (backend Django natif, nécessite le paquet redis)
+CACHE_URL = env_str('CACHE_URL')
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'autodf',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'autodf',
+            'OPTIONS': {'MAX_ENTRIES': env_int('CACHE_MAX_ENTRIES', 10000)},
+        }
+    }
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = env_int('API_CACHE_TIMEOUT', 300)
+
+# Recherche de clients : seuil de similarité trigramme (0 à 1, pg_trgm)
+CLIENT_SEARCH_SIMILARITY = env_float('CLIENT_SEARCH_SIMILARITY', 0.5)
+
+# Rendu PDF : cache disque adressé par contenu, 0 worker = un par cœur
+RENDER_CACHE_DIR = BASE_DIR / env_str('RENDER_CACHE_DIR', 'var/pdf')
+RENDER_WORKERS = env_int('RENDER_WORKERS', 0)
+# anciennes versions d'un PDF conservées ce délai (s) pour les lectures en cours
+RENDER_CACHE_GRACE = env_int('RENDER_CACHE_GRACE', 300)
+
+# Numérotation des factures : séquence par émetteur (app/numbering.py)
+INVOICE_NUMBER_PREFIX = env_str('INVOICE_NUMBER_PREFIX', 'FA')
+INVOICE_NUMBER_FORMAT = env_str('INVOICE_NUMBER_FORMAT', '{prefix}{year}-{number:05d}')
+INVOICE_NUMBER_YEARLY_RESET = env_bool('INVOICE_NUMBER_YEARLY_RESET', True)
+
+# Factures et lignes partitionnées par année (app/partitioning.py) : partitions
+# créées d'avance pour l'année courante et les PARTITION_YEARS_AHEAD suivantes ;
+# années détachées par manage.py archive_invoices, exportées dans ARCHIVE_DIR
+PARTITION_YEARS_AHEAD = env_int('PARTITION_YEARS_AHEAD', 1)
+ARCHIVE_DIR = BASE_DIR / env_str('ARCHIVE_DIR', 'var/archive')
+
+# Archivage froid (app/coldstorage.py, manage.py archive_documents) : factures
+# payées et devis sans facture plus anciens que COLD_STORAGE_AFTER_DAYS, sortis
+# des tables vers des instantanés JSONL compressés (gzip, ou zstd avec le
+# paquet zstandard) et toujours servis par les endpoints de détail
+COLD_STORAGE_DIR = BASE_DIR / env_str('COLD_STORAGE_DIR', 'var/cold')
+COLD_STORAGE_CODEC = env_choice('COLD_STORAGE_CODEC', 'gzip', ['gzip', 'zstd'])
+COLD_STORAGE_AFTER_DAYS = env_int('COLD_STORAGE_AFTER_DAYS', 730)
+if COLD_STORAGE_CODEC == 'zstd' and find_spec('zstandard') is None:
+    raise ImproperlyConfigured("COLD_STORAGE_CODEC=zstd nécessite le paquet zstandard")
+
+# Arrondi de la TVA (app/money.py) : 'line' (au centime par ligne, totaux
+# incrémentaux) ou 'document' (une fois par taux, recalcul complet)
+VAT_ROUNDING = env_str('VAT_ROUNDING', 'line')
+
+# Instrumentation (app/metrics.py) : histogrammes par route servis sur /metrics,
+# en-tête Server-Timing. METRICS_SAMPLE_RATE : part des requêtes profilées
+# (SQL, sérialisation, rendu) ; seuils de journalisation en ms, -1 = désactivé.
+METRICS_ENABLED = env_bool('METRICS_ENABLED', True)
+METRICS_PATH = '/metrics'
+METRICS_SAMPLE_RATE = env_float('METRICS_SAMPLE_RATE', 1.0)
+METRICS_SLOW_QUERY_MS = env_float('METRICS_SLOW_QUERY_MS', 200)
+METRICS_SLOW_REQUEST_MS = env_float('METRICS_SLOW_REQUEST_MS', 1000)
+METRICS_SERVER_TIMING = env_bool('METRICS_SERVER_TIMING', True)
+# /metrics exige Authorization: Bearer <METRICS_TOKEN> ; vide = non exposé (404)
+METRICS_TOKEN = env_str('METRICS_TOKEN')
+
+# Tâches d'arrière-plan (app/jobs.py, manage.py runworker) : threads par
+# worker, attente entre deux scrutations de la file, reprises (délai de base
+# doublé à chaque échec, plafonné) et délai au-delà duquel une tâche prise
+# par un worker disparu est remise en attente (secondes)
+JOBS_CONCURRENCY = env_int('JOBS_CONCURRENCY', 4)
+JOBS_POLL_INTERVAL = env_float('JOBS_POLL_INTERVAL', 1.0)
+JOBS_MAX_ATTEMPTS = env_int('JOBS_MAX_ATTEMPTS', 5)
+JOBS_RETRY_DELAY = env_float('JOBS_RETRY_DELAY', 10)
+JOBS_RETRY_MAX_DELAY = env_float('JOBS_RETRY_MAX_DELAY', 3600)
+JOBS_LOCK_TIMEOUT = env_int('JOBS_LOCK_TIMEOUT', 600)
+
+# E-mails (envoi des devis / factures par le worker)
+EMAIL_BACKEND = env_str('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = env_str('EMAIL_HOST', 'localhost')
+EMAIL_PORT = env_int('EMAIL_PORT', 25)
+EMAIL_HOST_USER = env_str('EMAIL_HOST_USER')
+EMAIL_HOST_PASSWORD = env_str('EMAIL_HOST_PASSWORD')
+EMAIL_USE_TLS = env_bool('EMAIL_USE_TLS', False)
+EMAIL_TIMEOUT = env_int('EMAIL_TIMEOUT', 30)
+DEFAULT_FROM_EMAIL = env_str('DEFAULT_FROM_EMAIL', 'noreply@autodf.fr')
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
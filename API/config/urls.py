@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
+from app.views.metrics import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('app.urls'))
+    path('api/', include('app.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
@@ -0,0 +1,43 @@
+"""Configuration gunicorn (gunicorn -c gunicorn.conf.py).
+
+SERVER_MODE=sync : WSGI, workers sync (une requête à la fois par worker) ;
+SERVER_MODE=async : ASGI, workers uvicorn (les vues async n'occupent pas le
+worker pendant l'attente de la base).
+Le nombre de workers est fixe : WEB_CONCURRENCY (2 par défaut).
+GUNICORN_PRELOAD=True (défaut) : import unique avant le fork des workers.
+"""
+import gc
+import os
+
+
+SERVER_MODES = {
+    'sync': ('config.wsgi:application', 'sync'),
+    'async': ('config.asgi:application', 'uvicorn_worker.UvicornWorker'),
+}
+
+mode = os.getenv('SERVER_MODE', 'sync')
+if mode not in SERVER_MODES:
+    raise ValueError(f"SERVER_MODE inconnu : {mode} ({', '.join(SERVER_MODES)})")
+
+wsgi_app, worker_class = SERVER_MODES[mode]
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+
+# --preload : l'application est importée une fois dans le processus maître
+# puis partagée par les workers (copy-on-write). Rien n'ouvre de connexion
+# à la base à l'import : chaque worker crée ses connexions (ou son pool).
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+
+def when_ready(server):
+    """Maître prêt, workers pas encore créés : finit les imports à partager"""
+    if not server.cfg.preload_app:
+        return
+    # l'URLconf (vues, serializers, DRF) serait sinon importé à la première
+    # requête de chaque worker
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    # objets chargés exclus du ramasse-miettes : ses passages n'écrivent plus
+    # dans les pages partagées avec les workers
+    gc.freeze()